@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter
+
+from utils.embedding_cache import embedding_cache
+from llms.embedding_generator import embedding_scheduler, query_batcher
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/embedding_cache_stats")
+async def embedding_cache_stats():
+    """
+    Endpoint trả về số liệu của cache embedding:
+    số mục / dung lượng tầng bộ nhớ, số mục tầng đĩa, hit (bộ nhớ / đĩa) / miss
+    và tổng số byte văn bản không phải gửi lại cho API.
+    """
+    return await asyncio.to_thread(embedding_cache.stats)
+
+
+@router.get("/embedding_batch_stats")
+async def embedding_batch_stats():
+    """
+    Endpoint trả về số liệu gom batch embedding câu hỏi:
+    số câu hỏi, số lần gọi API, kích thước batch trung bình / lớn nhất và số lần gọi API tiết kiệm được.
+    """
+    return query_batcher.stats()
+
+
+@router.get("/embedding_scheduler_stats")
+async def embedding_scheduler_stats():
+    """
+    Endpoint trả về trạng thái điều phối gọi API embedding:
+    giới hạn RPM / TPM, số lần gọi đang chạy / đang chờ theo làn, số lần thử lại, số lần bị 429.
+    """
+    return embedding_scheduler.stats()
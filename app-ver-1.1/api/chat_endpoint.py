@@ -6,7 +6,7 @@ from fastapi import APIRouter, HTTPException, Request, Response, Cookie
 from pydantic import BaseModel
 sys.path.append('../') 
 from llms.response_generator import ResponseGenerator
-from utils.query_processor import process_query
+from utils.query_processor import process_query, detect_corpus_filter, extract_query_hs_codes
 
 router = APIRouter()
 logging.basicConfig(level=logging.INFO)
@@ -78,15 +78,30 @@ async def chat(
                     await request.app.state.mongodb_search_queue.put(mongodb_search) 
             else:
                 # Nếu không dùng MongoDB, thực hiện truy vấn RAG
+                processed_prompt = process_query(prompt)
+                # Câu hỏi rõ ràng nhắm vào một nhóm tài liệu (PDF phân loại / văn bản Word) thì lọc theo file_type
+                corpus_filter = detect_corpus_filter(prompt)
+                # Mã HS chỉ có trong PDF phân loại: câu hỏi về văn bản Word thì không tra theo mã
+                targets_docs = corpus_filter is not None and corpus_filter["file_type"] != ".pdf"
+                hs_codes = [] if targets_docs else extract_query_hs_codes(prompt)
+                hs_docs = []
+                retrieved_docs = []
                 search_engine = await request.app.state.search_engine_queue.get()
                 try:
-                    processed_prompt = process_query(prompt)
-                    retrieved_docs = await search_engine.retrieve(processed_prompt, top_k=10)
-                    logger.info(f"Retrieved {len(retrieved_docs)} documents for query: {processed_prompt}")
+                    if hs_codes:
+                        # Câu hỏi nêu mã HS: search chỉ trong các chunk đúng mã (payload index), bỏ qua rerank nếu có kết quả
+                        hs_docs = await search_engine.lookup_hs_codes(processed_prompt, hs_codes, top_k=5)
+                        logger.info(f"HS lookup {hs_codes}: {len(hs_docs)} documents")
+                    if not hs_docs:
+                        retrieved_docs = await search_engine.retrieve(processed_prompt, top_k=10, payload_filter=corpus_filter)
+                        if corpus_filter and not retrieved_docs:
+                            # Không có tài liệu phù hợp trong nhóm đã lọc: tìm lại trên toàn bộ collection
+                            retrieved_docs = await search_engine.retrieve(processed_prompt, top_k=10)
+                        logger.info(f"Retrieved {len(retrieved_docs)} documents for query: {processed_prompt} (filter={corpus_filter})")
                 finally:
                     await request.app.state.search_engine_queue.put(search_engine)
 
-                top_docs = []
+                top_docs = hs_docs
                 if retrieved_docs:
                     page_contents = [
                         doc.page_content for doc in retrieved_docs
@@ -109,7 +124,7 @@ async def chat(
                             await request.app.state.async_cohere_reranker_queue.put(reranker)
                     else:
                         logger.warning("No valid page_content after filtering.")
-                else:
+                elif not hs_docs:
                     logger.warning("No documents retrieved from search engine.")
 
                 # Gọi LLM tạo phản hồi dựa trên query và top_docs
@@ -2,6 +2,7 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 import os
 import sys
 import asyncio
+import hashlib
 sys.path.append('../') 
 
 from pipelines.doc_pipelines.doc_processor import doc_processor_pipeline
@@ -58,7 +59,7 @@ async def upload_doc(request: Request, file: UploadFile = File(...)):
         vector_store = await request.app.state.vector_store_queue.get()
         try:
             # Tạo embedding và lưu vào Qdrant
-            await vector_store.store_embeddings(texts, metadata)
+            await vector_store.store_embeddings(texts, metadata, source_id=hashlib.sha256(contents).hexdigest())
         except Exception as e:
             # Nếu có lỗi, vẫn trả VectorStoreManager về queue trước khi raise exception
             await request.app.state.vector_store_queue.put(vector_store)
@@ -2,10 +2,11 @@ import logging
 import os
 import sys
 import asyncio
+import hashlib
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 sys.path.append('../')  
-from pipelines.xlsx_pipelines.xlsx_processor import xlsx_processor_pipeline
+from pipelines.xlsx_pipelines.xlsx_processor import iter_processed_chunks
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,7 +16,9 @@ async def upload_xlsx(request: Request, file: UploadFile = File(...)):
     """
     Endpoint để upload và xử lý file XLSX.
     - Nhận file `.xlsx`, kiểm tra định dạng và kích thước.
-    - Lưu file vào thư mục tạm, xử lý bằng xlsx_processor_pipeline và lưu vào MongoDB.
+    - Nếu nội dung file (SHA-256) đã được ingest trước đó thì trả về ngay, không parse lại.
+    - Lưu file vào thư mục tạm, đọc + làm sạch theo từng khối (iter_processed_chunks)
+      và lưu từng khối vào MongoDB, nên bộ nhớ không phụ thuộc kích thước file.
     - Trả về trạng thái xử lý và số lượng bản ghi đã thêm.
     """
     mongodb_manager = None
@@ -27,11 +30,29 @@ async def upload_xlsx(request: Request, file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="File phải là XLSX.")
 
         # Kiểm tra kích thước file
+        config = request.app.state.config
         contents = await file.read()
-        if len(contents) > 10 * 1024 * 1024:
-            logger.error("[upload_xlsx] File quá lớn >10MB.")
-            raise HTTPException(status_code=400, detail="File quá lớn, tối đa 10MB.")
+        if len(contents) > config.XLSX_MAX_UPLOAD_MB * 1024 * 1024:
+            logger.error(f"[upload_xlsx] File quá lớn >{config.XLSX_MAX_UPLOAD_MB}MB.")
+            raise HTTPException(status_code=400, detail=f"File quá lớn, tối đa {config.XLSX_MAX_UPLOAD_MB}MB.")
         
+        # Lấy MongoDB Manager từ pool
+        logger.info("[upload_xlsx] Đang lấy MongoDB Manager từ pool...")
+        mongodb_manager = await request.app.state.mongo_db_queue.get()
+        logger.info("[upload_xlsx] Đã lấy MongoDB Manager từ pool")
+
+        # Re-upload đúng nội dung cũ: bỏ qua trước khi parse
+        sha256 = hashlib.sha256(contents).hexdigest()
+        existing = await mongodb_manager.find_imported_file(sha256)
+        if existing is not None:
+            logger.info(f"[upload_xlsx] Nội dung đã được ingest từ file '{existing['file_name']}', bỏ qua.")
+            return {
+                "filename": file.filename,
+                "status": "already_imported",
+                "duplicate_of": existing["file_name"],
+                "inserted_documents": 0
+            }
+
         # Lưu file tạm
         save_dir = "data/uploaded"
         os.makedirs(save_dir, exist_ok=True)
@@ -42,32 +63,35 @@ async def upload_xlsx(request: Request, file: UploadFile = File(...)):
 
         logger.info(f"[upload_xlsx] Đã lưu file tạm: {save_file_path}")
 
-        # Lấy MongoDB Manager từ pool
-        logger.info("[upload_xlsx] Đang lấy MongoDB Manager từ pool...")
-        mongodb_manager = await request.app.state.mongo_db_queue.get()
-        logger.info("[upload_xlsx] Đã lấy MongoDB Manager từ pool")
-
-        # Sử dụng xlsx_processor_pipeline để xử lý file và lấy DataFrame + FIELD_MAP
-        logger.info("[upload_xlsx] Gọi xlsx_processor_pipeline để xử lý file Excel")
-        df = await asyncio.to_thread(xlsx_processor_pipeline, save_file_path)
+        # Đọc + làm sạch file Excel theo từng khối (mỗi khối chạy trong thread riêng)
+        logger.info("[upload_xlsx] Xử lý file Excel theo khối")
+        chunks = iter_processed_chunks(save_file_path, config.XLSX_CHUNK_SIZE)
         
         # # Xóa dữ liệu cũ (nếu có) dựa trên file_name
         # file_name = os.path.splitext(os.path.basename(save_file_path))[0]
         # delete_result = await mongodb_manager.delete_by_filename(file_name)
         # logger.info(f"[upload_xlsx] Đã xóa {delete_result.get('deleted_count', 0)} documents cũ")
         
-        # Lưu DataFrame mới vào MongoDB
-        upload_result = await mongodb_manager.upload_dataframe(df, request.app.state.config.MONGODB_FIELD_MAP)
-        
-        if not upload_result.get("success", False):
-            raise ValueError(upload_result.get("error", "Lỗi không xác định khi tải lên MongoDB"))
+        # Lưu từng khối vào MongoDB
+        inserted_count = 0
+        duplicate_count = 0
+        while (df := await asyncio.to_thread(next, chunks, None)) is not None:
+            upload_result = await mongodb_manager.upload_dataframe(df, config.MONGODB_FIELD_MAP)
+            if not upload_result.get("success", False):
+                raise ValueError(upload_result.get("error", "Lỗi không xác định khi tải lên MongoDB"))
+            inserted_count += upload_result.get("inserted_count", 0)
+            duplicate_count += upload_result.get("duplicate_count", 0)
             
-        logger.info(f"[upload_xlsx] Đã insert {upload_result.get('inserted_count', 0)} documents mới")
+        logger.info(f"[upload_xlsx] Đã insert {inserted_count} documents mới, bỏ qua {duplicate_count} documents trùng")
+
+        file_name = os.path.splitext(os.path.basename(save_file_path))[0]
+        await mongodb_manager.record_imported_file(sha256, file_name, inserted_count)
         
         return {
             "filename": file.filename,
             "status": "success",
-            "inserted_documents": upload_result.get("inserted_count", 0)
+            "inserted_documents": inserted_count,
+            "duplicate_documents": duplicate_count
         }
         
     except FileNotFoundError:
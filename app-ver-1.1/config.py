@@ -13,6 +13,20 @@ class Config(BaseSettings):
     QDRANT_API_KEY: str | None = None
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
+    # Sau bao nhiêu giây thì VectorStoreManager kiểm tra lại collection (chạy nền, không chặn request)
+    QDRANT_READINESS_TTL: float = 300
+    # store_embeddings: số văn bản mỗi batch embedding + upsert và số upsert chạy đồng thời
+    QDRANT_UPSERT_BATCH_SIZE: int = 256
+    QDRANT_UPSERT_CONCURRENCY: int = 4
+    # Index HNSW, lượng tử hoá (none | scalar | binary) và lưu trên đĩa (mmap): chỉ áp dụng khi tạo collection
+    # mới, đổi cấu hình thì dùng QDRANT_COLLECTION_NAME mới (so sánh bằng benchmark_vector_index.py)
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_QUANTIZATION: str = "none"
+    QDRANT_ON_DISK: bool = False
+    # Khi search: hnsw_ef (0 = mặc định của Qdrant) và hệ số lấy dư ứng viên để chấm lại khi có lượng tử hoá
+    QDRANT_SEARCH_HNSW_EF: int = 0
+    QDRANT_SEARCH_OVERSAMPLING: float = 2.0
     SEARCH_THRESHOLD: float = 0.4
 
     # ===== OpenAI =====
@@ -20,6 +34,29 @@ class Config(BaseSettings):
     TEMPERATURE: float = 0
     CHUNK_SIZE: int = 1000
     MAX_RETRIES: int = 5
+    # Cache embedding: LRU trong bộ nhớ (theo số byte) + SQLite trên đĩa (rỗng = tắt tầng đĩa)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    EMBEDDING_CACHE_DB: str = "data/embedding_cache.sqlite3"
+    # Gom embedding câu hỏi của các request đồng thời: gửi khi đủ MAX_SIZE văn bản hoặc sau MAX_WAIT_MS
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    # Backend embedding: "openai" hoặc "local" (ONNX Runtime trên CPU, model int8, không cần mạng)
+    # Đổi backend thì số chiều vector đổi theo: cần QDRANT_COLLECTION_NAME mới (hoặc ingest lại)
+    EMBEDDING_BACKEND: str = "openai"
+    EMBEDDING_LOCAL_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    # File ONNX int8 chạy được trên mọi CPU; máy có AVX512-VNNI có thể chọn "onnx/model_qint8_avx512_vnni.onnx"
+    EMBEDDING_LOCAL_ONNX_FILE: str = "onnx/model_quantized.onnx"
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32
+    EMBEDDING_LOCAL_THREADS: int = 0
+    # Điều phối gọi API embedding (mỗi process một bộ giới hạn, 0 = không giới hạn):
+    # số request / token mỗi phút, số batch chạy đồng thời, backoff khi lỗi (giây)
+    EMBEDDING_RPM: int = 3000
+    EMBEDDING_TPM: int = 1_000_000
+    EMBEDDING_MAX_IN_FLIGHT: int = 4
+    EMBEDDING_BACKOFF_BASE: float = 1.0
+    EMBEDDING_BACKOFF_MAX: float = 60.0
 
 
     # ===== Model Configs =====
@@ -63,9 +100,17 @@ class Config(BaseSettings):
         'Thuế suất BVMT': 'thue_suat_bvmt',
         'Trạng thái': 'tinh_trang',
         'file_name': 'file_name',
-        'Từ khóa xuất xứ': 'xuat_xu_keywords' 
+        'Mã xuất xứ': 'xuat_xu_code'
     }
 
+    # ===== XLSX Ingestion =====
+    # Số dòng mỗi khối khi đọc file xlsx theo luồng, và dung lượng upload tối đa (MB)
+    XLSX_CHUNK_SIZE: int = 5000
+    XLSX_MAX_UPLOAD_MB: int = 100
+    # Số document mỗi lệnh insert_many và số lệnh chạy đồng thời khi upload_dataframe
+    MONGODB_INSERT_CHUNK_SIZE: int = 1000
+    MONGODB_INSERT_CONCURRENCY: int = 4
+
     MONGODB_URI: str = ""
     MONGODB_DATABASE: str = ""
     MONGODB_COLLECTION: str = ""
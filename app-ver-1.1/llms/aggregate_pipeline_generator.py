@@ -7,6 +7,12 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.schema import SystemMessage, HumanMessage
 from prompts import get_mongodb_search_template, get_generate_search_query_schema
+from utils.country_mapping import get_country_code
+
+# Các khoá LLM có thể dùng cho xuất xứ trong fuzzy_search
+COUNTRY_SEARCH_FIELDS = ("xuat_xu_keywords", "xuat_xu")
+# Trường lọc nội bộ -> trường hiển thị tương ứng (dùng cho used_fields)
+USED_FIELD_ALIASES = {"xuat_xu_code": "xuat_xu"}
 
 
 class AggregatePipelineGenerator:
@@ -132,8 +138,24 @@ class AggregatePipelineGenerator:
             pipeline = []
             
             # Process fuzzy search fields
-            fuzzy_fields = search_data.get("fuzzy_search", {})
+            fuzzy_fields = dict(search_data.get("fuzzy_search", {}))
             fuzzy_conditions = []
+
+            # Build match conditions
+            match_conditions = {}
+
+            # Xuất xứ: nhận ra quốc gia thì so khớp chính xác trên mã ISO (có index),
+            # không nhận ra thì tìm fuzzy trên tên nước xuất xứ
+            for field in COUNTRY_SEARCH_FIELDS:
+                country = fuzzy_fields.pop(field, None)
+                if not country:
+                    continue
+                # Chỉ khớp chính xác: so chuỗi con trên câu hỏi tự do dễ nhận nhầm mã 2 ký tự
+                code = get_country_code(country, partial=False)
+                if code:
+                    match_conditions["xuat_xu_code"] = code
+                else:
+                    fuzzy_fields["xuat_xu"] = country
             
             # Xử lý các trường fuzzy search 
             for field, value in fuzzy_fields.items():
@@ -147,9 +169,6 @@ class AggregatePipelineGenerator:
                         }
                     })
             
-            # Build match conditions
-            match_conditions = {}
-            
             # Xử lý regex search
             regex_fields = search_data.get("regex_search", {})
             for field, pattern in regex_fields.items():
@@ -275,7 +294,8 @@ class AggregatePipelineGenerator:
                 match_stage = stage["$match"]
                 for field in match_stage:
                     if field != "searchScore":  # Bỏ qua trường meta
-                        used_fields.add(field.split('.')[0])  # Lấy trường gốc nếu là trường con
+                        root = field.split('.')[0]  # Lấy trường gốc nếu là trường con
+                        used_fields.add(USED_FIELD_ALIASES.get(root, root))
         
         # Trả về danh sách các trường đã sắp xếp
         return sorted(list(used_fields))
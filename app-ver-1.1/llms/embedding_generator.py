@@ -1,16 +1,165 @@
+import asyncio
+import time
+import httpx
 from langchain_openai import OpenAIEmbeddings
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 from config import Config
+from utils.embedding_cache import embedding_cache
+from llms.local_embeddings import get_local_embeddings
+from llms.embedding_scheduler import (
+    PRIORITY_INGEST, PRIORITY_QUERY, EmbeddingScheduler, backoff_delay, estimate_tokens, is_retryable
+)
 
 config = Config()
 
+# Số chiều vector của các model OpenAI: VectorStoreManager tạo / kiểm tra collection mà không cần gọi API
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+# Một AsyncClient dùng chung cho mọi EmbeddingGenerator trong process (giữ kết nối keep-alive tới OpenAI)
+_shared_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_shared_async_client() -> httpx.AsyncClient:
+    global _shared_async_client
+    if _shared_async_client is None or _shared_async_client.is_closed:
+        _shared_async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+    return _shared_async_client
+
+
+async def aclose_shared_async_client() -> None:
+    """Đóng AsyncClient dùng chung (gọi khi tắt ứng dụng)."""
+    global _shared_async_client
+    if _shared_async_client is not None:
+        await _shared_async_client.aclose()
+        _shared_async_client = None
+
+
+class QueryEmbeddingBatcher:
+    """
+    Gom các lần embed câu hỏi đồng thời (từ nhiều request chat) thành một lần gọi API.
+
+    Mỗi model có một batch đang chờ: batch được gửi khi đủ `max_batch_size` văn bản
+    hoặc sau `max_wait_ms` kể từ văn bản đầu tiên; mỗi người gọi nhận vector qua Future của mình.
+    Lỗi của lần gọi API được trả cho mọi người gọi trong batch.
+    """
+
+    def __init__(self, max_wait_ms: float = 5, max_batch_size: int = 64, enabled: bool = True):
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.enabled = enabled
+        # model -> (EmbeddingGenerator dùng để gọi API, danh sách (text, future))
+        self._pending: Dict[str, Tuple["EmbeddingGenerator", List[Tuple[str, asyncio.Future]]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+        self.requests = 0
+        self.batches = 0
+        self.texts_sent = 0
+        self.max_batch_seen = 0
+
+    def configure(self, max_wait_ms: Optional[float] = None, max_batch_size: Optional[int] = None,
+                  enabled: Optional[bool] = None) -> None:
+        if max_wait_ms is not None:
+            self.max_wait_ms = max_wait_ms
+        if max_batch_size is not None:
+            self.max_batch_size = max(1, max_batch_size)
+        if enabled is not None:
+            self.enabled = enabled
+
+    async def embed(self, generator: "EmbeddingGenerator", text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        model = generator.cache_model
+        future = loop.create_future()
+        _, items = self._pending.setdefault(model, (generator, []))
+        items.append((text, future))
+        self.requests += 1
+        if len(items) >= self.max_batch_size:
+            self._start_flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.max_wait_ms / 1000, self._start_flush, model)
+        return await future
+
+    def _start_flush(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(model, None)
+        if pending is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush(*pending))
+        # Giữ tham chiếu tới task cho tới khi chạy xong
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, generator: "EmbeddingGenerator", items: List[Tuple[str, asyncio.Future]]) -> None:
+        # Người gọi đã huỷ (vd client ngắt kết nối) thì bỏ văn bản của họ
+        items = [(t, f) for t, f in items if not f.done()]
+        texts = list(dict.fromkeys(t for t, _ in items))
+        if not texts:
+            return
+        self.batches += 1
+        self.texts_sent += len(texts)
+        self.max_batch_seen = max(self.max_batch_seen, len(texts))
+        try:
+            vectors = dict(zip(texts, await generator._aembed_batch(texts, PRIORITY_QUERY)))
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future in items:
+            if not future.done():
+                future.set_result(vectors[text])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts_sent": self.texts_sent,
+            "avg_batch_size": round(self.texts_sent / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "api_calls_saved": self.requests - self.batches,
+        }
+
+
+query_batcher = QueryEmbeddingBatcher(
+    max_wait_ms=config.EMBEDDING_BATCH_MAX_WAIT_MS,
+    max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+    enabled=config.EMBEDDING_BATCH_ENABLED,
+)
+
+# Giới hạn request / token mỗi phút là của cả API key nên dùng chung một scheduler trong process
+embedding_scheduler = EmbeddingScheduler(
+    requests_per_minute=config.EMBEDDING_RPM,
+    tokens_per_minute=config.EMBEDDING_TPM,
+    max_in_flight=config.EMBEDDING_MAX_IN_FLIGHT,
+    max_retries=config.MAX_RETRIES,
+    backoff_base=config.EMBEDDING_BACKOFF_BASE,
+    backoff_max=config.EMBEDDING_BACKOFF_MAX,
+)
+
+
 class EmbeddingGenerator:
     """
     Lớp này chịu trách nhiệm gọi OpenAI Embeddings để chuyển văn bản thành vector.
     Nó cũng xử lý các vấn đề liên quan như:
       - Chia batch (chunk) nếu danh sách văn bản quá lớn (để tiết kiệm số lần gọi API).
-      - Retry (thử lại) nếu gọi API thất bại (do lỗi mạng, rate limit...).
+      - Retry (thử lại) nếu gọi API thất bại (do lỗi mạng, rate limit...), có backoff + jitter và theo Retry-After.
       - Cho phép cấu hình model, API key, số lần retry, kích thước batch...
+    Các hàm aembed_* gọi API bất đồng bộ qua AsyncClient dùng chung, không chặn event loop.
+    Mọi hàm embed đều tra embedding_cache (bộ nhớ + SQLite) trước; chỉ văn bản chưa có mới gọi API.
+    aembed_query đi qua query_batcher để gom câu hỏi của các request đồng thời vào một lần gọi API.
+    Backend: "openai" (OpenAIEmbeddings) hoặc "local" (LocalEmbeddings, ONNX trên CPU, không cần mạng).
+    Với backend openai, các lần gọi async đi qua embedding_scheduler (giới hạn RPM / TPM, làn ưu tiên).
     """
 
     def __init__(
@@ -19,6 +168,7 @@ class EmbeddingGenerator:
         api_key: str = None,
         chunk_size: int = config.CHUNK_SIZE,
         max_retries: int = config.MAX_RETRIES,
+        backend: str = config.EMBEDDING_BACKEND,
     ):
         """
         Khởi tạo EmbeddingGenerator.
@@ -28,11 +178,55 @@ class EmbeddingGenerator:
             api_key (str, optional): API key của OpenAI.
             chunk_size (int): Số lượng text tối đa trong mỗi batch (mặc định 1000).
             max_retries (int): Số lần thử lại nếu gọi API gặp lỗi (mặc định 5).
+            backend (str): "openai" hoặc "local" (model cấu hình bởi EMBEDDING_LOCAL_*).
         """
         self.model_name = model_name
         self.chunk_size = chunk_size
         self.max_retries = max_retries
-        self.embedding_model = OpenAIEmbeddings(model=model_name, openai_api_key=api_key)
+        self.backend = backend
+        if backend == "local":
+            self.embedding_model = get_local_embeddings(
+                model_name=config.EMBEDDING_LOCAL_MODEL,
+                onnx_file=config.EMBEDDING_LOCAL_ONNX_FILE,
+                batch_size=config.EMBEDDING_LOCAL_BATCH_SIZE,
+                num_threads=config.EMBEDDING_LOCAL_THREADS,
+            )
+        elif backend == "openai":
+            # Retry do EmbeddingGenerator / embedding_scheduler đảm nhận (max_retries=0 tắt retry của SDK)
+            self.embedding_model = OpenAIEmbeddings(
+                model=model_name, openai_api_key=api_key, http_async_client=get_shared_async_client(),
+                max_retries=0
+            )
+        else:
+            raise ValueError(f"EMBEDDING_BACKEND không hợp lệ: {backend} (chỉ hỗ trợ 'openai' hoặc 'local')")
+
+    @property
+    def cache_model(self) -> str:
+        """Tên model thực tế (khoá của embedding_cache)."""
+        return self.embedding_model.model
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """
+        Số chiều vector biết trước mà không cần gọi embed: từ backend local, từ tham số `dimensions`
+        của OpenAIEmbeddings (nếu có) hoặc bảng EMBEDDING_DIMENSIONS. None nếu model không có trong bảng.
+        """
+        return (
+            getattr(self.embedding_model, "dimension", None)
+            or getattr(self.embedding_model, "dimensions", None)
+            or EMBEDDING_DIMENSIONS.get(self.cache_model)
+        )
+
+    @staticmethod
+    def _pending_texts(texts: List[str], cached: List[Optional[List[float]]]) -> List[str]:
+        """Các văn bản chưa có trong cache, mỗi văn bản một lần, giữ thứ tự xuất hiện."""
+        return list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+
+    @staticmethod
+    def _merge_cached(texts: List[str], cached: List[Optional[List[float]]],
+                      computed: Dict[str, List[float]]) -> List[List[float]]:
+        """Ghép vector từ cache và vector vừa gọi API theo đúng thứ tự texts."""
+        return [v if v is not None else computed[t] for t, v in zip(texts, cached)]
 
     def embed_query(self, text: str) -> List[float]:
         """
@@ -45,14 +239,37 @@ class EmbeddingGenerator:
         Returns:
             List[float]: Vector embedding, độ dài phụ thuộc model.
         """
+        cached = embedding_cache.get_many(self.cache_model, [text])[0]
+        if cached is not None:
+            return cached
         for attempt in range(self.max_retries):
             try:
-                return self.embedding_model.embed_query(text)
+                vector = self.embedding_model.embed_query(text)
+                embedding_cache.put_many(self.cache_model, [text], [vector])
+                return vector
             except Exception as e:
-                if attempt == self.max_retries - 1:
+                if attempt == self.max_retries - 1 or not is_retryable(e):
                     raise e
+                time.sleep(backoff_delay(attempt, e, config.EMBEDDING_BACKOFF_BASE, config.EMBEDDING_BACKOFF_MAX))
         return []
 
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Bản bất đồng bộ của embed_query (dùng trong các hàm async, vd truy vấn chat).
+        """
+        # Tầng bộ nhớ tra ngay; tầng đĩa (SQLite) tra trong thread
+        cached = embedding_cache.get_many(self.cache_model, [text], memory_only=True)[0]
+        if cached is None and embedding_cache.db_path:
+            cached = (await asyncio.to_thread(embedding_cache.get_many, self.cache_model, [text]))[0]
+        if cached is not None:
+            return cached
+        if query_batcher.enabled:
+            vector = await query_batcher.embed(self, text)
+        else:
+            vector = (await self._aembed_batch([text], PRIORITY_QUERY))[0]
+        await asyncio.to_thread(embedding_cache.put_many, self.cache_model, [text], [vector])
+        return vector
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed nhiều text cùng lúc. Ta chia text thành từng batch (chunk) để tối ưu gọi API.
@@ -63,12 +280,15 @@ class EmbeddingGenerator:
         Returns:
             List[List[float]]: Mảng 2 chiều, mỗi phần tử là 1 vector cho 1 chuỗi.
         """
+        cached = embedding_cache.get_many(self.cache_model, texts)
+        pending = self._pending_texts(texts, cached)
         all_vectors = []
-        for i in range(0, len(texts), self.chunk_size):
-            batch = texts[i : i + self.chunk_size]
+        for i in range(0, len(pending), self.chunk_size):
+            batch = pending[i : i + self.chunk_size]
             vectors = self._embed_batch(batch)
             all_vectors.extend(vectors)
-        return all_vectors
+        embedding_cache.put_many(self.cache_model, pending, all_vectors)
+        return self._merge_cached(texts, cached, dict(zip(pending, all_vectors)))
 
     def _embed_batch(self, texts: List[str]) -> List[List[float]]:
         """
@@ -84,6 +304,37 @@ class EmbeddingGenerator:
             try:
                 return self.embedding_model.embed_documents(texts)
             except Exception as e:
-                if attempt == self.max_retries - 1:
+                if attempt == self.max_retries - 1 or not is_retryable(e):
                     raise e
+                time.sleep(backoff_delay(attempt, e, config.EMBEDDING_BACKOFF_BASE, config.EMBEDDING_BACKOFF_MAX))
         return []
+
+    async def aembed_documents(self, texts: List[str], priority: int = PRIORITY_INGEST) -> List[List[float]]:
+        """
+        Bản bất đồng bộ của embed_documents, chia batch giống embed_documents.
+        Các batch được gửi đồng thời; embedding_scheduler giới hạn số batch chạy cùng lúc theo quota.
+        """
+        cached = await asyncio.to_thread(embedding_cache.get_many, self.cache_model, texts)
+        pending = self._pending_texts(texts, cached)
+        batches = [pending[i : i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+        tasks = [asyncio.ensure_future(self._aembed_batch(batch, priority)) for batch in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # Một batch lỗi hẳn: huỷ các batch còn lại thay vì tiếp tục tiêu quota
+            for task in tasks:
+                task.cancel()
+            raise
+        all_vectors = [vector for vectors in results for vector in vectors]
+        await asyncio.to_thread(embedding_cache.put_many, self.cache_model, pending, all_vectors)
+        return self._merge_cached(texts, cached, dict(zip(pending, all_vectors)))
+
+    async def _aembed_batch(self, texts: List[str], priority: int = PRIORITY_INGEST) -> List[List[float]]:
+        if self.backend == "local":
+            # Model chạy tại chỗ: không có quota để điều phối
+            return await self.embedding_model.aembed_documents(texts)
+        return await embedding_scheduler.run(
+            lambda: self.embedding_model.aembed_documents(texts),
+            tokens=sum(estimate_tokens(t) for t in texts),
+            priority=priority,
+        )
@@ -9,6 +9,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from config import Config
 from pipelines.rag_pipelines.vector_store import VectorStoreManager
+from llms.embedding_generator import aclose_shared_async_client
+from utils.embedding_cache import embedding_cache
 from pipelines.rag_pipelines.search_engine import SearchEngine
 from pipelines.rag_pipelines.cohere_reranker import AsyncCohereReranker
 from mongodb.mongodb_manager import MongoDBManager
@@ -23,6 +25,7 @@ from api.xlsx_endpoint import router as xlsx_router
 from api.doc_endpoint import router as doc_router
 from api.delete_endpoint import router as delete_router
 from api.xlsx_delete import router as xlsx_delete_router
+from api.cache_endpoint import router as cache_router
 
 # Logger setup
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -42,6 +45,13 @@ async def lifespan(app: FastAPI):
     if not all(required_envs):
         raise RuntimeError("Thiếu ENV quan trọng: OPENAI_API_KEY / MONGODB_URI / COHERE_API_KEY")
 
+    # ==== Cache embedding (trước khi VectorStoreManager gọi API embedding) ====
+    embedding_cache.configure(
+        max_bytes=config.EMBEDDING_CACHE_MAX_BYTES,
+        db_path=config.EMBEDDING_CACHE_DB,
+        enabled=config.EMBEDDING_CACHE_ENABLED,
+    )
+
     # ==== Init VectorStoreManager ====
     vector_store_pool = [
         VectorStoreManager(
@@ -50,6 +60,15 @@ async def lifespan(app: FastAPI):
             qdrant_api_key=config.QDRANT_API_KEY,
             qdrant_url=config.QDRANT_URL,
             prefer_grpc=True,
+            readiness_ttl=config.QDRANT_READINESS_TTL,
+            upsert_batch_size=config.QDRANT_UPSERT_BATCH_SIZE,
+            upsert_concurrency=config.QDRANT_UPSERT_CONCURRENCY,
+            hnsw_m=config.QDRANT_HNSW_M,
+            hnsw_ef_construct=config.QDRANT_HNSW_EF_CONSTRUCT,
+            quantization=config.QDRANT_QUANTIZATION,
+            on_disk=config.QDRANT_ON_DISK,
+            search_hnsw_ef=config.QDRANT_SEARCH_HNSW_EF,
+            search_oversampling=config.QDRANT_SEARCH_OVERSAMPLING,
         )
         for _ in range(config.NUM_VECTOR_STORES)
     ]
@@ -83,7 +102,9 @@ async def lifespan(app: FastAPI):
             mongodb_uri=config.MONGODB_URI,
             database_name=config.MONGODB_DATABASE,
             collection_name=config.MONGODB_COLLECTION,
-            pool_config=config.MONGODB_CONNECTION_POOL_CONFIG
+            pool_config=config.MONGODB_CONNECTION_POOL_CONFIG,
+            insert_chunk_size=config.MONGODB_INSERT_CHUNK_SIZE,
+            insert_concurrency=config.MONGODB_INSERT_CONCURRENCY
         )
         for _ in range(config.NUM_MONGO_DBS)
     ]
@@ -149,6 +170,7 @@ async def lifespan(app: FastAPI):
     for mongo_db in mongo_db_pool:
         mongo_db.close_connections()
     logger.info("🔒 Đã đóng tất cả kết nối MongoDB")
+    await aclose_shared_async_client()
 
 # ==== App ====
 app = FastAPI(
@@ -174,6 +196,7 @@ app.include_router(xlsx_router, prefix="/xlsx", tags=["XLSX"])
 app.include_router(doc_router, prefix="/doc", tags=["DOC"])
 app.include_router(delete_router, prefix="/delete", tags=["DELETE"])
 app.include_router(xlsx_delete_router, prefix="/delete", tags=["DELETE"])
+app.include_router(cache_router, prefix="/cache", tags=["CACHE"])
 
 # ==== Main entry ====
 if __name__ == "__main__":
@@ -1,20 +1,47 @@
 # mongodb_manager.py
 import os
+import asyncio
 from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 import pandas as pd
-import math
+import numpy as np
 import datetime
+import hashlib
 import logging
 
+from utils.country_mapping import get_country_code
+
 logger = logging.getLogger(__name__)
 
+# Trường không tham gia hash nội dung: cùng một dòng ở hai file khác nhau phải có cùng hash
+# (xuat_xu_code / xuat_xu_keywords suy ra từ xuat_xu nên cũng bỏ qua)
+ROW_HASH_EXCLUDED_FIELDS = {"_id", "file_name", "row_hash", "xuat_xu_code", "xuat_xu_keywords"}
+# Mã lỗi MongoDB khi vi phạm unique index
+DUPLICATE_KEY_ERROR = 11000
+# Các trường số: chuỗi "1,5" -> "1.5", rỗng / NaN -> None
+NUMERIC_FIELDS = ['luong', 'thue_suat_xnk', 'thue_suat_ttdb', 'thue_suat_vat',
+                  'thue_suat_tu_ve', 'thue_suat_bvmt']
+
+def _as_float(v):
+    """Giá trị số khi tính row_hash: float nếu chuyển được, giữ nguyên nếu không."""
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return v
+
+
 class MongoDBManager:
     def __init__(self, mongodb_uri: Optional[str] = None, 
                  database_name: Optional[str] = None,
                  collection_name: Optional[str] = None,
-                 pool_config: Optional[Dict[str, Any]] = None):
+                 pool_config: Optional[Dict[str, Any]] = None,
+                 insert_chunk_size: int = 1000,
+                 insert_concurrency: int = 4):
         """
         Khởi tạo MongoDBManager với cấu hình kết nối và pool
         
@@ -23,6 +50,8 @@ class MongoDBManager:
             database_name: Tên database
             collection_name: Tên collection
             pool_config: Cấu hình connection pool
+            insert_chunk_size: Số document mỗi lệnh insert_many trong upload_dataframe
+            insert_concurrency: Số lệnh insert_many chạy đồng thời
         """
         # Load environment variables
         load_dotenv()
@@ -42,9 +71,14 @@ class MongoDBManager:
             "retryReads": True
         }
         
+        self.insert_chunk_size = insert_chunk_size
+        self.insert_concurrency = insert_concurrency
+
         self.client = None
         self.db = None
         self.collection = None
+        self.files_collection = None
+        self._indexes_ready = False
         
         # Khởi tạo kết nối
         self._init_connection()
@@ -68,6 +102,8 @@ class MongoDBManager:
             # Lấy database và collection
             self.db = self.client[self.database_name]
             self.collection = self.db[self.collection_name]
+            # Dấu vân tay (SHA-256) của các file xlsx đã ingest
+            self.files_collection = self.db["import_files"]
             
             print(f"Kết nối thành công đến MongoDB: {self.database_name}.{self.collection_name}")
             
@@ -127,33 +163,157 @@ class MongoDBManager:
             self.client.close()
             print("Đã đóng tất cả kết nối MongoDB")
     
-    def _default_val(self, val, numeric: bool = False):
+    async def ensure_indexes(self) -> None:
         """
-        Định dạng giá trị mặc định cho các trường
-        
-        Args:
-            val: Giá trị cần định dạng
-            numeric: True nếu trường là số
-            
-        Returns:
-            Giá trị đã được định dạng
+        Tạo unique index trên row_hash (một lần cho mỗi manager).
+        sparse: các document ingest trước khi có row_hash không bị coi là trùng nhau.
         """
-        if numeric:
-            if isinstance(val, str):
-                val = val.replace(',', '.')
-            if pd.isna(val) or val == '' or val == 'NaN':
-                return None
-            else:
-                return val
-        else:
-            if val is None or val == '' or (isinstance(val, float) and math.isnan(val)):
-                return ''
+        if self._indexes_ready:
+            return
+        await self.collection.create_index("row_hash", unique=True, sparse=True)
+        await self.files_collection.create_index("file_name")
+        # Lọc xuất xứ bằng so khớp chính xác trên mã ISO (xem AggregatePipelineGenerator.build_pipeline)
+        await self.collection.create_index("xuat_xu_code")
+        self._indexes_ready = True
+
+    async def migrate_country_codes(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Chuyển các document ingest trước đây (xuat_xu_keywords: danh sách alias) sang xuat_xu_code
+        và tính lại row_hash (không còn gồm danh sách alias). Chạy một lần sau khi nâng cấp.
+        Document có row_hash mới trùng với một document đã có là bản trùng lọt vào khi row_hash
+        còn gồm xuat_xu_keywords: xoá bản đó, giữ bản đã có.
+        """
+        await self.ensure_indexes()
+        updated = 0
+        removed = 0
+        cursor = self.collection.find({"xuat_xu_keywords": {"$exists": True}})
+        while batch := await cursor.to_list(length=batch_size):
+            # Các document cùng tập trường được hash chung một DataFrame
+            groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+            for doc in batch:
+                groups.setdefault(frozenset(doc), []).append(doc)
+            requests = []
+            request_ids = []
+            for docs in groups.values():
+                hashes = self._row_hashes(pd.DataFrame(docs, dtype=object))
+                for doc, row_hash in zip(docs, hashes):
+                    request_ids.append(doc["_id"])
+                    requests.append(UpdateOne(
+                        {"_id": doc["_id"]},
+                        {
+                            "$set": {"xuat_xu_code": get_country_code(doc.get("xuat_xu")) or "", "row_hash": row_hash},
+                            "$unset": {"xuat_xu_keywords": ""},
+                        }
+                    ))
+            try:
+                result = await self.collection.bulk_write(requests, ordered=False)
+                updated += result.modified_count
+            except BulkWriteError as bwe:
+                details = bwe.details
+                other_errors = [e for e in details.get("writeErrors", []) if e.get("code") != DUPLICATE_KEY_ERROR]
+                if other_errors or details.get("writeConcernErrors"):
+                    raise
+                updated += details.get("nModified", 0)
+                # Trùng nội dung với document khác: xoá bản đang chuyển
+                duplicate_ids = [request_ids[e["index"]] for e in details.get("writeErrors", [])]
+                result = await self.collection.delete_many({"_id": {"$in": duplicate_ids}})
+                removed += result.deleted_count
+        logger.info(f"[MongoDBManager] Đã chuyển {updated} document sang xuat_xu_code, xoá {removed} document trùng nội dung")
+        return {"updated": updated, "removed_duplicates": removed}
+
+    @staticmethod
+    def _normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Chuẩn hoá cả DataFrame theo cột thay vì từng giá trị của từng document:
+        - ngay: Timestamp / date -> chuỗi isoformat (tính một lần cho mỗi giá trị khác nhau), NaT -> 'NaT'
+        - trường số: chuỗi "1,5" -> "1.5"; rỗng / "NaN" / null -> None
+        - trường khác: rỗng / null -> ''
+        Trả về DataFrame kiểu object, giá trị là kiểu Python sẵn sàng cho BSON.
+        """
+        out = {}
+        for col in df.columns:
+            s = df[col]
+            if col == 'ngay' and pd.api.types.is_datetime64_any_dtype(s):
+                # isoformat một lần cho mỗi ngày khác nhau; mã -1 (NaT) -> 'NaT'
+                codes, uniques = pd.factorize(s)
+                iso = np.array([u.isoformat() for u in uniques] + ['NaT'], dtype=object)
+                out[col] = pd.Series(iso[codes], index=df.index, dtype=object)
+                continue
+            s = s.astype(object)
+            if col == 'ngay':
+                dates = {v: v.isoformat() for v in s.dropna().unique()
+                         if isinstance(v, (pd.Timestamp, datetime.date))}
+                if dates:
+                    s = s.mask(s.isin(list(dates)), s.map(dates))
+                # NaT trước đây được lưu thành 'NaT' (NaT.isoformat()); giữ nguyên để row_hash không đổi
+                nat = s.isna().to_numpy().copy()
+                nat[nat] = [v is pd.NaT for v in s[nat]]
+                s = s.mask(nat, 'NaT')
+            if col in NUMERIC_FIELDS:
+                try:
+                    # .str trả NaN cho giá trị không phải chuỗi -> giữ nguyên giá trị gốc
+                    replaced = s.str.replace(',', '.', regex=False)
+                    s = replaced.where(replaced.notna(), s)
+                except AttributeError:
+                    pass  # cột không có chuỗi nào
+                empty = s.isna() | s.isin(['', 'NaN'])
+                s = s.where(~empty, None)
             else:
-                return val
-    
+                empty = s.isna() | s.isin([''])
+                s = s.where(~empty, '')
+            out[col] = s
+        return pd.DataFrame(out, index=df.index, dtype=object)
+
+    @staticmethod
+    def _row_hashes(df: pd.DataFrame) -> List[str]:
+        """SHA-1 nội dung của từng document (bỏ qua file_name và các trường suy ra), theo thứ tự dòng."""
+        keys = sorted(k for k in df.columns if k not in ROW_HASH_EXCLUDED_FIELDS)
+        columns = []
+        for k in keys:
+            values = df[k].tolist()
+            if k in NUMERIC_FIELDS:
+                values = [_as_float(v) for v in values]
+            # repr('') cho None: giữ đúng hash của các document đã lưu
+            columns.append([f"{k}={'' if v is None else v!r}" for v in values])
+        return [
+            hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+            for parts in zip(*columns)
+        ] if columns else [hashlib.sha1(b"").hexdigest()] * len(df)
+
+    async def _insert_chunk(self, records: List[Dict[str, Any]], slots: asyncio.Semaphore) -> int:
+        """insert_many không theo thứ tự; lỗi trùng row_hash không chặn các document còn lại."""
+        async with slots:
+            try:
+                result = await self.collection.insert_many(records, ordered=False)
+                return len(result.inserted_ids)
+            except BulkWriteError as bwe:
+                details = bwe.details
+                other_errors = [e for e in details.get("writeErrors", []) if e.get("code") != DUPLICATE_KEY_ERROR]
+                if other_errors or details.get("writeConcernErrors"):
+                    raise
+                return details.get("nInserted", 0)
+
+    async def find_imported_file(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Trả về bản ghi import_files nếu nội dung file này đã được ingest."""
+        return await self.files_collection.find_one({"_id": sha256})
+
+    async def record_imported_file(self, sha256: str, file_name: str, row_count: int) -> None:
+        """Ghi dấu vân tay của file vừa ingest thành công."""
+        await self.files_collection.update_one(
+            {"_id": sha256},
+            {"$set": {
+                "file_name": file_name,
+                "row_count": row_count,
+                "uploaded_at": datetime.datetime.utcnow(),
+            }},
+            upsert=True
+        )
+
     async def upload_dataframe(self, df: pd.DataFrame, field_map: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
-        Tải DataFrame lên MongoDB
+        Tải DataFrame lên MongoDB.
+        Mỗi document có row_hash (unique index); document trùng nội dung với document đã có
+        (từ file này hay file khác) bị bỏ qua thay vì nhân bản.
         
         Args:
             df: DataFrame chứa dữ liệu cần lưu
@@ -165,31 +325,31 @@ class MongoDBManager:
         try:
             # Đổi tên cột trong DataFrame theo field_map
             df_renamed = df.rename(columns=field_map)
-            
-            # Chuyển DataFrame thành danh sách các document
-            records = []
-            numeric_fields = ['luong', 'thue_suat_xnk', 'thue_suat_ttdb', 'thue_suat_vat', 
-                             'thue_suat_tu_ve', 'thue_suat_bvmt']
-            
-            for rec in df_renamed.to_dict(orient='records'):
-                # Xử lý trường ngày
-                if isinstance(rec.get('ngay'), (pd.Timestamp, datetime.date)):
-                    rec['ngay'] = rec['ngay'].isoformat()
-                
-                # Áp dụng giá trị mặc định cho mỗi trường
-                processed_rec = {}
-                for k, v in rec.items():
-                    processed_rec[k] = self._default_val(v, k in numeric_fields)
-                
-                records.append(processed_rec)
-            
-            # Insert nhiều document cùng lúc
-            result = await self.collection.insert_many(records)
-            
+            if df_renamed.empty:
+                return {"success": True, "inserted_count": 0, "duplicate_count": 0}
+
+            # Chuẩn hoá theo cột rồi mới chuyển thành document
+            df_norm = self._normalize_dataframe(df_renamed)
+            df_norm['row_hash'] = self._row_hashes(df_norm)
+            # Ghép document từ các cột (nhanh hơn to_dict(orient='records') trên DataFrame object)
+            keys = list(df_norm.columns)
+            records = [dict(zip(keys, row)) for row in zip(*(df_norm[k].tolist() for k in keys))]
+
+            await self.ensure_indexes()
+
+            # Chia thành các khối insert_chunk_size document, tối đa insert_concurrency khối cùng lúc
+            slots = asyncio.Semaphore(max(1, self.insert_concurrency))
+            chunk_size = max(1, self.insert_chunk_size)
+            inserted_counts = await asyncio.gather(*(
+                self._insert_chunk(records[i:i + chunk_size], slots)
+                for i in range(0, len(records), chunk_size)
+            ))
+            inserted_count = sum(inserted_counts)
+
             return {
                 "success": True,
-                "inserted_count": len(result.inserted_ids),
-                "inserted_ids": [str(id) for id in result.inserted_ids]
+                "inserted_count": inserted_count,
+                "duplicate_count": len(records) - inserted_count
             }
             
         except Exception as e:
@@ -210,6 +370,9 @@ class MongoDBManager:
             Dict thông tin kết quả thao tác
         """
         try:
+            # Bỏ dấu vân tay để có thể upload lại đúng file này
+            await self.files_collection.delete_many({"file_name": file_name})
+
             # kiểm tra xem có document nào có file_name tương ứng không
             find_result = await self.collection.find_one({"file_name": file_name})
             if find_result is None:
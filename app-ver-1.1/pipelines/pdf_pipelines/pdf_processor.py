@@ -11,6 +11,7 @@ from concurrent.futures import ThreadPoolExecutor
 from .image_processor import ImagePreprocessor
 from .yolo_detector import YoloProcessor 
 from llms.gpt_ocr import ImageOCR
+from utils.query_processor import hs_code_levels
 
 
 import logging
@@ -61,7 +62,7 @@ digit_to_word = {
 def number_to_words(number: str) -> str:
     return " ".join(digit_to_word.get(c, c) for c in number)
 
-def chunk_and_prefix(text: str, overlap_ratio: float = 0.10) -> List[str]:
+def chunk_and_prefix(text: str, overlap_ratio: float = 0.10, hs_code: str = None) -> List[str]:
     words = text.split()
     total_words = len(words)
 
@@ -84,8 +85,9 @@ def chunk_and_prefix(text: str, overlap_ratio: float = 0.10) -> List[str]:
         overlapped.append(" ".join(cur + nxt[:ov_n]))
     overlapped.append(raw_chunks[-1])
 
-    # Trích mã HS
-    hs_code = extract_hs_code(text)
+    # Trích mã HS (nếu nơi gọi chưa trích)
+    if hs_code is None:
+        hs_code = extract_hs_code(text)
     hs_code_in_words = number_to_words(hs_code) if hs_code else None
 
     # Tạo các chunk có header
@@ -202,10 +204,15 @@ def pdf_processor_pipeline(
     # print(document_text)
 
     # 2) Chunk & prefix HS
-    segments = chunk_and_prefix(document_text, overlap_ratio=overlap_ratio)
+    hs_code = extract_hs_code(document_text)
+    segments = chunk_and_prefix(document_text, overlap_ratio=overlap_ratio, hs_code=hs_code)
 
     # 3) Output JSON with metadata
     base = os.path.splitext(os.path.basename(pdf_path))[0]
     metadata = {"file_name": base, "file_type": ".pdf"}
+    if hs_code:
+        # Mã HS và các cấp của nó (có payload index) cho tra cứu chính xác theo mã trong chat
+        metadata["hs_code"] = hs_code
+        metadata["hs_code_levels"] = hs_code_levels(hs_code)
     data = [{"content": seg, "metadata": metadata} for seg in segments]
     return json.dumps(data, ensure_ascii=False, indent=4)
@@ -1,5 +1,5 @@
 from .vector_store import VectorStoreManager
-from typing import List
+from typing import Any, Dict, List, Optional
 from langchain_core.documents import Document
 
 class SearchEngine:
@@ -11,19 +11,24 @@ class SearchEngine:
         self.vector_store = vector_store
         self.threshold = threshold
 
-    async def retrieve(self, query: str, top_k: int = 20) -> List[Document]:
+    async def retrieve(self, query: str, top_k: int = 20,
+                       payload_filter: Optional[Dict[str, Any]] = None) -> List[Document]:
         """
         Lấy danh sách tài liệu ban đầu từ vector_store rồi lọc lại theo threshold.
 
         Args:
             query (str): Truy vấn tìm kiếm.
             top_k (int): Số lượng tài liệu cần trả về.
+            payload_filter (dict, optional): Chỉ tìm trong một phần dữ liệu theo metadata,
+                vd {"file_type": ".pdf"} (xem VectorStoreManager.build_filter).
 
         Returns:
             List[Document]: Danh sách tài liệu đã được lọc theo threshold.
         """
         # Lấy candidate documents từ vector store.
-        candidates_with_scores = await self.vector_store.get_relevant_documents_with_scores(query, top_k)
+        candidates_with_scores = await self.vector_store.get_relevant_documents_with_scores(
+            query, top_k, metadata_filter=payload_filter
+        )
         
         # Lọc doc có score >= threshold
         filtered_docs = []
@@ -37,3 +42,16 @@ class SearchEngine:
 
         # Trả về top_k doc
         return filtered_docs[:top_k]
+
+    async def lookup_hs_codes(self, query: str, hs_codes: List[str], top_k: int = 10) -> List[Document]:
+        """
+        Tra cứu các chunk PDF phân loại theo mã HS (chỉ chữ số, vd ['8471'] hoặc ['84713020']):
+        vector search chỉ trong các point có metadata.hs_code_levels khớp (payload index), xếp theo
+        độ tương đồng với câu hỏi. Bộ lọc đã bảo đảm đúng mã nên không áp threshold và không cần rerank.
+        """
+        if not hs_codes:
+            return []
+        candidates_with_scores = await self.vector_store.get_relevant_documents_with_scores(
+            query, top_k, metadata_filter={"hs_code_levels": hs_codes}
+        )
+        return [doc for doc, _ in candidates_with_scores]
@@ -5,13 +5,32 @@ import re
 import math
 import numpy as np
 import datetime
+from typing import Iterator, Optional, Set
+from openpyxl import load_workbook
 # from pymongo import MongoClient
 # from dotenv import load_dotenv
-from utils.country_mapping import get_keywords_from_country
+from utils.country_mapping import get_country_code
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Regex biên dịch sẵn cho bước làm sạch
+LEADING_MARKERS = re.compile(r"^(?:#&\s*)+")
+TRAILING_MARKERS = re.compile(r"(?:\s*#&)+\Z")
+SUPPLIER_LTD_PREFIX = re.compile(r"(?<!\., )\bLTD\b")
+SUPPLIER_LTD_SUFFIX = re.compile(r"\bLTD\b(?!\.)(?=\s|$)")
+SUPPLIER_DOT_SPACES = re.compile(r"\s*\.\s*")
+SUPPLIER_COMMA_SPACES = re.compile(r"\s*,\s*")
+SUPPLIER_MULTI_DOTS = re.compile(r"\.{2,}")
+SUPPLIER_MULTI_COMMAS = re.compile(r",{2,}")
+SUPPLIER_PUNCT_RUN = re.compile(r"([.,]+)")
+
+# Kiểu suy ra (pd.api.types.infer_dtype) chắc chắn không chứa Timestamp / date
+NON_DATE_INFERRED_TYPES = {
+    "string", "empty", "bytes", "floating", "integer", "mixed-integer-float",
+    "decimal", "boolean", "categorical",
+}
+
 
 # Chuyển tên cột tiếng Việt sang tên trường MongoDB (English snake_case)
 FIELD_MAP = {
@@ -30,35 +49,79 @@ FIELD_MAP = {
     'Thuế suất BVMT': 'thue_suat_bvmt',
     'Trạng thái': 'tinh_trang',
     'file_name': 'file_name',
-    'Từ khóa xuất xứ': 'xuat_xu_keywords' 
+    'Mã xuất xứ': 'xuat_xu_code'
 }
 
 
 def xlsx_to_df(file_path: str) -> pd.DataFrame:
     logger.info(f"[xlsx_to_df] Đang đọc file Excel: {file_path}")
     df = pd.read_excel(file_path, engine='openpyxl')
-    df = df.copy(deep=True)
     logger.info(f"[xlsx_to_df] Đọc xong file Excel, shape={df.shape}")
     return df
 
 
+def iter_xlsx_chunks(file_path: str, chunk_size: int = 5000) -> Iterator[pd.DataFrame]:
+    """
+    Đọc sheet đầu tiên theo từng khối `chunk_size` dòng (openpyxl read_only + iter_rows),
+    dòng đầu là tiêu đề. Bộ nhớ tối đa phụ thuộc vào chunk_size chứ không phụ thuộc kích thước file.
+    Bỏ qua các dòng trống hoàn toàn.
+    """
+    logger.info(f"[iter_xlsx_chunks] Đang đọc file Excel theo khối {chunk_size} dòng: {file_path}")
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        chunk = []
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            chunk.append(values[:len(columns)])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        wb.close()
+
+
 def remove_unwanted_chars(text: str) -> str:
-    if not isinstance(text, str):
+    if not isinstance(text, str) or ("#&" not in text and "'" not in text):
         return text
-    while text.startswith("#&"):
-        text = text[2:].lstrip()
-    while text.endswith("#&"):
-        text = text[:-2].rstrip()
-    text = text.replace("'", "")
-    text = text.replace("#&", ",")
-    return text
+    text = LEADING_MARKERS.sub("", text)
+    text = TRAILING_MARKERS.sub("", text)
+    return text.replace("'", "").replace("#&", ",")
+
+
+def remove_unwanted_chars_series(series: pd.Series) -> pd.Series:
+    """
+    remove_unwanted_chars cho cả cột: mỗi giá trị khác nhau chỉ xử lý một lần,
+    chỉ các ô thực sự thay đổi mới được ghi lại; giá trị không phải chuỗi giữ nguyên.
+    """
+    uniques = series.unique()
+    if len(uniques) * 2 > len(series):
+        # Cột gần như không lặp lại: xử lý trực tiếp từng ô rẻ hơn
+        return series.apply(remove_unwanted_chars)
+    changed = {}
+    for value in uniques:
+        if isinstance(value, str):
+            cleaned = remove_unwanted_chars(value)
+            if cleaned != value:
+                changed[value] = cleaned
+    if not changed:
+        return series
+    mask = series.isin(list(changed))
+    return series.mask(mask, series[mask].map(changed))
 
 
 def clean_special_chars_in_str_cols(df: pd.DataFrame) -> pd.DataFrame:
     logger.info("[clean_special_chars_in_str_cols] Bắt đầu xử lý cột kiểu chuỗi.")
     for col in df.columns:
         if pd.api.types.is_object_dtype(df[col]):
-            df.loc[:, col] = df[col].apply(remove_unwanted_chars)
+            df.loc[:, col] = remove_unwanted_chars_series(df[col])
     logger.info("[clean_special_chars_in_str_cols] Xong xử lý cột kiểu chuỗi.")
     return df
 
@@ -66,14 +129,13 @@ def clean_special_chars_in_str_cols(df: pd.DataFrame) -> pd.DataFrame:
 def process_supplier_name(text: str) -> str:
     if not isinstance(text, str):
         return text
-    text = re.sub(r"(?<!\., )\bLTD\b", r"., LTD", text)
-    text = re.sub(r"\bLTD\b(?!\.)(?=\s|$)", r"LTD.", text)
-    text = re.sub(r"\s*\.\s*", ".", text)
-    text = re.sub(r"\s*,\s*", ",", text)
-    text = re.sub(r"\.{2,}", ".", text)
-    text = re.sub(r",{2,}", ",", text)
-    text = re.sub(
-        r"([.,]+)",
+    text = SUPPLIER_LTD_PREFIX.sub(r"., LTD", text)
+    text = SUPPLIER_LTD_SUFFIX.sub(r"LTD.", text)
+    text = SUPPLIER_DOT_SPACES.sub(".", text)
+    text = SUPPLIER_COMMA_SPACES.sub(",", text)
+    text = SUPPLIER_MULTI_DOTS.sub(".", text)
+    text = SUPPLIER_MULTI_COMMAS.sub(",", text)
+    text = SUPPLIER_PUNCT_RUN.sub(
         lambda m: ".," if '.' in m.group(0) and ',' in m.group(0) else m.group(0),
         text
     )
@@ -83,15 +145,55 @@ def process_supplier_name(text: str) -> str:
 def process_supplier_column(df: pd.DataFrame) -> pd.DataFrame:
     if 'Nhà cung cấp' in df.columns:
         logger.info("[process_supplier_column] Bắt đầu xử lý cột 'Nhà cung cấp'.")
-        df.loc[:, 'Nhà cung cấp'] = df['Nhà cung cấp'].astype(str).apply(process_supplier_name)
+        suppliers = df['Nhà cung cấp'].astype(str)
+        # Chuẩn hoá một lần cho mỗi tên khác nhau rồi ánh xạ lại
+        normalized = {name: process_supplier_name(name) for name in suppliers.unique()}
+        df.loc[:, 'Nhà cung cấp'] = suppliers.map(normalized)
         logger.info("[process_supplier_column] Xong xử lý cột 'Nhà cung cấp'.")
     return df
 
 
-def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+def _canonical_column(values: pd.Series) -> pd.Series:
+    """
+    Dạng chuỗi chuẩn của một cột khi so trùng giữa các khối, tính theo cả cột: số -> chuỗi của float
+    (1 / 1.0 / 1.00 như nhau), ngày -> isoformat, ô trống / NaN / NaT -> "". Không phụ thuộc dtype
+    mà pandas suy ra riêng cho từng khối.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype(str)
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.astype(float)
+        return numbers.astype(str).where(numbers.notna(), "")
+    if pd.api.types.is_datetime64_any_dtype(values):
+        codes, uniques = pd.factorize(values)
+        iso = np.array([u.isoformat() for u in uniques] + [""], dtype=object)
+        return pd.Series(iso[codes], index=values.index)
+    text = values.astype(object)
+    empty = text.isna()
+    if pd.api.types.infer_dtype(text, skipna=True) in ("string", "empty"):
+        return text.where(~empty, "")
+    # Cột lẫn số và chuỗi: chỉ các ô kiểu số mới quy về float
+    is_str = text.map(type) == str
+    numbers = pd.to_numeric(text.where(~is_str), errors="coerce")
+    canonical = text.astype(str).where(numbers.isna(), numbers.astype(str))
+    return canonical.where(~empty, "")
+
+
+def remove_duplicates(df: pd.DataFrame, seen_hashes: Optional[Set[int]] = None) -> pd.DataFrame:
+    """
+    Loại bỏ dòng trùng lặp. Khi đọc theo khối, truyền cùng một `seen_hashes`
+    để loại cả các dòng đã xuất hiện ở khối trước (chỉ giữ hash 8 byte mỗi dòng).
+    """
     logger.info("[remove_duplicates] Bắt đầu loại bỏ dòng trùng lặp.")
     before = len(df)
     df = df.drop_duplicates(keep='first')
+    if seen_hashes is not None and len(df):
+        # Hash trên dạng chuẩn của từng ô để không phụ thuộc dtype suy ra ở từng khối (1 / 1.0)
+        canonical = pd.DataFrame({col: _canonical_column(df[col]) for col in df.columns})
+        hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+        is_new = np.fromiter((h not in seen_hashes for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        seen_hashes.update(hashes[is_new].tolist())
+        df = df[is_new]
     after = len(df)
     logger.info(f"[remove_duplicates] Đã loại bỏ {before - after} dòng trùng lặp. Còn {after} dòng.")
     return df.copy(deep=True)
@@ -110,7 +212,8 @@ def df_processor(df: pd.DataFrame) -> pd.DataFrame:
     for col in tz_cols:
         df.loc[:, col] = df[col].dt.tz_localize(None)
     for col in df.select_dtypes(include=['object']).columns:
-        if col != 'Ngày':
+        # Chỉ duyệt từng ô khi cột thực sự có thể chứa giá trị ngày
+        if col != 'Ngày' and pd.api.types.infer_dtype(df[col], skipna=True) not in NON_DATE_INFERRED_TYPES:
             df.loc[:, col] = df[col].apply(
                 lambda x: x.isoformat() if isinstance(x, (pd.Timestamp, datetime.date)) and not pd.isnull(x) else x
             )
@@ -129,14 +232,14 @@ def create_file_name_column(df: pd.DataFrame, file_path: str) -> pd.DataFrame:
 
 def process_country_origin(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Xử lý cột xuất xứ và tạo thêm cột từ khóa xuất xứ
+    Xử lý cột xuất xứ và tạo thêm cột mã ISO của nước xuất xứ ('' nếu không nhận ra).
+    Mỗi giá trị khác nhau chỉ tra COUNTRY_LOOKUP một lần.
     """
     if 'Tên nước xuất xứ' in df.columns:
         logger.info("[process_country_origin] Bắt đầu xử lý cột 'Tên nước xuất xứ'.")
-        # Thêm cột mới chứa tất cả từ khóa liên quan đến xuất xứ
-        df['Từ khóa xuất xứ'] = df['Tên nước xuất xứ'].apply(
-            lambda x: get_keywords_from_country(x) if x else []
-        )
+        origins = df['Tên nước xuất xứ']
+        codes = {v: get_country_code(v) or '' for v in origins.dropna().unique()}
+        df['Mã xuất xứ'] = origins.map(codes).fillna('')
         logger.info("[process_country_origin] Xong xử lý cột 'Tên nước xuất xứ'.")
     return df
 
@@ -168,10 +271,9 @@ def determine_status_column(df: pd.DataFrame) -> str:
 
 
 
-def xlsx_processor_pipeline(file_path: str, field_map: dict = FIELD_MAP) -> pd.DataFrame:
-    logger.info(f"[xlsx_processor_pipeline] Bắt đầu, file_path={file_path}")
-    df = xlsx_to_df(file_path)
-
+def process_chunk(df: pd.DataFrame, file_path: str, field_map: dict = FIELD_MAP,
+                  seen_hashes: Optional[Set[int]] = None) -> pd.DataFrame:
+    """Các bước làm sạch cho một khối dòng, trả về DataFrame sẵn sàng để upload_dataframe."""
     # Xác định và thêm cột Trạng thái
     status = determine_status_column(df)
     df['Trạng thái'] = status
@@ -191,13 +293,31 @@ def xlsx_processor_pipeline(file_path: str, field_map: dict = FIELD_MAP) -> pd.D
     # Tiếp tục xử lý
     df = df_processor(df)
     df = process_supplier_column(df)
-    df = remove_duplicates(df)
+    df = remove_duplicates(df, seen_hashes)
+    if df.empty:
+        return df
     df = create_file_name_column(df, file_path)
     df = process_country_origin(df)  # Thêm xử lý xuất xứ
 
     df.columns = list(field_map.keys())[:len(df.columns)]
-    # Lưu lên MongoDB
+    return df
+
+
+def iter_processed_chunks(file_path: str, chunk_size: int = 5000, field_map: dict = FIELD_MAP) -> Iterator[pd.DataFrame]:
+    """Đọc và làm sạch file Excel theo từng khối; loại trùng lặp xuyên suốt các khối."""
+    logger.info(f"[iter_processed_chunks] Bắt đầu, file_path={file_path}")
+    seen_hashes: Set[int] = set()
+    for chunk_no, chunk in enumerate(iter_xlsx_chunks(file_path, chunk_size), start=1):
+        df = process_chunk(chunk, file_path, field_map, seen_hashes)
+        logger.info(f"[iter_processed_chunks] Khối {chunk_no}: {len(chunk)} dòng đọc, {len(df)} dòng sau làm sạch")
+        if not df.empty:
+            yield df
 
+
+def xlsx_processor_pipeline(file_path: str, field_map: dict = FIELD_MAP) -> pd.DataFrame:
+    logger.info(f"[xlsx_processor_pipeline] Bắt đầu, file_path={file_path}")
+    chunks = list(iter_processed_chunks(file_path, field_map=field_map))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(field_map.keys()))
     logger.info("[xlsx_processor_pipeline] Hoàn thành pipeline xử lý file Excel.")
     return df
 
@@ -48,8 +48,7 @@ MONGODB_FIELD_MAP = {
     'Loại hình': 'loai_hinh',
     'Tên nước xuất xứ': 'xuat_xu',
     'Điều kiện giao hàng': 'dieu_kien_giao_hang',
-    'Trạng thái': 'tinh_trang',
-    'Tên nước xuất xứ': 'xuat_xu_keywords' 
+    'Trạng thái': 'tinh_trang'
 }
 
 # Field map đảo ngược từ tên trường MongoDB sang tên cột tiếng Việt
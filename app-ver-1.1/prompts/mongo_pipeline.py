@@ -39,7 +39,7 @@ GENERATE_SEARCH_QUERY_SCHEMA = {
                 "properties": {
                     "ten_hang": {"type": "string", "description": "Search term for ten_hang field using fuzzy match"},
                     "nha_cung_cap": {"type": "string", "description": "Search term for nha_cung_cap field using fuzzy match"},
-                    "xuat_xu_keywords": {"type": "string", "description": "Tên quốc gia hoặc mã quốc gia để tìm kiếm theo xuất xứ với fuzzy match"}
+                    "xuat_xu_keywords": {"type": "string", "description": "Tên quốc gia hoặc mã quốc gia xuất xứ; quốc gia nhận ra được sẽ lọc chính xác theo mã ISO, còn lại tìm fuzzy"}
                 }
             },
             "regex_search": {
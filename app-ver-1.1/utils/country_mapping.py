@@ -1,4 +1,7 @@
 # country_mapping.py
+from functools import lru_cache
+from typing import Dict, Optional
+
 COUNTRY_MAPPINGS = {
     "AF": {"name": "Afghanistan",               "aliases": ["Afghanistan", "AF", "Afganistan"]},
     "AL": {"name": "Albania",                   "aliases": ["Albania", "AL", "Shqipëri"]},
@@ -192,41 +195,68 @@ COUNTRY_MAPPINGS = {
 }
 
 
+def _normalize(text) -> str:
+    """Khoá tra cứu: bỏ khoảng trắng thừa, chữ thường."""
+    return " ".join(str(text).split()).lower()
+
+
+def _build_exact_lookup() -> Dict[str, str]:
+    """
+    Tên / alias / mã (đã chuẩn hoá) -> mã ISO, dựng một lần khi import.
+    Thứ tự ưu tiên giữ như cách tra tuần tự trước đây: mã > tên chính thức > alias,
+    trong cùng một nhóm thì quốc gia đứng trước trong COUNTRY_MAPPINGS thắng.
+    """
+    lookup: Dict[str, str] = {}
+    for code, info in COUNTRY_MAPPINGS.items():
+        for alias in info["aliases"]:
+            lookup.setdefault(_normalize(alias), code)
+    names: Dict[str, str] = {}
+    for code, info in COUNTRY_MAPPINGS.items():
+        names.setdefault(_normalize(info["name"]), code)
+    lookup.update(names)
+    lookup.update({code.lower(): code for code in COUNTRY_MAPPINGS})
+    return lookup
+
+
+COUNTRY_LOOKUP = _build_exact_lookup()
+# Dùng cho bước tìm một phần (chuỗi con), theo thứ tự COUNTRY_MAPPINGS
+_PARTIAL_TERMS = [
+    (code, [info["name"].lower()] + [alias.lower() for alias in info["aliases"]])
+    for code, info in COUNTRY_MAPPINGS.items()
+]
+
+
+@lru_cache(maxsize=4096)
+def get_country_code(country_code_or_name, partial: bool = True) -> Optional[str]:
+    """
+    Mã ISO của quốc gia từ mã / tên / alias; None nếu không nhận ra.
+    Khớp chính xác qua COUNTRY_LOOKUP (O(1)); chỉ khi không khớp (và partial=True) mới quét chuỗi con,
+    và kết quả được nhớ theo từng giá trị đầu vào.
+    """
+    if not country_code_or_name:
+        return None
+    input_text = str(country_code_or_name).strip()
+    code = COUNTRY_LOOKUP.get(_normalize(input_text))
+    if code is not None or not partial:
+        return code
+
+    lowered = input_text.lower()
+    for code, terms in _PARTIAL_TERMS:
+        for term in terms:
+            if lowered in term or term in lowered:
+                return code
+    return None
+
+
 def get_keywords_from_country(country_code_or_name):
     """Lấy tất cả từ khóa có thể của một quốc gia từ mã hoặc tên"""
     # Chuẩn hóa đầu vào
     if not country_code_or_name:
         return []
-    
-    input_text = str(country_code_or_name).strip()
-    
-    # 1. Kiểm tra xem đầu vào có phải là mã quốc gia không
-    if input_text.upper() in COUNTRY_MAPPINGS:
-        code = input_text.upper()
-        info = COUNTRY_MAPPINGS[code]
-        return [code, info["name"]] + info["aliases"]
-    
-    # 2. Tìm trong tên chính thức
-    for code, info in COUNTRY_MAPPINGS.items():
-        if input_text.lower() == info["name"].lower():
-            return [code, info["name"]] + info["aliases"]
-    
-    # 3. Tìm trong aliases
-    for code, info in COUNTRY_MAPPINGS.items():
-        for alias in info["aliases"]:
-            if input_text.lower() == alias.lower():
-                return [code, info["name"]] + info["aliases"]
-    
-    # 4. Tìm một phần
-    for code, info in COUNTRY_MAPPINGS.items():
-        # Kiểm tra tên chính
-        if input_text.lower() in info["name"].lower() or info["name"].lower() in input_text.lower():
-            return [code, info["name"]] + info["aliases"]
-        
-        # Kiểm tra aliases
-        for alias in info["aliases"]:
-            if input_text.lower() in alias.lower() or alias.lower() in input_text.lower():
-                return [code, info["name"]] + info["aliases"]
-    
-    # Nếu không tìm thấy, trả về input ban đầu
-    return [input_text]
\ No newline at end of file
+
+    code = get_country_code(country_code_or_name)
+    if code is None:
+        # Nếu không tìm thấy, trả về input ban đầu
+        return [str(country_code_or_name).strip()]
+    info = COUNTRY_MAPPINGS[code]
+    return [code, info["name"]] + info["aliases"]
@@ -1,4 +1,6 @@
 import re
+import unicodedata
+from typing import Any, Dict, List, Optional
 
 digit_to_word = {
     "0": "KHÔNG", "1": "MỘT", "2": "HAI", "3": "BA", "4": "BỐN",
@@ -31,3 +33,68 @@ def process_query(text: str) -> str:
         return text.strip() + ",".join(explanations)
     else:
         return text
+
+
+# Mã HS có dấu chấm: 8471.30, 8471.30.20, 84.71.30.20 (cho phép khoảng trắng quanh dấu chấm)
+_DOTTED_HS_PATTERN = re.compile(r"\b(?:\d{4}(?:\s*\.\s*\d{2}){1,3}|\d{2}(?:\s*\.\s*\d{2}){3})\b")
+# Mã HS chỉ gồm chữ số (4 / 6 / 8 / 10 số) phải đi sau "mã", "hs", "nhóm"... để không nhầm với năm, số văn bản
+# (không lấy phần đầu của mã có dấu chấm: "mã HS 8471.30.20" chỉ cho 84713020)
+_BARE_HS_PATTERN = re.compile(
+    r"\b(?:ma(?: so)?(?: hs)?|hs(?: code)?|nhom|phan nhom)\s*:?\s*(\d{4}(?:\d{2}){0,3})\b(?![\s.]*\d)"
+)
+# Ngày tháng viết bằng dấu chấm ("ngày 2024.01.15") có dạng giống mã HS
+_DATE_CUE_PATTERN = re.compile(r"\b(?:ngay|thang|nam|date)\s*:?\s*$")
+
+
+def hs_code_levels(code: str) -> List[str]:
+    """
+    Các cấp của một mã HS (chỉ chữ số): '8471.30.20' -> ['8471', '847130', '84713020'].
+    Lưu vào metadata của chunk để câu hỏi về nhóm 8471 cũng khớp các phân nhóm của nó.
+    """
+    digits = re.sub(r"\D", "", code or "")
+    if len(digits) < 4:
+        return []
+    return [digits[:n] for n in range(4, len(digits) + 1, 2)]
+
+
+def extract_query_hs_codes(text: str) -> List[str]:
+    """Các mã HS (chỉ chữ số, không trùng, giữ thứ tự) mà câu hỏi nhắc tới."""
+    folded = _fold(text)
+    codes = [
+        re.sub(r"\D", "", m.group(0)) for m in _DOTTED_HS_PATTERN.finditer(folded)
+        if not _DATE_CUE_PATTERN.search(folded, 0, m.start())
+    ]
+    codes += _BARE_HS_PATTERN.findall(folded)
+    return list(dict.fromkeys(c for c in codes if len(c) in (4, 6, 8, 10)))
+
+
+# Cụm từ (đã bỏ dấu) cho thấy câu hỏi nhắm vào một nhóm tài liệu trên Qdrant
+_CORPUS_PATTERNS = {
+    # PDF: thông báo kết quả phân tích phân loại hàng hoá
+    ".pdf": re.compile(r"\b(phan tich phan loai|ket qua phan loai|thong bao ket qua)\b"),
+    # DOC/DOCX: văn bản pháp luật
+    ".doc": re.compile(r"\b(thong tu|nghi dinh|quyet dinh so|cong van|van ban phap luat|luat hai quan)\b"),
+}
+_CORPUS_FILTERS = {
+    ".pdf": {"file_type": ".pdf"},
+    ".doc": {"file_type": [".doc", ".docx"]},
+}
+
+
+def _fold(text: str) -> str:
+    """Bỏ dấu tiếng Việt, chữ thường, gộp khoảng trắng."""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    stripped = "".join(ch for ch in unicodedata.normalize("NFD", text) if unicodedata.category(ch) != "Mn")
+    return " ".join(stripped.lower().split())
+
+
+def detect_corpus_filter(prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    Bộ lọc metadata cho SearchEngine.retrieve khi câu hỏi rõ ràng chỉ nhắm vào một nhóm tài liệu
+    (kết quả phân loại PDF hoặc văn bản pháp luật Word); khớp cả hai hoặc không khớp nhóm nào thì None.
+    """
+    folded = _fold(prompt)
+    matched = [corpus for corpus, pattern in _CORPUS_PATTERNS.items() if pattern.search(folded)]
+    if len(matched) != 1:
+        return None
+    return _CORPUS_FILTERS[matched[0]]
@@ -7,6 +7,7 @@ import sys
 sys.path.append('../') 
 
 from pipelines.llm_pipelines.response_generator import LangChainGenerator
+from utils.corpus_filter import detect_corpus_filter
 
 router = APIRouter()
 logging.basicConfig(level=logging.INFO)
@@ -74,10 +75,15 @@ async def chat(
                 return {"response": agent_result}
             else:
                 # Nếu không dùng tool, thực hiện truy vấn RAG
+                # Câu hỏi rõ ràng nhắm vào một nhóm tài liệu (PDF phân loại / văn bản Word) thì lọc theo file_type
+                corpus_filter = detect_corpus_filter(prompt)
                 search_engine = await request.app.state.search_engine_queue.get()
                 try:
-                    retrieved_docs = await search_engine.retrieve(prompt, top_k=10)
-                    logger.info(f"Retrieved {len(retrieved_docs)} documents for query: {prompt}")
+                    retrieved_docs = await search_engine.retrieve(prompt, top_k=10, payload_filter=corpus_filter)
+                    if corpus_filter and not retrieved_docs:
+                        # Không có tài liệu phù hợp trong nhóm đã lọc: tìm lại trên toàn bộ collection
+                        retrieved_docs = await search_engine.retrieve(prompt, top_k=10)
+                    logger.info(f"Retrieved {len(retrieved_docs)} documents for query: {prompt} (filter={corpus_filter})")
                 finally:
                     await request.app.state.search_engine_queue.put(search_engine)
 
@@ -1,9 +1,11 @@
 import os
 import logging
+import asyncio
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
 from app.config import Config
+from utils.upload_store import remove_upload
 
 # Cấu hình logging
 logging.basicConfig(level=logging.INFO)
@@ -18,31 +20,57 @@ router = APIRouter()
 UPLOADED_FOLDER = "data/uploaded"
 os.makedirs(UPLOADED_FOLDER, exist_ok=True)
 
+async def delete_file_points(vector_store, entry: dict) -> None:
+    """
+    Xóa vector của một file trên Qdrant theo bản ghi FileRegistry: theo id point đã lưu, rồi theo
+    metadata (file_name và file_type, có payload index) để xóa cả chunk của các phiên bản cũ cùng tên
+    và của file nạp từ trước khi có registry.
+    """
+    if entry["point_ids"]:
+        await vector_store.delete_points_by_ids(entry["point_ids"])
+    await vector_store.delete_points_by_metadata(entry["file_name"], entry["file_type"])
+
+
+async def delete_replaced_file_points(request: Request, previous: dict) -> None:
+    """
+    Upload lại cùng tên với nội dung khác: xóa vector của bản cũ trước khi tạo job ingest bản mới
+    (gọi trước submit nên xóa theo metadata không đụng tới chunk của bản mới).
+    Lỗi chỉ ghi log; delete-uploaded-file vẫn xóa theo metadata sau này.
+    """
+    vector_store = await request.app.state.vector_store_queue.get()
+    try:
+        await delete_file_points(vector_store, previous)
+        logger.info(f"Đã xóa vector của bản cũ {previous['file_name']}{previous['file_type']} trên Qdrant.")
+    except Exception as e:
+        logger.error(f"Lỗi xóa vector bản cũ {previous['file_name']}{previous['file_type']}: {str(e)}")
+    finally:
+        await request.app.state.vector_store_queue.put(vector_store)
+
+
 @router.get("/uploaded-files")
-async def list_uploaded_files():
+async def list_uploaded_files(request: Request):
     """
-    Endpoint liệt kê các file đã upload trong thư mục 'data/uploaded'.
+    Endpoint liệt kê các file đã upload (đọc từ FileRegistry, không quét thư mục 'data/uploaded').
     Trả về danh sách file với:
       - file_name: phần base (không đuôi)
       - file_type: phần đuôi (có dấu chấm, vd ".xlsx")
       - file: gộp base + ext
+      - status, size, item_count: trạng thái ingest, kích thước, số chunk / dòng
     """
-    if not os.path.exists(UPLOADED_FOLDER):
-        logger.warning("Thư mục uploaded không tồn tại.")
-        raise HTTPException(status_code=404, detail="Thư mục uploaded không tồn tại.")
-    
-    files = os.listdir(UPLOADED_FOLDER)
+    entries = await asyncio.to_thread(request.app.state.file_registry.list)
     file_list = []
-    for f in files:
-        base, ext = os.path.splitext(f)  
+    for entry in entries:
         item = {
-            "file_name": base,   
-            "file_type": ext,    
-            "file": base + ext     
+            "file_name": entry["file_name"],
+            "file_type": entry["file_type"],
+            "file": entry["file_name"] + entry["file_type"],
+            "status": entry["status"],
+            "size": entry["size"],
+            "item_count": entry["item_count"],
         }
         file_list.append(item)
     
-    logger.info(f"Đã lấy danh sách {len(file_list)} file từ thư mục uploaded.")
+    logger.info(f"Đã lấy danh sách {len(file_list)} file từ FileRegistry.")
     return {"files": file_list}
 
 class UploadedFileDeletionRequest(BaseModel):
@@ -56,30 +84,34 @@ async def delete_uploaded_file(request: Request, deletion_request: UploadedFileD
     Endpoint xóa file được chọn trong thư mục "data/uploaded" và xóa các vector liên quan trên Qdrant.
 
     Quá trình:
-      - Kiểm tra file có tồn tại trong thư mục uploaded không.
-      - Xác định file_type từ phần mở rộng của file.
-      - Gọi hàm xóa trên Qdrant dựa theo metadata (file_name và file_type) từ app.state.vector_store.
-      - Xóa file khỏi thư mục uploaded.
+      - Tra file trong FileRegistry (không có thì 404).
+      - Xóa vector trên Qdrant theo id point đã lưu trong registry, sau đó theo metadata (file_name và
+        file_type) để không sót chunk của phiên bản cũ cùng tên hoặc file nạp trước khi có registry.
+      - Xóa file khỏi thư mục uploaded và khỏi registry.
     """
     base = deletion_request.file_name      
     ext = deletion_request.file_type        
     actual_filename = base + ext  
     uploaded_file_path = os.path.join(UPLOADED_FOLDER, actual_filename)
 
-    if not os.path.exists(uploaded_file_path):
+    registry = request.app.state.file_registry
+    entry = await asyncio.to_thread(registry.get, base, ext)
+    if entry is None:
         raise HTTPException(status_code=404, detail="File không tồn tại.")
 
+    vector_store = None
     try:
         vector_store = await request.app.state.vector_store_queue.get()
-        await vector_store.delete_points_by_metadata(base,  ext)
+        await delete_file_points(vector_store, entry)
         logging.info(f"Đã xóa vector của file {actual_filename} trên Qdrant.")
     except Exception as e:
         logging.error(f"Lỗi xóa vector: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Lỗi xóa vector: {str(e)}")
 
     try:
-        # Xóa file khỏi disk
-        os.remove(uploaded_file_path)
+        # Xóa file khỏi disk (cả bản trong kho nếu không còn tên nào trỏ tới)
+        await asyncio.to_thread(remove_upload, uploaded_file_path, entry["sha256"])
+        await asyncio.to_thread(registry.delete, base, ext)
         logging.info(f"Đã xóa file {actual_filename} khỏi thư mục uploaded.")
     except Exception as e:
         logging.error(f"Lỗi xóa file {actual_filename}: {str(e)}")
@@ -0,0 +1,30 @@
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("")
+async def list_jobs(request: Request, status: Optional[str] = None, limit: int = 50):
+    """
+    Endpoint liệt kê các job ingest gần nhất (mới nhất trước).
+    Lọc theo status: queued / running / succeeded / failed.
+    """
+    jobs = await asyncio.to_thread(request.app.state.job_store.list, status, min(limit, 500))
+    return {"jobs": jobs}
+
+
+@router.get("/{job_id}")
+async def get_job(request: Request, job_id: str):
+    """
+    Endpoint trả về trạng thái một job ingest: status, stage hiện tại, progress (0..1),
+    kết quả khi thành công hoặc thông báo lỗi khi thất bại.
+    """
+    job = await asyncio.to_thread(request.app.state.job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job.")
+    return job
@@ -1,75 +1,66 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-import os
 import sys
-import asyncio
 sys.path.append('../')  
 
-from pipelines.pdf_pipelines.pdf_processor import pdf_processor_pipeline
-from pipelines.llm_pipelines.data_preparation import DataLoader
+import asyncio
+
+from utils.upload_store import stage_upload, commit_upload, discard_upload, UploadTooLarge
+from api.delete_endpoint import delete_replaced_file_points
 
 
 router = APIRouter()
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_pdf(request: Request, file: UploadFile = File(...)):
     """
     Endpoint để upload và xử lý file PDF.
     - Nhận file `.pdf`, `.PDF`, kiểm tra định dạng và kích thước.
-    - Lưu file vào thư mục tạm cụ thể, xử lý bằng pdf_processor_pipeline, 
-      và lưu kết quả thành JSON với tên dựa trên file gốc.
-    - Tạo embedding cho các văn bản trong JSON và lưu vào Qdrant.
-    - Trả về trạng thái xử lý.
+    - Nội dung (SHA-256) đã có trong FileRegistry thì trả về ngay, không ingest lại.
+    - Nhận file theo từng khối vào kho data/uploaded rồi tạo job ingest ở nền:
+      pdf_processor_pipeline -> tạo embedding -> lưu vào Qdrant.
+    - Trả về job_id ngay; trạng thái và tiến độ từng stage xem qua GET /jobs/{job_id}.
     """
 
     # Kiểm tra định dạng file
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="File phải là pdf.")
 
-    # Kiểm tra kích thước file (tối đa 10MB)
-    contents = await file.read()
-    if len(contents) > 10 * 1024 * 1024:
+    # Nhận file theo từng khối ra đĩa (tối đa 10MB), tính SHA-256 trong lúc ghi
+    try:
+        staged = await stage_upload(file, max_bytes=10 * 1024 * 1024)
+    except UploadTooLarge:
         raise HTTPException(status_code=400, detail="File quá lớn, tối đa 10MB.")
-    
-    # Xác định thư mục tạm cụ thể cho file upload
-    save_dir = "data/uploaded"
-    os.makedirs(save_dir, exist_ok=True)
-    save_file_path = os.path.join(save_dir, file.filename)
-    
-    # Lưu file upload vào thư mục
-    with open(save_file_path, "wb") as save_file:
-        save_file.write(contents)
+    duplicate = staged.is_duplicate
 
-    # Xử lý file và bắt lỗi nếu có
-    loop = asyncio.get_running_loop()
-    try:
-       json_str =  pdf_processor_pipeline(save_file_path, model_path=request.app.state.config.YOLO_MODEL_PATH)
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Không tìm thấy file hoặc thư mục")
-    except PermissionError:
-        raise HTTPException(status_code=500, detail="Không có quyền truy cập thư mục")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lỗi xử lý: {str(e)}")
+    # Cùng nội dung đã (hoặc đang) được ingest: tra FileRegistry theo SHA-256, không tạo job mới.
+    # Kiểm tra và ghi registry trong cùng một transaction nên hai upload trùng đồng thời chỉ ingest một lần
+    registry = request.app.state.file_registry
+    existing, previous = await asyncio.to_thread(
+        registry.register_if_new, file.filename, staged.sha256, staged.size, "pdf"
+    )
+    if existing is not None:
+        await discard_upload(staged)
+        return {
+            "filename": file.filename,
+            "job_id": existing["job_id"],
+            "status": "Already uploaded",
+            "duplicate_of": existing["file_name"] + existing["file_type"],
+            "duplicate": True,
+        }
 
-    try:
-        dataloader = DataLoader(json_str, content="content")
-        texts = dataloader.prepare_data_from_json()
-        metadata = dataloader.prepare_metadata_from_json()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lỗi khi chuẩn bị dữ liệu: {str(e)}")
+    # Đưa vào kho theo nội dung, data/uploaded/<tên file> trỏ tới bản trong kho
+    save_file_path = await commit_upload(staged, file.filename)
 
-     # Lấy VectorStoreManager từ queue
-    vector_store = await request.app.state.vector_store_queue.get()
-    try:
-        # Tạo embedding và lưu vào Qdrant
-        await vector_store.store_embeddings(texts, metadata)
-    except Exception as e:
-        # Nếu có lỗi, vẫn trả VectorStoreManager về queue trước khi raise exception
-        await request.app.state.vector_store_queue.put(vector_store)
-        raise HTTPException(status_code=500, detail=f"Lỗi lưu embeddings vào Qdrant: {str(e)}")
-    finally:
-            # Trả VectorStoreManager về queue sau khi sử dụng
-        await request.app.state.vector_store_queue.put(vector_store)
+    if previous is not None:
+        # Cùng tên, nội dung khác: id point mới không trùng id cũ, xóa vector bản cũ trước khi ingest
+        await delete_replaced_file_points(request, previous)
 
+    # Xử lý ở nền: OCR / YOLO chạy trong process pool, embedding + Qdrant trong IngestionRunner
+    job = await request.app.state.ingestion_runner.submit(
+        "pdf", file.filename, save_file_path,
+        {"model_path": request.app.state.config.YOLO_MODEL_PATH, "sha256": staged.sha256}
+    )
+    await asyncio.to_thread(registry.set_job, save_file_path, job["id"])
 
-    # Trả về phản hồi
-    return {"filename": file.filename, "status": "Processed, embeddings created and saved to Qdrant"}
\ No newline at end of file
+    # Trả về job_id ngay, theo dõi tiến độ qua /jobs/{job_id}
+    return {"filename": file.filename, "job_id": job["id"], "status": job["status"], "duplicate": duplicate}
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-import mysql.connector
 import logging
 import os
+import asyncio
+
+from pipelines.xlsx_pipelines.xlsx_processor import delete_imported_data
+from utils.tool_result_cache import bump_data_generation
+from utils.upload_store import remove_upload
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -25,26 +29,26 @@ async def delete_by_file_name(request: Request, delete_req: DeleteRequest):
         raise HTTPException(status_code=500, detail="Database configuration not found.")
         
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
-        delete_query = """
-            DELETE FROM import_data WHERE file_name = %s
-        """
-        cursor.execute(delete_query, (file_name,))
-        conn.commit()
-        deleted_count = cursor.rowcount
-        cursor.close()
-        conn.close()
+        deleted_count = await asyncio.to_thread(delete_imported_data, db_config, file_name)
         logger.info("Đã xóa %s dòng với file_name = %s", deleted_count, file_name)
     except Exception as e:
         logger.error("Lỗi khi xóa dữ liệu: %s", e)
         raise HTTPException(status_code=500, detail=f"Error deleting data: {e}")
+
+    # Bỏ các dòng của file khỏi snapshot import_data (nếu bật)
+    snapshot = getattr(request.app.state, "import_data_snapshot", None)
+    if snapshot is not None:
+        await asyncio.to_thread(snapshot.remove_file, file_name)
+    bump_data_generation()
     
     try:
-         # Xóa file từ thư mục uploaded
+         # Xóa file từ thư mục uploaded (SHA-256 lấy từ FileRegistry, không phải đọc lại file)
+        registry = request.app.state.file_registry
+        entry = await asyncio.to_thread(registry.get, file_name, ".xlsx")
+        await asyncio.to_thread(registry.delete, file_name, ".xlsx")
         uploaded_file_path = f"data/uploaded/{file_name}.xlsx"
         if os.path.exists(uploaded_file_path):
-            os.remove(uploaded_file_path)
+            await asyncio.to_thread(remove_upload, uploaded_file_path, entry["sha256"] if entry else None)
             logger.info("Đã xóa file: %s", uploaded_file_path)
         else:
             logger.warning("File không tồn tại: %s", uploaded_file_path)
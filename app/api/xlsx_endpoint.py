@@ -1,5 +1,4 @@
 import logging
-import os
 import sys
 import asyncio
 
@@ -7,19 +6,22 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 
 sys.path.append('../')  
 
-from pipelines.xlsx_pipelines.xlsx_processor import xlsx_processor_pipeline
+from pipelines.xlsx_pipelines.xlsx_processor import find_imported_file, delete_imported_data
+from utils.file_registry import split_file_name
+from utils.tool_result_cache import bump_data_generation
+from utils.upload_store import stage_upload, commit_upload, discard_upload, UploadTooLarge
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_xlsx(request: Request, file: UploadFile = File(...)):
     """
     Endpoint để upload và xử lý file XLSX.
     - Nhận file `.xlsx`, kiểm tra định dạng và kích thước.
-    - Lưu file vào thư mục tạm cụ thể, xử lý bằng xlsx_processor_pipeline, 
-      và lưu kết quả vào MySQL.
-    - Trả về trạng thái xử lý.
+    - Nếu nội dung file (SHA-256) đã được ingest trước đó thì trả về ngay, không parse lại.
+    - Nhận file theo từng khối vào kho data/uploaded rồi tạo job ingest ở nền (xlsx_processor_pipeline -> MySQL).
+    - Trả về job_id ngay; trạng thái và tiến độ từng stage xem qua GET /jobs/{job_id}.
     """
 
     # Kiểm tra định dạng file
@@ -27,39 +29,57 @@ async def upload_xlsx(request: Request, file: UploadFile = File(...)):
         logger.error("[upload_xlsx] File không phải XLSX.")
         raise HTTPException(status_code=400, detail="File phải là XLSX.")
 
-    # Kiểm tra kích thước file
-    contents = await file.read()
-    if len(contents) > 10 * 1024 * 1024:
-        logger.error("[upload_xlsx] File quá lớn >10MB.")
-        raise HTTPException(status_code=400, detail="File quá lớn, tối đa 10MB.")
-    
-    # Lưu file tạm
-    save_dir = "data/uploaded"
-    os.makedirs(save_dir, exist_ok=True)
-    save_file_path = os.path.join(save_dir, file.filename)
+    # Nhận file theo từng khối ra đĩa, kiểm tra kích thước và tính SHA-256 trong lúc ghi
+    config = request.app.state.config
+    try:
+        staged = await stage_upload(file, max_bytes=config.XLSX_MAX_UPLOAD_MB * 1024 * 1024)
+    except UploadTooLarge:
+        logger.error(f"[upload_xlsx] File quá lớn >{config.XLSX_MAX_UPLOAD_MB}MB.")
+        raise HTTPException(status_code=400, detail=f"File quá lớn, tối đa {config.XLSX_MAX_UPLOAD_MB}MB.")
     
-    with open(save_file_path, "wb") as save_file:
-        save_file.write(contents)
-
-    logger.info(f"[upload_xlsx] Đã lưu file tạm: {save_file_path}")
-
     # Cấu hình DB
     db_config = request.app.state.db_config
-    # Xử lý file XLSX
-    # Do xlsx_processor_pipeline là hàm đồng bộ, ta có thể gọi trực tiếp
-    # hoặc đưa vào executor nếu muốn tránh block event loop.
-    try:
-        logger.info("[upload_xlsx] Bắt đầu gọi xlsx_processor_pipeline")
-        await asyncio.to_thread(xlsx_processor_pipeline, save_file_path, db_config)
-        logger.info("[upload_xlsx] Hoàn thành xlsx_processor_pipeline")
-    except FileNotFoundError:
-        logger.exception("[upload_xlsx] FileNotFoundError")
-        raise HTTPException(status_code=500, detail="Không tìm thấy file hoặc thư mục")
-    except PermissionError:
-        logger.exception("[upload_xlsx] PermissionError")
-        raise HTTPException(status_code=500, detail="Không có quyền truy cập thư mục")
-    except Exception as e:
-        logger.exception("[upload_xlsx] Exception")
-        raise HTTPException(status_code=500, detail=f"Lỗi xử lý: {str(e)}")
 
-    return {"filename": file.filename, "status": "Processed and saved to MySQL"}
+    # Re-upload đúng nội dung cũ: bỏ qua trước khi parse
+    # (bảng import_files cho các file ingest trước khi có registry, rồi FileRegistry: kiểm tra và ghi
+    # trong cùng một transaction nên hai upload trùng đồng thời chỉ ingest một lần)
+    sha256 = staged.sha256
+    registry = request.app.state.file_registry
+    previous = None
+    existing = await asyncio.to_thread(find_imported_file, db_config, sha256)
+    if existing is None:
+        existing, previous = await asyncio.to_thread(
+            registry.register_if_new, file.filename, sha256, staged.size, "xlsx"
+        )
+    if existing is not None:
+        await discard_upload(staged)
+        logger.info(f"[upload_xlsx] Nội dung đã được ingest từ file '{existing['file_name']}', bỏ qua.")
+        return {
+            "filename": file.filename,
+            "status": "Already imported",
+            "duplicate_of": existing["file_name"],
+            "inserted_rows": 0,
+        }
+
+    # Đưa vào kho theo nội dung, data/uploaded/<tên file> trỏ tới bản trong kho
+    save_file_path = await commit_upload(staged, file.filename)
+    logger.info(f"[upload_xlsx] Đã lưu file: {save_file_path}")
+
+    if previous is not None:
+        # Cùng tên, nội dung khác: bỏ các dòng của bản cũ, nếu không tool sẽ trả dữ liệu cũ lẫn mới
+        base_name = split_file_name(save_file_path)[0]
+        deleted = await asyncio.to_thread(delete_imported_data, db_config, base_name)
+        snapshot = getattr(request.app.state, "import_data_snapshot", None)
+        if snapshot is not None:
+            await asyncio.to_thread(snapshot.remove_file, base_name)
+        bump_data_generation()
+        logger.info(f"[upload_xlsx] Đã xóa {deleted} dòng của bản cũ '{base_name}'.")
+
+    # Xử lý ở nền: làm sạch + insert chạy trong process pool của IngestionRunner
+    job = await request.app.state.ingestion_runner.submit(
+        "xlsx", file.filename, save_file_path, {"sha256": sha256}
+    )
+    await asyncio.to_thread(registry.set_job, save_file_path, job["id"])
+
+    # Trả về job_id ngay, theo dõi tiến độ qua /jobs/{job_id}
+    return {"filename": file.filename, "job_id": job["id"], "status": job["status"]}
@@ -0,0 +1,130 @@
+"""
+Đo độ trễ /api/chat (p50 / p95 / p99) khi không có ingest và khi đang ingest một loạt file PDF.
+
+    python benchmark_chat_latency.py --base-url http://localhost:8000 --pdf-dir data/bench_pdfs
+
+Chạy một lần với INGESTION_MODE=inline và một lần với INGESTION_MODE=external
+(kèm `python ingestion_worker.py`) để so sánh ảnh hưởng của ingest lên luồng chat.
+Các PDF đã upload được xoá qua /delete khi xong (trừ khi có --keep) để lần chạy sau ingest lại từ đầu.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def report(label: str, latencies: List[float]) -> None:
+    if not latencies:
+        print(f"{label}: không có request thành công")
+        return
+    print(
+        f"{label}: n={len(latencies)} "
+        f"mean={statistics.mean(latencies) * 1000:.0f}ms "
+        f"p50={percentile(latencies, 50) * 1000:.0f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.0f}ms"
+    )
+
+
+async def chat_load(client: httpx.AsyncClient, args, stop: asyncio.Event) -> List[float]:
+    """`concurrency` người dùng gửi chat liên tục cho tới khi đủ số request hoặc `stop` được set."""
+    latencies: List[float] = []
+    remaining = args.requests
+
+    async def user():
+        nonlocal remaining
+        while remaining > 0 and not stop.is_set():
+            remaining -= 1
+            started = time.perf_counter()
+            resp = await client.post("/api/chat", json={"prompt": args.prompt, "package": args.package})
+            if resp.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    return latencies
+
+
+async def ingest_batch(client: httpx.AsyncClient, pdf_dir: str, uploaded: List[str]) -> List[str]:
+    """
+    Upload các PDF trong pdf_dir, tên file đã upload được thêm vào `uploaded` để dọn sau khi chạy.
+    File trùng nội dung với file đã ingest không tạo job mới, pha "đang ingest" sẽ không đo được gì: báo lỗi.
+    """
+    job_ids = []
+    for name in sorted(os.listdir(pdf_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        with open(os.path.join(pdf_dir, name), "rb") as f:
+            resp = await client.post("/pdf/upload", files={"file": (name, f, "application/pdf")})
+        resp.raise_for_status()
+        body = resp.json()
+        if body.get("duplicate_of") or not body.get("job_id"):
+            raise RuntimeError(
+                f"{name} đã được ingest (trùng {body.get('duplicate_of')}), không có job mới. "
+                f"Xoá file qua /delete/delete-uploaded-file hoặc dùng thư mục PDF khác rồi chạy lại."
+            )
+        uploaded.append(name)
+        job_ids.append(body["job_id"])
+    return job_ids
+
+
+async def delete_uploaded(client: httpx.AsyncClient, names: List[str]) -> None:
+    """Xoá các PDF benchmark đã upload (file + vector) để lần chạy sau ingest lại từ đầu."""
+    for name in names:
+        base, ext = os.path.splitext(name)
+        resp = await client.request(
+            "DELETE", "/delete/delete-uploaded-file", json={"file_name": base, "file_type": ext}
+        )
+        if resp.status_code != 200:
+            print(f"Không xoá được {name}: {resp.status_code} {resp.text}")
+
+
+async def wait_jobs(client: httpx.AsyncClient, job_ids: List[str], stop: asyncio.Event) -> None:
+    pending = set(job_ids)
+    while pending:
+        await asyncio.sleep(1)
+        for job_id in list(pending):
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("succeeded", "failed"):
+                pending.discard(job_id)
+    stop.set()
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300) as client:
+        report("Không ingest", await chat_load(client, args, asyncio.Event()))
+
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        uploaded: List[str] = []
+        try:
+            job_ids = await ingest_batch(client, args.pdf_dir, uploaded)
+            watcher = asyncio.create_task(wait_jobs(client, job_ids, stop))
+            latencies = await chat_load(client, args, stop)
+            await watcher
+            report(f"Đang ingest {len(job_ids)} PDF", latencies)
+            print(f"Thời gian ingest: {time.perf_counter() - started:.1f}s")
+        finally:
+            if not args.keep:
+                await delete_uploaded(client, uploaded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--pdf-dir", required=True, help="Thư mục chứa các file PDF dùng để ingest")
+    parser.add_argument("--prompt", default="Thủ tục nhập khẩu máy tính xách tay cần giấy tờ gì?")
+    parser.add_argument("--package", default="max_package")
+    parser.add_argument("--requests", type=int, default=200, help="Số request chat tối đa mỗi pha")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--keep", action="store_true", help="Không xoá các PDF đã upload sau khi chạy")
+    asyncio.run(main(parser.parse_args()))
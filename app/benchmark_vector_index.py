@@ -0,0 +1,158 @@
+"""
+So sánh các cấu hình index của Qdrant (HNSW, lượng tử hoá, lưu trên đĩa) trên dữ liệu thật: recall@k và độ trễ search.
+
+    python benchmark_vector_index.py --queries 200 --hnsw-ef 0,64,128
+
+Vector của collection QDRANT_COLLECTION_NAME được chép sang các collection tạm (tiền tố bench_index_),
+mỗi cấu hình một collection. Câu hỏi là các vector lấy mẫu từ chính collection, hoặc embed từ --query-file
+(mỗi dòng một câu). Ground truth là top-k của search exact trên collection gốc. Collection tạm bị xoá khi xong
+(trừ khi có --keep).
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from qdrant_client.async_qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import CollectionStatus, OptimizersConfigDiff, PointStruct
+
+from config import Config
+from pipelines.llm_pipelines.embedding_generator import EmbeddingGenerator
+from pipelines.rag_pipelines.vector_store import collection_options, search_params
+
+# (tên, tham số tạo collection, hệ số oversampling khi search)
+SETTINGS: List[Tuple[str, Dict[str, Any], float]] = [
+    ("hnsw m16/ef100", {}, 1.0),
+    ("hnsw m32/ef200", {"hnsw_m": 32, "hnsw_ef_construct": 200}, 1.0),
+    ("scalar int8", {"quantization": "scalar"}, 2.0),
+    ("binary", {"quantization": "binary"}, 3.0),
+    ("on_disk", {"on_disk": True}, 1.0),
+    ("scalar int8 + on_disk", {"quantization": "scalar", "on_disk": True}, 2.0),
+    ("binary + on_disk", {"quantization": "binary", "on_disk": True}, 3.0),
+]
+
+COLLECTION_PREFIX = "bench_index_"
+
+config = Config()
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def load_vectors(client: AsyncQdrantClient, collection: str) -> List[Tuple[Any, List[float]]]:
+    points: List[Tuple[Any, List[float]]] = []
+    offset = None
+    while True:
+        records, offset = await client.scroll(
+            collection_name=collection, limit=1024, offset=offset, with_payload=False, with_vectors=True
+        )
+        points.extend((r.id, r.vector) for r in records)
+        if offset is None:
+            return points
+
+
+async def search_ids(client: AsyncQdrantClient, collection: str, vector: List[float], top_k: int, params) -> List[Any]:
+    hits = await client.search(
+        collection_name=collection, query_vector=vector, limit=top_k,
+        search_params=params, with_payload=False, with_vectors=False
+    )
+    return [hit.id for hit in hits]
+
+
+async def build_collection(client: AsyncQdrantClient, name: str, points: List[Tuple[Any, List[float]]],
+                           options: Dict[str, Any], timeout: float = 1800) -> float:
+    """Tạo collection với cấu hình `options`, chép vector và chờ index HNSW xong; trả về thời gian build (giây)."""
+    if await client.collection_exists(name):
+        await client.delete_collection(name)
+    started = time.perf_counter()
+    # indexing_threshold nhỏ: luôn dựng HNSW, kể cả khi corpus chưa lớn
+    await client.create_collection(
+        collection_name=name,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1),
+        **collection_options(len(points[0][1]), **options)
+    )
+    for i in range(0, len(points), 256):
+        batch = points[i:i + 256]
+        await client.upsert(
+            collection_name=name, points=[PointStruct(id=pid, vector=vec) for pid, vec in batch], wait=True
+        )
+    while time.perf_counter() - started < timeout:
+        info = await client.get_collection(name)
+        if info.status == CollectionStatus.GREEN and (info.indexed_vectors_count or 0) >= len(points):
+            break
+        await asyncio.sleep(1)
+    else:
+        print(f"  {name}: quá {timeout:.0f}s mà index chưa xong, kết quả có thể chưa dùng HNSW")
+    return time.perf_counter() - started
+
+
+async def measure(client: AsyncQdrantClient, name: str, queries: List[List[float]], truth: List[List[Any]],
+                  top_k: int, params) -> Tuple[float, List[float]]:
+    recalls, latencies = [], []
+    for vector, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = await search_ids(client, name, vector, top_k, params)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(set(found) & set(expected)) / len(expected) if expected else 1.0)
+    return statistics.mean(recalls), latencies
+
+
+async def main(args):
+    client = AsyncQdrantClient(
+        url=config.QDRANT_URL or f"http://{config.QDRANT_HOST}:{config.QDRANT_PORT}",
+        api_key=config.QDRANT_API_KEY, prefer_grpc=True, timeout=600
+    )
+    points = await load_vectors(client, args.source)
+    if not points:
+        print(f"Collection {args.source} không có dữ liệu")
+        return
+    print(f"{args.source}: {len(points)} vector, {len(points[0][1])} chiều")
+
+    if args.query_file:
+        with open(args.query_file, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        queries = await EmbeddingGenerator(api_key=config.OPENAI_API_KEY).aembed_documents(lines)
+    else:
+        rng = random.Random(args.seed)
+        queries = [vec for _, vec in rng.sample(points, min(args.queries, len(points)))]
+
+    exact = search_params(exact=True)
+    truth = [await search_ids(client, args.source, q, args.top_k, exact) for q in queries]
+    hnsw_efs = [int(v) for v in args.hnsw_ef.split(",") if v.strip()]
+
+    try:
+        for label, options, oversampling in SETTINGS:
+            name = f"{COLLECTION_PREFIX}{len(points)}_{label.replace(' ', '').replace('/', '_').replace('+', '_')}"
+            build_seconds = await build_collection(client, name, points, options)
+            # Lượt chạy khởi động: nạp segment / mmap trước khi đo
+            await measure(client, name, queries[:10], truth[:10], args.top_k, None)
+            for hnsw_ef in hnsw_efs:
+                params = search_params(hnsw_ef, oversampling, options.get("quantization", "none"))
+                recall, latencies = await measure(client, name, queries, truth, args.top_k, params)
+                print(
+                    f"{label:<24} hnsw_ef={hnsw_ef or 'mặc định':<8} oversampling={oversampling:<4} "
+                    f"recall@{args.top_k}={recall:.4f} "
+                    f"p50={percentile(latencies, 50) * 1000:.1f}ms p95={percentile(latencies, 95) * 1000:.1f}ms "
+                    f"build={build_seconds:.0f}s"
+                )
+            if not args.keep:
+                await client.delete_collection(name)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=config.QDRANT_COLLECTION_NAME)
+    parser.add_argument("--queries", type=int, default=200, help="Số vector lấy mẫu làm câu hỏi")
+    parser.add_argument("--query-file", default=None, help="File câu hỏi (mỗi dòng một câu), thay cho lấy mẫu")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--hnsw-ef", default="0,64,128", help="Các giá trị hnsw_ef khi search (0 = mặc định)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Giữ lại các collection tạm")
+    asyncio.run(main(parser.parse_args()))
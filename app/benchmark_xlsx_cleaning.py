@@ -0,0 +1,152 @@
+"""
+Kiểm tra bước làm sạch xlsx: chạy các hàm cũ (apply từng ô, re.sub không biên dịch sẵn) và các hàm hiện tại
+(xử lý mỗi giá trị khác nhau một lần, regex biên dịch sẵn) trên cùng một DataFrame, khẳng định kết quả giống hệt
+nhau rồi in thời gian và mức tăng tốc.
+
+    python benchmark_xlsx_cleaning.py --rows 200000 --repeat 3
+
+DataFrame sinh ngẫu nhiên có cột lặp nhiều (nhà cung cấp, đơn vị tính), cột gần như không lặp (tên hàng),
+các dấu "#&" và "'" ở đầu / cuối / giữa chuỗi, ô trống, cột object chứa ngày và cột số.
+Thoát với mã lỗi nếu đầu ra hai bên khác nhau.
+"""
+import argparse
+import datetime
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipelines.xlsx_pipelines.xlsx_processor import df_processor, process_supplier_column
+
+
+# Các hàm làm sạch trước khi tối ưu, giữ nguyên để so sánh
+def remove_unwanted_chars_old(text: str) -> str:
+    if not isinstance(text, str):
+        return text
+    while text.startswith("#&"):
+        text = text[2:].lstrip()
+    while text.endswith("#&"):
+        text = text[:-2].rstrip()
+    text = text.replace("'", "")
+    text = text.replace("#&", ",")
+    return text
+
+
+def clean_special_chars_in_str_cols_old(df: pd.DataFrame) -> pd.DataFrame:
+    for col in df.columns:
+        if pd.api.types.is_object_dtype(df[col]):
+            df.loc[:, col] = df[col].apply(remove_unwanted_chars_old)
+    return df
+
+
+def process_supplier_name_old(text: str) -> str:
+    if not isinstance(text, str):
+        return text
+    text = re.sub(r"(?<!\., )\bLTD\b", r"., LTD", text)
+    text = re.sub(r"\bLTD\b(?!\.)(?=\s|$)", r"LTD.", text)
+    text = re.sub(r"\s*\.\s*", ".", text)
+    text = re.sub(r"\s*,\s*", ",", text)
+    text = re.sub(r"\.{2,}", ".", text)
+    text = re.sub(r",{2,}", ",", text)
+    text = re.sub(r"([.,]+)", lambda m: ".," if '.' in m.group(0) and ',' in m.group(0) else m.group(0), text)
+    return text
+
+
+def process_supplier_column_old(df: pd.DataFrame) -> pd.DataFrame:
+    if "Nhà cung cấp" in df.columns:
+        df.loc[:, "Nhà cung cấp"] = df["Nhà cung cấp"].astype(str).apply(process_supplier_name_old)
+    return df
+
+
+def df_processor_old(df: pd.DataFrame) -> pd.DataFrame:
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df.loc[:, col] = df[col].fillna(value=np.nan)
+        else:
+            df.loc[:, col] = df[col].fillna("")
+    if 'Ngày' in df.columns:
+        df.loc[:, 'Ngày'] = pd.to_datetime(df['Ngày'], errors='coerce')
+    tz_cols = df.select_dtypes(include=["datetimetz"]).columns
+    for col in tz_cols:
+        df.loc[:, col] = df[col].dt.tz_localize(None)
+    for col in df.select_dtypes(include=["object"]).columns:
+        if col != "Ngày":
+            df.loc[:, col] = df[col].apply(
+                lambda x: x.strftime("%Y-%m-%d") if isinstance(x, (pd.Timestamp, datetime.date)) and not pd.isnull(x) else x
+            )
+    return clean_special_chars_in_str_cols_old(df)
+
+
+def clean_old(df: pd.DataFrame) -> pd.DataFrame:
+    return process_supplier_column_old(df_processor_old(df))
+
+
+def clean_new(df: pd.DataFrame) -> pd.DataFrame:
+    return process_supplier_column(df_processor(df))
+
+
+_SUPPLIERS = [
+    "CÔNG TY TNHH ABC", "SAMSUNG ELECTRONICS CO LTD", "DELL GLOBAL B.V . , LTD", "CÔNG TY CP XYZ , ,  LTD.",
+    "#& HOA PHAT LTD #&", "O'NEIL TRADING CO.,LTD", None,
+]
+_UNITS = ["Chiếc", "Bộ", "#&Cái", "Kg'", "", None]
+_PRODUCTS = ["Máy tính xách tay", "#&Màn hình #& LCD", "Bàn phím 'không dây'", "Linh kiện #& điện tử #&  #&"]
+
+
+def make_dataframe(rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    ngay = pd.Series(dates.strftime("%d/%m/%Y"), dtype=object)
+    ngay[rng.random(rows) < 0.01] = "không rõ"
+    # Cột object lẫn ngày và chuỗi: nhánh strftime của df_processor vẫn phải chạy
+    mixed_dates = pd.Series(list(dates[:rows]), dtype=object)
+    mixed_dates[rng.random(rows) < 0.3] = "#&chưa thông quan"
+    quantity = rng.integers(1, 1000, rows).astype(float)
+    quantity[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "Ngày": ngay,
+        "Nhà cung cấp": pd.Series(rng.choice(np.array(_SUPPLIERS, dtype=object), rows), dtype=object),
+        "Hs code": rng.choice(["84713020", "85287292", "84716030", "85423900"], rows).astype(object),
+        "Tên hàng": pd.Series(
+            [f"{p} #{i}'" if i % 7 else f"{p} {i}" for i, p in enumerate(rng.choice(_PRODUCTS, rows))], dtype=object
+        ),
+        "Lượng": quantity,
+        "Đơn vị tính": pd.Series(rng.choice(np.array(_UNITS, dtype=object), rows), dtype=object),
+        "Ngày thông quan": mixed_dates,
+        "Thuế suất XNK": rng.choice(["0", "5", "10,5", "#&"], rows).astype(object),
+    })
+
+
+def timed(fn, df: pd.DataFrame, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        data = df.copy(deep=True)
+        started = time.perf_counter()
+        result = fn(data)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(args):
+    df = make_dataframe(args.rows, args.seed)
+    old_seconds, old = timed(clean_old, df, args.repeat)
+    new_seconds, new = timed(clean_new, df, args.repeat)
+    try:
+        pd.testing.assert_frame_equal(old, new)
+    except AssertionError as e:
+        print(f"Kết quả khác nhau:\n{e}")
+        sys.exit(1)
+    print(f"{args.rows} dòng, kết quả giống hệt nhau")
+    print(f"{'hàm cũ':<14}{old_seconds:.3f}s")
+    print(f"{'hàm hiện tại':<14}{new_seconds:.3f}s")
+    print(f"Nhanh hơn {old_seconds / new_seconds:.1f} lần")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy mỗi phía, lấy thời gian nhỏ nhất")
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+"""
+So sánh tốc độ insert import_data (dòng/giây): cách cũ (iterrows + default_val + cursor.execute từng dòng,
+commit một lần cuối) với store_dataframe_in_mysql (executemany theo lô, INSERT IGNORE trên RowHash).
+
+    python benchmark_xlsx_insert.py --rows 20000 --batch-size 1000
+
+Dữ liệu là DataFrame sinh ngẫu nhiên cùng các cột với file xlsx đã làm sạch. Hai cách ghi vào một bảng tạm
+tạo bằng CREATE TABLE ... LIKE import_data (mặc định import_data_bench), bảng được TRUNCATE trước mỗi lần đo
+và xoá khi xong (trừ khi có --keep). Cách cũ không ghi log từng dòng như bản gốc, nên con số của nó là cận trên.
+"""
+import argparse
+import time
+import uuid
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+
+from config import Config
+from pipelines.xlsx_pipelines.xlsx_processor import default_val, store_dataframe_in_mysql
+from utils.text_normalizer import fold_vietnamese
+
+_SUPPLIERS = ["CÔNG TY TNHH ABC", "SAMSUNG ELECTRONICS CO., LTD.", "CÔNG TY CỔ PHẦN XYZ", "DELL GLOBAL B.V."]
+_PRODUCTS = ["Máy tính xách tay", "Màn hình LCD 24 inch", "Bàn phím không dây", "Linh kiện điện tử"]
+_COUNTRIES = ["Việt Nam", "Trung Quốc", "Hàn Quốc", "Nhật Bản", "Hoa Kỳ"]
+
+
+def make_dataframe(rows: int, seed: int) -> pd.DataFrame:
+    """DataFrame giống đầu ra của process_chunk; tên hàng kèm số thứ tự để RowHash không trùng giữa các dòng."""
+    rng = np.random.default_rng(seed)
+    run = uuid.uuid4().hex[:8]
+    return pd.DataFrame({
+        "Ngày": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "Nhà cung cấp": rng.choice(_SUPPLIERS, rows),
+        "Hs code": rng.choice(["84713020", "85287292", "84716030", "85423900"], rows),
+        "Tên hàng": [f"{p} #{run}-{i}" for i, p in enumerate(rng.choice(_PRODUCTS, rows))],
+        "Lượng": rng.integers(1, 1000, rows).astype(float),
+        "Đơn vị tính": rng.choice(["Chiếc", "Bộ", "Cái"], rows),
+        "Tên nước xuất xứ": rng.choice(_COUNTRIES, rows),
+        "Điều kiện giao hàng": rng.choice(["CIF", "FOB", "EXW"], rows),
+        "Thuế suất XNK": rng.choice(["0", "5", "10,5"], rows),
+        "Thuế suất TTĐB": "",
+        "Thuế suất VAT": rng.choice(["8", "10"], rows),
+        "Thuế suất tự vệ": "",
+        "Thuế suất BVMT": "",
+        "Trạng thái": "Nhập khẩu",
+        "file_name": f"bench_{run}",
+    })
+
+
+def insert_row_by_row(df: pd.DataFrame, db_config: dict, table_name: str) -> None:
+    """Cách ghi trước khi chuyển sang executemany: mỗi dòng một lần execute, default_val cho từng ô."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    insert_query = (
+        f"INSERT INTO {table_name} (Ngay, NhaCungCap, HsCode, TenHang, Luong, DonViTinh, TenNuocXuatXu, "
+        f"DieuKienGiaoHang, ThueSuatXNK, ThueSuatTTDB, ThueSuatVAT, ThueSuatTuVe, ThueSuatBVMT, "
+        f"TinhTrang, file_name, TenHangKhongDau) VALUES ({', '.join(['%s'] * 16)})"
+    )
+    try:
+        for _, row in df.iterrows():
+            ngay_value = row.get("Ngày")
+            ngay_value = None if pd.isnull(ngay_value) else ngay_value.date()
+            ten_hang = default_val(row.get("Tên hàng", "NaN"))
+            cursor.execute(insert_query, (
+                ngay_value,
+                default_val(row.get("Nhà cung cấp", "NaN")),
+                default_val(row.get("Hs code", "NaN")),
+                ten_hang,
+                default_val(row.get("Lượng", "NaN"), numeric=True),
+                default_val(row.get("Đơn vị tính", "NaN")),
+                default_val(row.get("Tên nước xuất xứ", "NaN")),
+                default_val(row.get("Điều kiện giao hàng", "NaN")),
+                default_val(row.get("Thuế suất XNK", "NaN"), numeric=True),
+                default_val(row.get("Thuế suất TTĐB", "NaN"), numeric=True),
+                default_val(row.get("Thuế suất VAT", "NaN"), numeric=True),
+                default_val(row.get("Thuế suất tự vệ", "NaN"), numeric=True),
+                default_val(row.get("Thuế suất BVMT", "NaN"), numeric=True),
+                default_val(row.get("Trạng thái", "NaN")),
+                default_val(row.get("file_name", "NaN")),
+                fold_vietnamese(ten_hang),
+            ))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run_sql(db_config: dict, *statements: str) -> None:
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def timed(label: str, rows: int, fn) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {rows} dòng trong {elapsed:.2f}s ({rows / elapsed:.0f} dòng/giây)")
+    return elapsed
+
+
+def main(args):
+    db_config = Config().get_db_config()
+    table = args.table
+    run_sql(db_config, f"CREATE TABLE IF NOT EXISTS {table} LIKE import_data")
+    df = make_dataframe(args.rows, args.seed)
+    try:
+        run_sql(db_config, f"TRUNCATE TABLE {table}")
+        old = timed("execute từng dòng", args.rows, lambda: insert_row_by_row(df, db_config, table))
+        run_sql(db_config, f"TRUNCATE TABLE {table}")
+        new = timed(
+            f"executemany (lô {args.batch_size})", args.rows,
+            lambda: store_dataframe_in_mysql(df, db_config, table_name=table, batch_size=args.batch_size)
+        )
+        print(f"Nhanh hơn {old / new:.1f} lần")
+    finally:
+        if not args.keep:
+            run_sql(db_config, f"DROP TABLE IF EXISTS {table}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--table", default="import_data_bench", help="Bảng tạm (tạo bằng LIKE import_data)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Giữ lại bảng tạm")
+    main(parser.parse_args())
@@ -13,6 +13,20 @@ class Config(BaseSettings):
     QDRANT_API_KEY: str | None = None
     QDRANT_HOST: str = "localhost"
     QDRANT_PORT: int = 6333
+    # Sau bao nhiêu giây thì VectorStoreManager kiểm tra lại collection (chạy nền, không chặn request)
+    QDRANT_READINESS_TTL: float = 300
+    # store_embeddings: số văn bản mỗi batch embedding + upsert và số upsert chạy đồng thời
+    QDRANT_UPSERT_BATCH_SIZE: int = 256
+    QDRANT_UPSERT_CONCURRENCY: int = 4
+    # Index HNSW, lượng tử hoá (none | scalar | binary) và lưu trên đĩa (mmap): chỉ áp dụng khi tạo collection
+    # mới, đổi cấu hình thì dùng QDRANT_COLLECTION_NAME mới (so sánh bằng benchmark_vector_index.py)
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_QUANTIZATION: str = "none"
+    QDRANT_ON_DISK: bool = False
+    # Khi search: hnsw_ef (0 = mặc định của Qdrant) và hệ số lấy dư ứng viên để chấm lại khi có lượng tử hoá
+    QDRANT_SEARCH_HNSW_EF: int = 0
+    QDRANT_SEARCH_OVERSAMPLING: float = 2.0
     SEARCH_THRESHOLD: float = 0.4
 
     # ===== OpenAI =====
@@ -40,6 +54,53 @@ class Config(BaseSettings):
     backend_databasse: str | None = None
     backend_user_pure: bool = True 
     backend_port: int = 3306 
+    # Nạp import_data vào bộ nhớ (dạng cột) để các tool không cần truy vấn MySQL
+    IMPORT_DATA_SNAPSHOT: bool = False
+    # Số dòng mỗi lô executemany khi lưu file xlsx vào MySQL
+    XLSX_INSERT_BATCH_SIZE: int = 1000
+    # Số dòng mỗi khối khi đọc file xlsx theo luồng, và dung lượng upload tối đa (MB)
+    XLSX_CHUNK_SIZE: int = 5000
+    XLSX_MAX_UPLOAD_MB: int = 100
+    # Cache kết quả tool (LRU theo số byte), tự vô hiệu khi upload / xoá file xlsx
+    TOOL_CACHE_ENABLED: bool = True
+    TOOL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Cache embedding: LRU trong bộ nhớ (theo số byte) + SQLite trên đĩa (rỗng = tắt tầng đĩa)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    EMBEDDING_CACHE_DB: str = "data/embedding_cache.sqlite3"
+    # Gom embedding câu hỏi của các request đồng thời: gửi khi đủ MAX_SIZE văn bản hoặc sau MAX_WAIT_MS
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    # Backend embedding: "openai" hoặc "local" (ONNX Runtime trên CPU, model int8, không cần mạng)
+    # Đổi backend thì số chiều vector đổi theo: cần QDRANT_COLLECTION_NAME mới (hoặc ingest lại)
+    EMBEDDING_BACKEND: str = "openai"
+    EMBEDDING_LOCAL_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    # File ONNX int8 chạy được trên mọi CPU; máy có AVX512-VNNI có thể chọn "onnx/model_qint8_avx512_vnni.onnx"
+    EMBEDDING_LOCAL_ONNX_FILE: str = "onnx/model_quantized.onnx"
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32
+    EMBEDDING_LOCAL_THREADS: int = 0
+    # Điều phối gọi API embedding (mỗi process một bộ giới hạn, 0 = không giới hạn):
+    # số request / token mỗi phút, số batch chạy đồng thời, backoff khi lỗi (giây)
+    EMBEDDING_RPM: int = 3000
+    EMBEDDING_TPM: int = 1_000_000
+    EMBEDDING_MAX_IN_FLIGHT: int = 4
+    EMBEDDING_BACKOFF_BASE: float = 1.0
+    EMBEDDING_BACKOFF_MAX: float = 60.0
+    # True: ToolAgent chỉ đăng ký tool query_import_data; False: 16 tool HSCode* / ProductName* cũ
+    AGENT_CONSOLIDATED_TOOLS: bool = True
+
+    # ===== Ingestion jobs =====
+    # SQLite lưu trạng thái job upload pdf / doc / xlsx
+    INGESTION_JOB_DB: str = "data/jobs.sqlite3"
+    # Số job chạy đồng thời và số process cho các stage nặng CPU
+    INGESTION_CONCURRENCY: int = 2
+    INGESTION_PROCESS_WORKERS: int = 1
+    # "inline": API tự chạy job; "external": API chỉ tạo job, ingestion_worker.py thực thi
+    INGESTION_MODE: str = "inline"
+    INGESTION_POLL_INTERVAL: float = 1.0
+    # Độ ưu tiên CPU (os.nice) của tiến trình ingestion_worker.py, 0 = không đổi
+    INGESTION_WORKER_NICE: int = 10
 
 
     # ===== Objects =====
@@ -48,6 +109,17 @@ class Config(BaseSettings):
     NUM_RERANKERS: int = 6
 
 
+    def get_db_config(self) -> dict:
+        """Tham số kết nối MySQL dùng chung cho API và ingestion_worker.py."""
+        return {
+            "host": self.backend_host,
+            "user": self.backend_user,
+            "password": self.backend_password,
+            "database": self.backend_databasse,
+            "use_pure": self.backend_user_pure,
+            "port": self.backend_port
+        }
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
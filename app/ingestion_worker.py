@@ -0,0 +1,85 @@
+"""
+Tiến trình ingest riêng, dùng chung mã nguồn và file .env với API.
+
+    INGESTION_MODE=external uvicorn main:app ...   # API chỉ tạo job
+    python ingestion_worker.py                     # thực thi job pdf / doc / xlsx
+
+Worker nhận job từ cùng file SQLite (INGESTION_JOB_DB), chạy với độ ưu tiên CPU thấp hơn
+(INGESTION_WORKER_NICE) nên OCR / YOLO / pandas không làm chậm luồng chat của API.
+Chỉ nên chạy một worker cho mỗi file SQLite; số job đồng thời do INGESTION_CONCURRENCY quyết định.
+"""
+import asyncio
+import logging
+import os
+from types import SimpleNamespace
+
+from config import Config
+from pipelines.rag_pipelines.vector_store import VectorStoreManager
+from pipelines.llm_pipelines.embedding_generator import aclose_shared_async_client
+from pipelines.ingestion_pipelines.ingestion_runner import IngestionRunner
+from utils.job_store import JobStore
+from utils.embedding_cache import embedding_cache
+from utils.file_registry import FileRegistry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    config = Config()
+    if config.INGESTION_WORKER_NICE and hasattr(os, "nice"):
+        os.nice(config.INGESTION_WORKER_NICE)
+        logger.info(f"[ingestion_worker] Giảm độ ưu tiên CPU: nice +{config.INGESTION_WORKER_NICE}")
+
+    # Dùng chung tầng đĩa của cache embedding với API
+    embedding_cache.configure(
+        max_bytes=config.EMBEDDING_CACHE_MAX_BYTES,
+        db_path=config.EMBEDDING_CACHE_DB,
+        enabled=config.EMBEDDING_CACHE_ENABLED,
+    )
+
+    vector_store = VectorStoreManager(
+        collection_name=config.QDRANT_COLLECTION_NAME,
+        openai_api_key=config.OPENAI_API_KEY,
+        qdrant_api_key=config.QDRANT_API_KEY,
+        qdrant_url=config.QDRANT_URL,
+        prefer_grpc=True,
+        readiness_ttl=config.QDRANT_READINESS_TTL,
+        upsert_batch_size=config.QDRANT_UPSERT_BATCH_SIZE,
+        upsert_concurrency=config.QDRANT_UPSERT_CONCURRENCY,
+        hnsw_m=config.QDRANT_HNSW_M,
+        hnsw_ef_construct=config.QDRANT_HNSW_EF_CONSTRUCT,
+        quantization=config.QDRANT_QUANTIZATION,
+        on_disk=config.QDRANT_ON_DISK,
+        search_hnsw_ef=config.QDRANT_SEARCH_HNSW_EF,
+        search_oversampling=config.QDRANT_SEARCH_OVERSAMPLING,
+    )
+    await vector_store.init_collection()
+    vector_store_queue = asyncio.Queue()
+    await vector_store_queue.put(vector_store)
+
+    # Trạng thái tối thiểu mà IngestionRunner cần; snapshot import_data chỉ tồn tại trong API
+    state = SimpleNamespace(
+        config=config,
+        db_config=config.get_db_config(),
+        vector_store_queue=vector_store_queue,
+        import_data_snapshot=None,
+    )
+    runner = IngestionRunner(
+        state, JobStore(config.INGESTION_JOB_DB), FileRegistry(config.INGESTION_JOB_DB),
+        max_concurrency=config.INGESTION_CONCURRENCY,
+        process_workers=config.INGESTION_PROCESS_WORKERS,
+        poll_interval=config.INGESTION_POLL_INTERVAL,
+    )
+    try:
+        await runner.serve()
+    finally:
+        await runner.stop()
+        await aclose_shared_async_client()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("[ingestion_worker] Dừng worker.")
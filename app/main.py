@@ -10,11 +10,21 @@ import asyncio
 from config import Config
 from pipelines.rag_pipelines.crossencoder_reranker import CrossReranker
 from pipelines.rag_pipelines.vector_store import VectorStoreManager
+from pipelines.llm_pipelines.embedding_generator import aclose_shared_async_client
 from pipelines.rag_pipelines.search_engine import SearchEngine
 from pipelines.rag_pipelines.cohere_reranker import AsyncCohereReranker
 
 # Agent
 from pipelines.llm_pipelines.agent_decision import ToolAgent
+from pipelines.ingestion_pipelines.ingestion_runner import IngestionRunner
+
+from utils.db_connector import DatabaseConnector
+from utils.import_data_snapshot import ImportDataSnapshot
+from utils.tool_result_cache import tool_result_cache
+from utils.embedding_cache import embedding_cache
+from utils.job_store import JobStore
+from utils.file_registry import FileRegistry
+from utils.upload_store import UPLOADED_FOLDER
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +33,13 @@ config = Config()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # === Cache embedding (trước khi VectorStoreManager gọi API embedding) ===
+    embedding_cache.configure(
+        max_bytes=config.EMBEDDING_CACHE_MAX_BYTES,
+        db_path=config.EMBEDDING_CACHE_DB,
+        enabled=config.EMBEDDING_CACHE_ENABLED,
+    )
+
     # === VectorStoreManager Pool ===
     num_vector_stores = config.NUM_VECTOR_STORES
     app.state.vector_store_pool = [
@@ -32,6 +49,15 @@ async def lifespan(app: FastAPI):
             qdrant_api_key=config.QDRANT_API_KEY,
             qdrant_url=config.QDRANT_URL,
             prefer_grpc=True,
+            readiness_ttl=config.QDRANT_READINESS_TTL,
+            upsert_batch_size=config.QDRANT_UPSERT_BATCH_SIZE,
+            upsert_concurrency=config.QDRANT_UPSERT_CONCURRENCY,
+            hnsw_m=config.QDRANT_HNSW_M,
+            hnsw_ef_construct=config.QDRANT_HNSW_EF_CONSTRUCT,
+            quantization=config.QDRANT_QUANTIZATION,
+            on_disk=config.QDRANT_ON_DISK,
+            search_hnsw_ef=config.QDRANT_SEARCH_HNSW_EF,
+            search_oversampling=config.QDRANT_SEARCH_OVERSAMPLING,
         )
         for _ in range(num_vector_stores)
     ]
@@ -61,14 +87,20 @@ async def lifespan(app: FastAPI):
     logger.info(f"Khởi tạo pool với {num_rerankers} AsyncCohereReranker.")
 
     # === Khởi tạo ToolAgent ===
-    db_config ={
-        "host": config.backend_host,
-        "user": config.backend_user,
-        "password": config.backend_password,
-        "database": config.backend_databasse,
-        "use_pure": config.backend_user_pure,  
-        "port": config.backend_port  
-    }
+    db_config = config.get_db_config()
+
+    # === Snapshot import_data trong bộ nhớ (tuỳ chọn) ===
+    app.state.import_data_snapshot = None
+    if config.IMPORT_DATA_SNAPSHOT:
+        snapshot = ImportDataSnapshot()
+        db_connector = DatabaseConnector(db_config)
+        await asyncio.to_thread(snapshot.load, db_connector)
+        db_connector.attach_snapshot(snapshot)
+        app.state.import_data_snapshot = snapshot
+        logger.info(f"Khởi tạo ImportDataSnapshot với {len(snapshot)} dòng.")
+
+    # === Cache kết quả tool ===
+    tool_result_cache.configure(max_bytes=config.TOOL_CACHE_MAX_BYTES, enabled=config.TOOL_CACHE_ENABLED)
         
     num_agents = config.NUM_AGENTS
     tool_agent_pool = []
@@ -76,7 +108,8 @@ async def lifespan(app: FastAPI):
         agent = ToolAgent(
             model_name=config.AGENT_MODEL_NAME,
             temperature=config.AGENT_TEMPERATURE,
-            db_config=db_config
+            db_config=db_config,
+            consolidated_tools=config.AGENT_CONSOLIDATED_TOOLS
         )
         tool_agent_pool.append(agent)
 
@@ -89,9 +122,26 @@ async def lifespan(app: FastAPI):
     # Lưu config để dùng chung
     app.state.config = config
     app.state.db_config = db_config
+
+    # === Job ingest chạy nền (pdf / doc / xlsx) ===
+    app.state.job_store = JobStore(config.INGESTION_JOB_DB)
+    app.state.file_registry = FileRegistry(config.INGESTION_JOB_DB)
+    if await asyncio.to_thread(app.state.file_registry.count) == 0:
+        # Lần đầu chạy với registry: nạp các file đã có trong data/uploaded
+        await asyncio.to_thread(app.state.file_registry.sync_from_disk, UPLOADED_FOLDER)
+    app.state.ingestion_runner = IngestionRunner(
+        app.state, app.state.job_store, app.state.file_registry,
+        max_concurrency=config.INGESTION_CONCURRENCY,
+        process_workers=config.INGESTION_PROCESS_WORKERS,
+        external=config.INGESTION_MODE == "external",
+        poll_interval=config.INGESTION_POLL_INTERVAL,
+    )
+    await app.state.ingestion_runner.start()
     
     yield  # Chuyển giao quyền điều khiển cho ứng dụng
     
+    await app.state.ingestion_runner.stop()
+    await aclose_shared_async_client()
     print("Shutdown")
 
 app = FastAPI(lifespan=lifespan)
@@ -111,6 +161,8 @@ from api.xlsx_endpoint import router as xlsx_router
 from api.doc_endpoint import router as doc_router
 from api.delete_endpoint import router as delete_router
 from api.xlsx_delete import router as xlsx_delete_router
+from api.cache_endpoint import router as cache_router
+from api.job_endpoint import router as job_router
 
 app.include_router(chat_router, prefix="/api", tags=["CHAT"])
 app.include_router(pdf_router, prefix="/pdf", tags=["PDF"])
@@ -118,6 +170,8 @@ app.include_router(xlsx_router, prefix="/xlsx", tags=["XLSX"])
 app.include_router(doc_router, prefix="/doc", tags=["DOC"])
 app.include_router(delete_router, prefix="/delete", tags=["DELETE"])
 app.include_router(xlsx_delete_router, prefix="/delete", tags=["DELETE"])
+app.include_router(cache_router, prefix="/cache", tags=["CACHE"])
+app.include_router(job_router, prefix="/jobs", tags=["JOBS"])
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000)
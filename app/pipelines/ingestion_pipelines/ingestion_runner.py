@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from pipelines.pdf_pipelines.pdf_processor import pdf_processor_pipeline
+from pipelines.doc_pipelines.doc_processor import doc_processor_pipeline
+from pipelines.xlsx_pipelines.xlsx_processor import xlsx_processor_pipeline, record_imported_file
+from pipelines.llm_pipelines.data_preparation import DataLoader
+from utils.db_connector import DatabaseConnector
+from utils.file_registry import FileRegistry
+from utils.job_store import JobStore, JOB_SUCCEEDED
+from utils.tool_result_cache import bump_data_generation
+from utils.upload_store import file_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionRunner:
+    """
+    Thực thi các job ingest (pdf / doc / xlsx) ở nền thay cho request HTTP.
+
+    - Job được ghi vào JobStore (SQLite) trước khi đưa vào asyncio.Queue; khi khởi động lại,
+      job đang chạy dở được đưa lại hàng đợi.
+    - `max_concurrency` coroutine worker lấy job từ hàng đợi, nên số job chạy đồng thời bị giới hạn.
+    - Các stage nặng CPU (OCR / YOLO, đọc docx, làm sạch + insert xlsx) chạy trong ProcessPoolExecutor
+      để không tranh GIL với luồng chat; stage I/O (embedding, Qdrant) chạy trên event loop.
+
+    Với `external=True` (INGESTION_MODE=external), API không chạy job nào: submit chỉ ghi job vào
+    JobStore, tiến trình ingestion_worker.py nhận job qua `serve()`, còn API chỉ theo dõi các job xlsx
+    đã kết thúc để làm mới snapshot import_data và cache kết quả tool của chính nó.
+
+    Khi job kết thúc, FileRegistry được cập nhật trạng thái, số chunk / dòng và id các point trên Qdrant.
+    """
+
+    def __init__(self, state, job_store: JobStore, registry: Optional[FileRegistry] = None,
+                 max_concurrency: int = 2, process_workers: int = 1,
+                 external: bool = False, poll_interval: float = 1.0):
+        # state: app.state (config, db_config, vector_store_queue, import_data_snapshot)
+        self.state = state
+        self.job_store = job_store
+        self.registry = registry
+        self.max_concurrency = max_concurrency
+        self.process_workers = process_workers
+        self.external = external
+        self.poll_interval = poll_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._handlers: Dict[str, Callable] = {
+            "pdf": self._run_pdf,
+            "doc": self._run_doc,
+            "xlsx": self._run_xlsx,
+        }
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: không fork tiến trình đang giữ client gRPC / thread của uvicorn
+        return ProcessPoolExecutor(
+            max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def start(self) -> None:
+        if self.external:
+            self._workers = [asyncio.create_task(self._watch_external_jobs())]
+            logger.info("[IngestionRunner] Chế độ external: job do ingestion_worker.py thực thi.")
+            return
+        self._executor = self._new_executor()
+        await asyncio.to_thread(self.job_store.requeue_interrupted)
+        for job_id in await asyncio.to_thread(self.job_store.queued_ids):
+            self._queue.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        logger.info(
+            f"[IngestionRunner] Khởi động {self.max_concurrency} worker, {self.process_workers} process, "
+            f"{self._queue.qsize()} job đang chờ."
+        )
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, kind: str, file_name: str, file_path: str,
+                     params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Ghi job vào JobStore và đưa vào hàng đợi; trả về bản ghi job (có id)."""
+        if kind not in self._handlers:
+            raise ValueError(f"Loại job không hỗ trợ: {kind}")
+        job = await asyncio.to_thread(self.job_store.create, kind, file_name, file_path, params)
+        if not self.external:
+            await self._queue.put(job["id"])
+        return job
+
+    async def serve(self) -> None:
+        """
+        Vòng lặp của tiến trình worker: nhận job từ JobStore (claim_next), tối đa
+        `max_concurrency` job cùng lúc; hàng đợi trống thì chờ `poll_interval` giây.
+        """
+        self._executor = self._new_executor()
+        await asyncio.to_thread(self.job_store.requeue_interrupted)
+        slots = asyncio.Semaphore(self.max_concurrency)
+        running = set()
+        logger.info(f"[IngestionRunner] Worker sẵn sàng: {self.max_concurrency} job đồng thời, pid={os.getpid()}")
+        try:
+            while True:
+                await slots.acquire()
+                job = await asyncio.to_thread(self.job_store.claim_next)
+                if job is None:
+                    slots.release()
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                task = asyncio.create_task(self._execute(job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                task.add_done_callback(lambda _: slots.release())
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _watch_external_jobs(self) -> None:
+        """(API, chế độ external) Làm mới snapshot / cache khi worker hoàn thành job xlsx."""
+        since = time.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                for job in await asyncio.to_thread(self.job_store.finished_since, since, "xlsx"):
+                    since = max(since, job["finished_at"])
+                    await self._refresh_import_data(job["file_path"], job["status"] == JOB_SUCCEEDED)
+            except Exception:
+                logger.exception("[IngestionRunner] Lỗi khi theo dõi job xlsx của worker")
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        if not await asyncio.to_thread(self.job_store.mark_running, job_id):
+            return
+        await self._execute(await asyncio.to_thread(self.job_store.get, job_id))
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        logger.info(f"[IngestionRunner] Bắt đầu job {job_id} ({job['kind']}): {job['file_name']}")
+        try:
+            result = await self._handlers[job["kind"]](job)
+        except asyncio.CancelledError:
+            # Tắt ứng dụng giữa chừng: job giữ trạng thái running và được chạy lại lần khởi động sau
+            raise
+        except Exception as e:
+            logger.exception(f"[IngestionRunner] Job {job_id} lỗi ở stage '{job.get('stage')}'")
+            error = f"{type(e).__name__}: {e}"
+            await asyncio.to_thread(self.job_store.fail, job_id, error)
+            await self._record_file(job, False, error=error)
+        else:
+            # id các point chỉ lưu trong FileRegistry, không đưa vào kết quả job
+            point_ids = result.pop("point_ids", None)
+            await asyncio.to_thread(self.job_store.succeed, job_id, result)
+            await self._record_file(job, True, result.get("chunks", result.get("inserted_rows")), point_ids)
+            logger.info(f"[IngestionRunner] Hoàn thành job {job_id}: {result}")
+
+    async def _record_file(self, job: Dict[str, Any], succeeded: bool, item_count: Optional[int] = None,
+                           point_ids: Optional[List[str]] = None, error: Optional[str] = None) -> None:
+        if self.registry is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self.registry.finish, job["file_path"], succeeded, item_count, point_ids, error
+            )
+        except Exception:
+            logger.exception(f"[IngestionRunner] Không cập nhật được FileRegistry cho job {job['id']}")
+
+    async def _stage(self, job: Dict[str, Any], stage: str, progress: float) -> None:
+        job["stage"] = stage
+        await asyncio.to_thread(self.job_store.update_stage, job["id"], stage, progress)
+
+    async def _run_cpu(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        except BrokenProcessPool:
+            # Tiến trình con chết (hết bộ nhớ, segfault...): tạo lại pool cho các job sau
+            self._executor = self._new_executor()
+            raise
+
+    async def _store_embeddings(self, job: Dict[str, Any], json_str: str) -> List[str]:
+        dataloader = DataLoader(json_str, content="content")
+        texts = dataloader.prepare_data_from_json()
+        metadata = dataloader.prepare_metadata_from_json()
+        # id point tính từ SHA-256 của file: chạy lại job (sau lỗi / khởi động lại) ghi đè các point đã có
+        source_id = job["params"].get("sha256") or await asyncio.to_thread(file_sha256, job["file_path"])
+        vector_store = await self.state.vector_store_queue.get()
+        try:
+            return await vector_store.store_embeddings(texts, metadata, source_id=source_id)
+        finally:
+            await self.state.vector_store_queue.put(vector_store)
+
+    async def _run_pdf(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        await self._stage(job, "parsing", 0.0)
+        json_str = await self._run_cpu(pdf_processor_pipeline, job["file_path"], job["params"].get("model_path"))
+        await self._stage(job, "embedding", 0.7)
+        point_ids = await self._store_embeddings(job, json_str)
+        return {"chunks": len(point_ids), "point_ids": point_ids}
+
+    async def _run_doc(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        await self._stage(job, "parsing", 0.0)
+        json_str = await self._run_cpu(doc_processor_pipeline, job["file_path"])
+        await self._stage(job, "embedding", 0.5)
+        point_ids = await self._store_embeddings(job, json_str)
+        return {"chunks": len(point_ids), "point_ids": point_ids}
+
+    async def _refresh_import_data(self, file_path: str, succeeded: bool) -> None:
+        """Sau khi ingest xlsx: nạp lại các dòng của file vào snapshot (nếu bật) và bỏ cache kết quả tool."""
+        try:
+            snapshot = getattr(self.state, "import_data_snapshot", None)
+            if succeeded and snapshot is not None:
+                base_name = os.path.splitext(os.path.basename(file_path))[0]
+                await asyncio.to_thread(snapshot.refresh_file, DatabaseConnector(self.state.db_config), base_name)
+        finally:
+            # Kể cả khi lỗi giữa chừng, import_data có thể đã thay đổi -> bỏ kết quả tool đã cache
+            bump_data_generation()
+
+    async def _run_xlsx(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        config = self.state.config
+        db_config = self.state.db_config
+        base_name = os.path.splitext(os.path.basename(job["file_path"]))[0]
+        succeeded = False
+        try:
+            await self._stage(job, "ingesting", 0.0)
+            inserted_rows = await self._run_cpu(
+                xlsx_processor_pipeline, job["file_path"], db_config,
+                config.XLSX_INSERT_BATCH_SIZE, config.XLSX_CHUNK_SIZE
+            )
+            await self._stage(job, "recording", 0.8)
+            await asyncio.to_thread(record_imported_file, db_config, job["params"]["sha256"], base_name, inserted_rows)
+            succeeded = True
+        finally:
+            if succeeded:
+                await self._stage(job, "refreshing_snapshot", 0.9)
+            await self._refresh_import_data(job["file_path"], succeeded)
+        return {"inserted_rows": inserted_rows}
@@ -15,16 +15,37 @@ from tools.hscode_supplier_status import HSCodeSupplierStatusTool
 from tools.hscode_supplier_date_status import HSCodeSupplierDateStatusTool
 from tools.hscode_supplier_daterange_status import HSCodeSupplierDateRangeStatusTool
 from tools.productname import ProductNameSearchTool, ProductNameDateTool, ProductNameDateRangeTool, ProductNameStatusTool, ProductNameDateStatusTool, ProductNameDaterangeStatusTool
+from tools.import_data_query import ImportDataQueryTool
 from langsmith import traceable
 
 logger = logging.getLogger(__name__)
 
 class ToolAgent:
-    def __init__(self, package: str = "trial_package", model_name: str = "gpt-3.5-turbo", temperature: float = 0.0, db_config: dict = None):
+    def __init__(self, package: str = "trial_package", model_name: str = "gpt-3.5-turbo", temperature: float = 0.0, db_config: dict = None,
+                 consolidated_tools: bool = True):
         logger.info("Khởi tạo ToolAgent với model=%s, temperature=%.1f", model_name, temperature)
         
         self.llm = ChatOpenAI(model_name=model_name, temperature=temperature)
         self.package = package
+
+        if consolidated_tools:
+            # Một tool tham số hoá thay cho 16 tool: schema gửi kèm mỗi lần gọi OPENAI_FUNCTIONS nhỏ hơn nhiều
+            self.import_data_query_tool = ImportDataQueryTool(tool_agent=self, db_config=db_config)
+            self.tools = {self.import_data_query_tool.name: self.import_data_query_tool}
+        else:
+            self._init_legacy_tools(db_config)
+        self.tool_called = {tool_name: False for tool_name in self.tools}  # Theo dõi tool được gọi
+
+        self.agent = initialize_agent(
+            tools=list(self.tools.values()),
+            llm=self.llm,
+            agent=AgentType.OPENAI_FUNCTIONS,
+            verbose=True,
+        )
+        logger.info("Đã khởi tạo agent (OPENAI_FUNCTIONS) với %s tool", len(self.tools))
+
+    def _init_legacy_tools(self, db_config: dict):
+        """Bộ 16 tool HSCode* / ProductName* riêng lẻ (dùng khi tắt consolidated_tools)."""
         self.hscode_tool = HSCodeTool(tool_agent=self, db_config=db_config)
         self.hscode_supplier_tool = HSCodeSupplierTool(tool_agent=self, db_config=db_config)
         self.hscode_supplier_date_tool = HSCodeSupplierDateTool(tool_agent=self, db_config=db_config)
@@ -60,19 +81,6 @@ class ToolAgent:
             "HSCodeDateTool": self.hscode_date_tool,
             "HSCodeDateRangeTool": self.hscode_daterange_tool
         }
-        self.tool_called = {tool_name: False for tool_name in self.tools}  # Theo dõi tool được gọi
-
-        self.agent = initialize_agent(
-            tools=[self.hscode_tool, self.hscode_supplier_tool, self.hscode_supplier_date_tool, self.hscode_supplier_daterange_tool, 
-                   self.hscode_status_tool, self.hscode_supplier_status_tool, self.hscode_supplier_date_status_tool,
-                     self.hscode_supplier_daterange_status_tool, self.productname_search_tool, self.productname_date_tool,
-                   self.productname_daterange_tool, self.productname_status_tool, self.productname_date_status_tool,
-                   self.productname_daterange_status_tool, self.hscode_date_tool, self.hscode_daterange_tool],
-            llm=self.llm,
-            agent=AgentType.OPENAI_FUNCTIONS,
-            verbose=True,
-        )
-        logger.info("Đã khởi tạo agent (OPENAI_FUNCTIONS)")
 
     def set_package(self, package: str):
         self.package = package
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Làn ưu tiên: số nhỏ được cấp quota trước
+PRIORITY_QUERY = 0
+PRIORITY_INGEST = 1
+_LANE_NAMES = {PRIORITY_QUERY: "query", PRIORITY_INGEST: "ingest"}
+
+# Mã lỗi HTTP nên thử lại; các lỗi 4xx khác (400, 401, 403, 404...) thử lại cũng không khỏi
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Ước lượng số token của một văn bản mà không cần chạy tokenizer:
+    ~3 byte UTF-8 mỗi token (tiếng Việt có dấu thường nhiều token hơn tiếng Anh), thiên về ước lượng dư.
+    """
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Lỗi mạng / timeout / 429 / 5xx thì thử lại; lỗi request (4xx khác) thì không."""
+    status = _status_code(error)
+    return status is None or status >= 500 or status in _RETRYABLE_STATUS
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Đọc header Retry-After / retry-after-ms của response lỗi (nếu có)."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # Retry-After dạng ngày giờ HTTP: bỏ qua, dùng backoff
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, error: Exception, base: float = 1.0, cap: float = 60.0) -> float:
+    """Thời gian chờ trước lần thử thứ attempt + 1: theo Retry-After nếu có, ngược lại exponential backoff + full jitter."""
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class _TokenBucket:
+    """Bucket nạp đều theo `per_minute`, chứa tối đa `capacity`; per_minute <= 0 là không giới hạn."""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def refill(self, now: float) -> None:
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Request lớn hơn cả bucket: chờ đầy bucket rồi cho mức xuống âm (các request sau chờ bù)
+        if self.unlimited:
+            return 0.0
+        needed = min(amount, self.capacity)
+        return max(0.0, (needed - self.level) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= amount
+
+
+class EmbeddingScheduler:
+    """
+    Điều phối các lần gọi API embedding trong process theo giới hạn của OpenAI.
+
+    - Hai token bucket: số request / phút và số token / phút (token ước lượng theo estimate_tokens).
+    - Tối đa `max_in_flight` lần gọi chạy đồng thời; các batch ingest được gửi song song tới giới hạn đó.
+    - Hàng đợi theo làn ưu tiên: câu hỏi chat (PRIORITY_QUERY) luôn được cấp quota trước batch ingest.
+    - Lỗi có thể thử lại được chờ theo Retry-After hoặc exponential backoff + jitter; gặp 429 thì
+      tạm dừng cấp quota cho mọi làn tới hết thời gian chờ.
+    """
+
+    def __init__(self, requests_per_minute: float = 3000, tokens_per_minute: float = 1_000_000,
+                 max_in_flight: int = 4, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, burst_seconds: float = 10.0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(1, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._requests = _TokenBucket(requests_per_minute, burst_seconds)
+        self._tokens = _TokenBucket(tokens_per_minute, burst_seconds)
+        self._queue: List[list] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._changed: Optional[asyncio.Event] = None
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.wait_seconds = {name: 0.0 for name in _LANE_NAMES.values()}
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: int, priority: int = PRIORITY_INGEST) -> T:
+        """Chạy `call` khi đủ quota, thử lại tối đa max_retries lần với lỗi có thể thử lại."""
+        for attempt in range(self.max_retries):
+            await self._acquire(tokens, priority)
+            try:
+                try:
+                    return await call()
+                finally:
+                    # Trả slot cả khi call() bị huỷ (CancelledError không phải Exception)
+                    self._release()
+            except Exception as e:
+                if attempt == self.max_retries - 1 or not is_retryable(e):
+                    self.failures += 1
+                    raise
+                delay = backoff_delay(attempt, e, self.backoff_base, self.backoff_max)
+                self.retries += 1
+                if _status_code(e) == 429:
+                    self.rate_limited += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    self._notify()
+                logger.warning(f"[EmbeddingScheduler] Lỗi {type(e).__name__} ({_status_code(e)}), thử lại sau {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def _acquire(self, tokens: int, priority: int) -> None:
+        entry = [priority, next(self._seq), tokens]
+        heapq.heappush(self._queue, entry)
+        started = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                timeout = None
+                if self._queue[0] is entry and self._in_flight < self.max_in_flight:
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    timeout = max(self._paused_until - now, self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                    if timeout <= 0:
+                        heapq.heappop(self._queue)
+                        self._requests.consume(1)
+                        self._tokens.consume(tokens)
+                        self._in_flight += 1
+                        self.calls += 1
+                        lane = _LANE_NAMES.get(priority, str(priority))
+                        self.wait_seconds[lane] = self.wait_seconds.get(lane, 0.0) + now - started
+                        # Người kế tiếp trong hàng đợi có thể được cấp ngay
+                        self._notify()
+                        return
+                if self._changed is None:
+                    self._changed = asyncio.Event()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # Người gọi bị huỷ khi đang chờ: rút khỏi hàng đợi
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._notify()
+
+    def stats(self) -> Dict[str, Any]:
+        queued: Dict[str, int] = {name: 0 for name in _LANE_NAMES.values()}
+        for priority, _, _ in self._queue:
+            name = _LANE_NAMES.get(priority, str(priority))
+            queued[name] = queued.get(name, 0) + 1
+        return {
+            "requests_per_minute": self._requests.rate * 60,
+            "tokens_per_minute": self._tokens.rate * 60,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "queued": queued,
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "wait_seconds": {k: round(v, 3) for k, v in self.wait_seconds.items()},
+        }
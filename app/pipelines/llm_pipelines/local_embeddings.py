@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Model đa ngôn ngữ (có tiếng Việt), repo trên HuggingFace có sẵn bản ONNX lượng tử hoá int8.
+# Mặc định dùng bản int8 không gắn với kiến trúc CPU; onnx/model_qint8_avx512_vnni.onnx nhanh hơn
+# nhưng chỉ nên bật (EMBEDDING_LOCAL_ONNX_FILE) trên máy có AVX512-VNNI, CPU khác có thể sai số / chậm.
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_ONNX_FILE = "onnx/model_quantized.onnx"
+
+
+class LocalEmbeddings:
+    """
+    Embedding chạy trên CPU bằng ONNX Runtime (qua sentence-transformers, backend="onnx"),
+    cùng giao diện với OpenAIEmbeddings mà EmbeddingGenerator dùng:
+    `model`, embed_query / embed_documents / aembed_query / aembed_documents.
+
+    - Văn bản được sắp theo độ dài rồi chia batch (padding theo batch, không theo max_length),
+      các batch chạy song song trên một ThreadPoolExecutor có số thread bằng số core.
+    - Mỗi lần chạy session ONNX dùng `intra_op_threads` thread (mặc định 1), nên nhiều batch /
+      nhiều câu hỏi đồng thời chia đều các core thay vì tranh nhau.
+    - Câu hỏi lẻ từ các request đồng thời đã được query_batcher gom lại trước khi tới đây.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_LOCAL_MODEL,
+        onnx_file: str = DEFAULT_ONNX_FILE,
+        batch_size: int = 32,
+        num_threads: int = 0,
+        intra_op_threads: int = 1,
+        max_seq_length: Optional[int] = None,
+    ):
+        """
+        Args:
+            model_name (str): Model trên HuggingFace hoặc thư mục local.
+            onnx_file (str): File ONNX trong repo model (vd bản int8); rỗng thì dùng onnx/model.onnx,
+                sentence-transformers tự export nếu repo chưa có. Repo không có file này thì cũng lùi về
+                onnx/model.onnx (kèm cảnh báo).
+            batch_size (int): Số văn bản tối đa trong một lần chạy model.
+            num_threads (int): Số thread của pool (0 = số core).
+            intra_op_threads (int): Số thread ONNX Runtime dùng cho một lần chạy.
+            max_seq_length (int, optional): Cắt văn bản dài hơn số token này (mặc định theo model).
+        """
+        # Import muộn: chỉ nạp torch / onnxruntime khi thực sự dùng backend local
+        import onnxruntime
+        from sentence_transformers import SentenceTransformer
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = intra_op_threads
+        session_options.inter_op_num_threads = 1
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+        if onnx_file:
+            try:
+                self.client = SentenceTransformer(
+                    model_name, device="cpu", backend="onnx", model_kwargs={**model_kwargs, "file_name": onnx_file}
+                )
+            except Exception as e:
+                logger.warning(
+                    f"[LocalEmbeddings] Không nạp được {onnx_file} của {model_name} ({e}), dùng onnx/model.onnx"
+                )
+                onnx_file = ""
+        if not onnx_file:
+            self.client = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        if max_seq_length:
+            self.client.max_seq_length = max_seq_length
+        # Khoá của embedding_cache: bản lượng tử hoá cho vector khác bản gốc
+        self.model = f"{model_name}@{onnx_file}" if onnx_file else model_name
+        self.dimension = self.client.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix="local-embed")
+        logger.info(
+            f"[LocalEmbeddings] Đã nạp {self.model} (dim={self.dimension}, "
+            f"{self.num_threads} thread, batch={self.batch_size})"
+        )
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.client.encode(
+            texts, batch_size=len(texts), normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def _batches(self, texts: List[str]) -> List[List[int]]:
+        """Chỉ số văn bản theo từng batch, sắp theo độ dài để các văn bản trong batch dài gần bằng nhau."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        return [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+    @staticmethod
+    def _reassemble(size: int, parts: List[Tuple[List[int], List[List[float]]]]) -> List[List[float]]:
+        vectors: List[Optional[List[float]]] = [None] * size
+        for indices, batch_vectors in parts:
+            for i, vector in zip(indices, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = self._batches(texts)
+        results = self._executor.map(lambda idx: self._encode([texts[i] for i in idx]), batches)
+        return self._reassemble(len(texts), list(zip(batches, results)))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        batches = self._batches(texts)
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._encode, [texts[i] for i in idx]) for idx in batches
+        ))
+        return self._reassemble(len(texts), list(zip(batches, results)))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return (await loop.run_in_executor(self._executor, self._encode, [text]))[0]
+
+
+_instances: Dict[tuple, LocalEmbeddings] = {}
+_instances_lock = threading.Lock()
+
+
+def get_local_embeddings(**kwargs) -> LocalEmbeddings:
+    """
+    Một LocalEmbeddings cho mỗi cấu hình trong process: các VectorStoreManager trong pool
+    dùng chung model và thread pool thay vì mỗi instance nạp một bản.
+    """
+    key = tuple(sorted(kwargs.items()))
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = LocalEmbeddings(**kwargs)
+        return _instances[key]
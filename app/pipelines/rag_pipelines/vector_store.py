@@ -1,15 +1,27 @@
 import os
 import asyncio
-from typing import List, Dict, Tuple, Any
+import time
+from typing import List, Dict, Tuple, Any, Optional
 from datetime import datetime
 import uuid
 
 from qdrant_client.async_qdrant_client import AsyncQdrantClient
 from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
     CollectionStatus,
     Filter,
     FieldCondition,
+    HnswConfigDiff,
+    MatchAny,
     MatchValue,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    PointIdsList,
     ScoredPoint
 )
 from qdrant_client.models import VectorParams, Distance, PointStruct
@@ -17,6 +29,53 @@ from langchain_core.documents import Document
 
 from pipelines.llm_pipelines.embedding_generator import EmbeddingGenerator
 
+# Namespace của id point (UUIDv5): cùng file + cùng số thứ tự chunk luôn cho cùng id
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "qdrant://chatbot_embeddings/points")
+
+# Các trường metadata được đánh keyword index: xoá theo file và lọc khi search không phải quét cả collection
+PAYLOAD_INDEX_FIELDS = ("metadata.file_name", "metadata.file_type", "metadata.hs_code")
+
+
+# Kiểu lượng tử hoá vector hỗ trợ khi tạo collection
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+
+def collection_options(vector_size: int, hnsw_m: int = 16, hnsw_ef_construct: int = 100,
+                       quantization: str = "none", on_disk: bool = False) -> Dict[str, Any]:
+    """
+    Tham số cho create_collection: vector cosine, index HNSW (m / ef_construct), lượng tử hoá
+    (scalar int8 hoặc binary, bản lượng tử luôn giữ trên RAM) và lưu vector / payload / HNSW trên đĩa (mmap).
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"quantization phải là một trong {QUANTIZATION_MODES}, nhận '{quantization}'")
+    quantization_config = None
+    if quantization == "scalar":
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif quantization == "binary":
+        quantization_config = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return {
+        "vectors_config": VectorParams(size=vector_size, distance=Distance.COSINE, on_disk=on_disk),
+        "hnsw_config": HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct, on_disk=on_disk),
+        "quantization_config": quantization_config,
+        "on_disk_payload": on_disk,
+    }
+
+
+def search_params(hnsw_ef: int = 0, oversampling: float = 2.0, quantization: str = "none",
+                  exact: bool = False) -> Optional[SearchParams]:
+    """
+    Tham số search: hnsw_ef (0 = mặc định của Qdrant) và, khi collection có lượng tử hoá,
+    lấy dư `oversampling` lần ứng viên theo vector lượng tử rồi chấm lại bằng vector gốc.
+    """
+    quantization_params = None
+    if quantization != "none":
+        quantization_params = QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    if not hnsw_ef and quantization_params is None and not exact:
+        return None
+    return SearchParams(hnsw_ef=hnsw_ef or None, exact=exact, quantization=quantization_params)
+
 
 class VectorStoreManager:
     def __init__(
@@ -28,6 +87,15 @@ class VectorStoreManager:
         qdrant_api_key: str = None,
         qdrant_url: str = None,
         prefer_grpc: bool = True,
+        readiness_ttl: float = 300.0,
+        upsert_batch_size: int = 256,
+        upsert_concurrency: int = 4,
+        hnsw_m: int = 16,
+        hnsw_ef_construct: int = 100,
+        quantization: str = "none",
+        on_disk: bool = False,
+        search_hnsw_ef: int = 0,
+        search_oversampling: float = 2.0,
     ):
         """
         Quản lý lưu trữ embedding trong Qdrant, sử dụng AsyncQdrantClient gốc (không dùng langchain_qdrant).
@@ -40,8 +108,23 @@ class VectorStoreManager:
             qdrant_api_key (str): API key Qdrant (nếu dùng Qdrant Cloud).
             qdrant_url (str): URL Qdrant, vd "http://localhost:6333". Nếu không truyền, build từ host+port.
             prefer_grpc (bool): Ưu tiên gRPC thay vì REST. Mặc định True.
+            readiness_ttl (float): Sau bao nhiêu giây thì kiểm tra lại collection (chạy nền).
+            upsert_batch_size (int): Số văn bản mỗi batch embedding + upsert trong store_embeddings.
+            upsert_concurrency (int): Số upsert chạy đồng thời tối đa.
+            hnsw_m, hnsw_ef_construct (int): Tham số index HNSW khi tạo collection mới.
+            quantization (str): "none", "scalar" (int8) hoặc "binary"; chỉ áp dụng khi tạo collection mới.
+            on_disk (bool): Lưu vector gốc, payload và HNSW trên đĩa (mmap) khi tạo collection mới.
+            search_hnsw_ef (int): hnsw_ef khi search (0 = mặc định của Qdrant).
+            search_oversampling (float): Hệ số lấy dư ứng viên trước khi chấm lại khi có lượng tử hoá.
         """
         self.collection_name = collection_name
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        self.upsert_concurrency = max(1, upsert_concurrency)
+        self.index_options = {
+            "hnsw_m": hnsw_m, "hnsw_ef_construct": hnsw_ef_construct,
+            "quantization": quantization, "on_disk": on_disk,
+        }
+        self.search_params = search_params(search_hnsw_ef, search_oversampling, quantization)
 
         # Tạo EmbeddingGenerator
         self.embedding_generator = EmbeddingGenerator(
@@ -60,94 +143,241 @@ class VectorStoreManager:
             timeout=6000
         )
 
+        # Kết quả kiểm tra collection được giữ lại, không gọi get_collection trước mỗi thao tác
+        self.readiness_ttl = readiness_ttl
+        self._collection_ready = False
+        self._ready_checked_at = 0.0
+        self._ready_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
     async def init_collection(self):
         """
         Gọi hàm này 1 lần (vd trong lifespan) để tạo/kiểm tra collection.
+        Các thao tác sau đó dùng ensure_collection (kết quả kiểm tra được cache).
         """
-        collections_response = await self.qdrant_client.get_collections()
-        existing_collections = [col.name for col in collections_response.collections]
-
-        if self.collection_name not in existing_collections:
-            # Lấy kích thước embedding (lấy embedding 1 câu dummy)
+        try:
+            await self._check_collection()
+        except Exception:
+            self._collection_ready = False
+            raise
+        self._collection_ready = True
+        self._ready_checked_at = time.monotonic()
+
+    async def _check_collection(self):
+        # Số chiều lấy từ backend / bảng model -> dimension; chỉ model lạ mới phải embedding 1 câu dummy
+        known_size = self.embedding_generator.dimension
+
+        if not await self.qdrant_client.collection_exists(self.collection_name):
             dummy_text = "Test"
-            vector_size = len(self.embedding_generator.embedding_model.embed_query(dummy_text))
+            vector_size = known_size or len(await self.embedding_generator.aembed_query(dummy_text))
 
             # Tạo collection mới
-            vector_config = VectorParams(size=vector_size, distance=Distance.COSINE)
             await self.qdrant_client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=vector_config
+                **collection_options(vector_size, **self.index_options)
             )
-            print(f"[VectorStoreManager] Đã tạo collection '{self.collection_name}' với vector_size={vector_size}")
+            print(
+                f"[VectorStoreManager] Đã tạo collection '{self.collection_name}' với vector_size={vector_size}, "
+                f"{self.index_options}"
+            )
+            await self._ensure_payload_indexes(set())
         else:
             # Kiểm tra trạng thái
             col_info = await self.qdrant_client.get_collection(self.collection_name)
             if col_info.status != CollectionStatus.GREEN:
                 raise Exception(f"Collection {self.collection_name} không ở trạng thái GREEN.")
+            collection_size = getattr(col_info.config.params.vectors, "size", None)
+            if known_size and collection_size and collection_size != known_size:
+                raise Exception(
+                    f"Collection {self.collection_name} có vector_size={collection_size} nhưng backend "
+                    f"'{self.embedding_generator.backend}' sinh vector {known_size} chiều. "
+                    f"Hãy dùng QDRANT_COLLECTION_NAME khác hoặc ingest lại dữ liệu."
+                )
+            # Collection tạo trước khi có payload index: bổ sung các index còn thiếu
+            await self._ensure_payload_indexes(set(col_info.payload_schema or {}))
+
+    async def _ensure_payload_indexes(self, existing: set):
+        for field_name in PAYLOAD_INDEX_FIELDS:
+            if field_name in existing:
+                continue
+            await self.qdrant_client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD,
+                wait=True
+            )
+            print(f"[VectorStoreManager] Đã tạo payload index '{field_name}' cho collection '{self.collection_name}'")
 
-    async def store_embeddings(self, texts: List[str], metadata: List[Dict[str, Any]] = None):
+    @staticmethod
+    def build_filter(metadata_filter: Optional[Dict[str, Any]]) -> Optional[Filter]:
+        """
+        Chuyển bộ lọc dạng dict trên payload["metadata"] thành Filter của Qdrant.
+        Vd {"file_type": ".pdf"} hoặc {"file_type": [".doc", ".docx"]} (list = khớp một trong các giá trị).
+        """
+        if not metadata_filter:
+            return None
+        conditions = []
+        for key, value in metadata_filter.items():
+            if isinstance(value, (list, tuple, set)):
+                match = MatchAny(any=list(value))
+            else:
+                match = MatchValue(value=value)
+            conditions.append(FieldCondition(key=f"metadata.{key}", match=match))
+        return Filter(must=conditions)
+
+    async def ensure_collection(self):
+        """
+        Đảm bảo collection sẵn sàng trước khi search / upsert / delete.
+        - Đã kiểm tra thành công: trả về ngay; quá readiness_ttl thì kiểm tra lại ở nền.
+        - Chưa kiểm tra hoặc lần gọi Qdrant trước bị lỗi: kiểm tra lại (một lần cho mọi coroutine đang chờ).
+        """
+        if self._collection_ready:
+            stale = time.monotonic() - self._ready_checked_at > self.readiness_ttl
+            if stale and (self._refresh_task is None or self._refresh_task.done()):
+                self._refresh_task = asyncio.create_task(self._refresh_collection())
+            return
+        async with self._ready_lock:
+            if not self._collection_ready:
+                await self.init_collection()
+
+    async def _refresh_collection(self):
+        try:
+            await self.init_collection()
+        except Exception as e:
+            # init_collection đã đánh dấu chưa sẵn sàng: thao tác kế tiếp sẽ kiểm tra lại và báo lỗi
+            print(f"[VectorStoreManager] Kiểm tra lại collection '{self.collection_name}' thất bại: {e}")
+
+    def invalidate_collection(self):
+        """Gọi khi một thao tác Qdrant lỗi: lần sau sẽ kiểm tra lại collection trước khi dùng."""
+        self._collection_ready = False
+
+    @staticmethod
+    def point_id(source_id: str, index: int) -> str:
+        """Id cố định của chunk thứ `index` trong file có SHA-256 `source_id`: ingest lại thì ghi đè, không nhân bản."""
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source_id}:{index}"))
+
+    async def store_embeddings(self, texts: List[str], metadata: List[Dict[str, Any]] = None,
+                               source_id: Optional[str] = None) -> List[str]:
         """
         Lưu trữ embedding và metadata vào Qdrant giống như cách QdrantVectorStore thực hiện.
 
+        Chạy theo pipeline từng batch `upsert_batch_size` văn bản: embedding batch N+1 trong lúc
+        upsert batch N. Tối đa `upsert_concurrency` upsert chạy đồng thời với wait=False; batch cuối
+        được gửi với wait=True sau khi các batch trước đã được nhận, làm rào nhất quán
+        (Qdrant áp dụng thay đổi theo thứ tự nhận nên khi hàm trả về mọi point đã tìm kiếm được).
+
         Args:
             texts (List[str]): Danh sách văn bản cần lưu.
             metadata (List[Dict[str, Any]]): Danh sách metadata tương ứng với từng văn bản.
+            source_id (str, optional): SHA-256 của file nguồn; có thì id point là UUIDv5(file, số thứ tự chunk),
+                không có thì dùng uuid4 ngẫu nhiên.
+
+        Returns:
+            List[str]: id các point đã ghi (lưu vào FileRegistry để xoá theo id).
         """
         if not texts:
             raise ValueError("Danh sách văn bản không được rỗng.")
 
-        # Tạo embedding từ văn bản
-        embeddings = self.embedding_generator.embed_documents(texts)
-
         # Chuẩn bị metadata (nếu không có thì tạo mặc định)
         if metadata is None:
             metadata = [{} for _ in range(len(texts))]
+        timestamp = datetime.now().isoformat()
         for meta in metadata:
-            meta["timestamp"] = datetime.now().isoformat()  # Thêm timestamp như QdrantVectorStore
-
-        # Tạo danh sách PointStruct
-        points = []
-        for text, emb, meta in zip(texts, embeddings, metadata):
-            # Tạo payload giống QdrantVectorStore
-            payload = {
-                "page_content": text,
-                "metadata": meta
-            }
-
-            point = PointStruct(
-                id=str(uuid.uuid4()),
-                vector=emb,
-                payload=payload
-            )
-            points.append(point)
+            meta["timestamp"] = timestamp  # Thêm timestamp như QdrantVectorStore
 
-        # Upsert vào Qdrant
-        await self.qdrant_client.upsert(
-            collection_name=self.collection_name,
-            wait=True,  # Chờ hoàn tất
-            points=points
-        )
+        if source_id:
+            point_ids = [self.point_id(source_id, i) for i in range(len(texts))]
+        else:
+            point_ids = [str(uuid.uuid4()) for _ in texts]
+
+        await self.ensure_collection()
+
+        batch_size = self.upsert_batch_size
+        starts = list(range(0, len(texts), batch_size))
+        slots = asyncio.Semaphore(self.upsert_concurrency)
+        uploads: List[asyncio.Future] = []
+
+        def embed(start: int) -> asyncio.Future:
+            return asyncio.ensure_future(self.embedding_generator.aembed_documents(texts[start:start + batch_size]))
+
+        next_embedding = embed(starts[0])
+        try:
+            for n, start in enumerate(starts):
+                embeddings = await next_embedding
+                if n + 1 < len(starts):
+                    next_embedding = embed(starts[n + 1])
+
+                # Tạo payload giống QdrantVectorStore
+                points = [
+                    PointStruct(
+                        id=point_ids[i],
+                        vector=emb,
+                        payload={"page_content": texts[i], "metadata": metadata[i]}
+                    )
+                    for i, emb in enumerate(embeddings, start)
+                ]
+
+                if n + 1 < len(starts):
+                    # Chờ có chỗ trống: embedding không chạy quá xa so với upsert
+                    await slots.acquire()
+                    # Một upsert trước đó đã lỗi: dừng luôn, không embedding tiếp
+                    for upload in uploads:
+                        if upload.done() and upload.exception() is not None:
+                            raise upload.exception()
+                    uploads.append(asyncio.ensure_future(self._upsert_batch(points, wait=False, slot=slots)))
+                else:
+                    await asyncio.gather(*uploads)
+                    await self._upsert_batch(points, wait=True)
+        except BaseException:
+            next_embedding.cancel()
+            for upload in uploads:
+                upload.cancel()
+            raise
 
         print(f"Đã lưu {len(texts)} embedding vào collection '{self.collection_name}'")
+        return point_ids
 
-    async def get_relevant_documents(self, query: str, top_k: int = 20) -> List[Document]:
+    async def _upsert_batch(self, points: List[PointStruct], wait: bool,
+                            slot: Optional[asyncio.Semaphore] = None) -> None:
+        try:
+            await self.qdrant_client.upsert(
+                collection_name=self.collection_name,
+                wait=wait,
+                points=points
+            )
+        except Exception:
+            self.invalidate_collection()
+            raise
+        finally:
+            if slot is not None:
+                slot.release()
+
+    async def get_relevant_documents(self, query: str, top_k: int = 20,
+                                     metadata_filter: Optional[Dict[str, Any]] = None) -> List[Document]:
         """
         Tìm kiếm các văn bản liên quan theo query embedding. 
         Trả về danh sách Document (chỉ content, metadata).
+        metadata_filter: chỉ tìm trong các point khớp (xem build_filter).
         """
-        await self.init_collection()
+        await self.ensure_collection()
 
         # Embed query
-        query_emb = self.embedding_generator.embedding_model.embed_query(query)
+        query_emb = await self.embedding_generator.aembed_query(query)
 
         # Gọi search
-        search_results: List[ScoredPoint] = await self.qdrant_client.search(
-            collection_name=self.collection_name,
-            query_vector=query_emb,
-            limit=top_k,
-            with_payload=True,
-            with_vectors=False
-        )
+        try:
+            search_results: List[ScoredPoint] = await self.qdrant_client.search(
+                collection_name=self.collection_name,
+                query_vector=query_emb,
+                query_filter=self.build_filter(metadata_filter),
+                search_params=self.search_params,
+                limit=top_k,
+                with_payload=True,
+                with_vectors=False
+            )
+        except Exception:
+            self.invalidate_collection()
+            raise
 
         # Chuyển thành list Document
         docs: List[Document] = []
@@ -162,28 +392,38 @@ class VectorStoreManager:
             docs.append(doc)
         return docs
 
-    async def get_relevant_documents_with_scores(self, query: str, top_k: int = 50) -> List[Tuple[Document, float]]:
+    async def get_relevant_documents_with_scores(self, query: str, top_k: int = 50,
+                                                 metadata_filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
         """
         Trả về danh sách (Document, similarity score) bằng cách sử dụng QdrantClient trực tiếp.
 
         Args:
             query (str): Truy vấn của người dùng.
             top_k (int): Số lượng tài liệu liên quan trả về (mặc định 50).
+            metadata_filter (dict, optional): Chỉ tìm trong các point có metadata khớp, vd {"file_type": ".pdf"}.
 
         Returns:
             List[Tuple[Document, float]]: Danh sách các tài liệu và điểm tương đồng.
         """
+        await self.ensure_collection()
+
         # Embed truy vấn thành vector
-        query_vector = self.embedding_generator.embedding_model.embed_query(query)
+        query_vector = await self.embedding_generator.aembed_query(query)
 
         # Thực hiện tìm kiếm với QdrantClient
-        search_result = await self.qdrant_client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            limit=top_k,
-            with_payload=True,  # Lấy payload (page_content và metadata)
-            with_vectors=False   # Không cần vector trong kết quả
-        )
+        try:
+            search_result = await self.qdrant_client.search(
+                collection_name=self.collection_name,
+                query_vector=query_vector,
+                query_filter=self.build_filter(metadata_filter),
+                search_params=self.search_params,
+                limit=top_k,
+                with_payload=True,  # Lấy payload (page_content và metadata)
+                with_vectors=False   # Không cần vector trong kết quả
+            )
+        except Exception:
+            self.invalidate_collection()
+            raise
 
         # Chuyển đổi kết quả thành List[Tuple[Document, float]]
         results = []
@@ -203,25 +443,39 @@ class VectorStoreManager:
         """
         Xóa points theo metadata.
         """
-        await self.init_collection()
-
-        filter_condition = Filter(
-            must=[
-                FieldCondition(
-                    key="metadata.file_name",  # Truy cập payload["metadata"]["file_name"]
-                    match=MatchValue(value=file_name)
-                ),
-                FieldCondition(
-                    key="metadata.file_type",  # Truy cập payload["metadata"]["file_type"]
-                    match=MatchValue(value=file_type)
-                )
-            ]
-        )
+        await self.ensure_collection()
 
-        await self.qdrant_client.delete(
-            collection_name=self.collection_name,
-            points_selector=filter_condition,
-            wait=True
-        )
+        # payload["metadata"]["file_name"] / ["file_type"], đều có payload index
+        filter_condition = self.build_filter({"file_name": file_name, "file_type": file_type})
+
+        try:
+            await self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=filter_condition,
+                wait=True
+            )
+        except Exception:
+            self.invalidate_collection()
+            raise
 
         print(f"[VectorStoreManager] Đã xóa points có metadata.file_name='{file_name}' và metadata.file_type='{file_type}'")
+
+    async def delete_points_by_ids(self, point_ids: List[str]):
+        """
+        Xóa points theo id (lấy từ FileRegistry), không cần lọc payload trên toàn collection.
+        """
+        if not point_ids:
+            return
+        await self.ensure_collection()
+
+        try:
+            await self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=point_ids),
+                wait=True
+            )
+        except Exception:
+            self.invalidate_collection()
+            raise
+
+        print(f"[VectorStoreManager] Đã xóa {len(point_ids)} points theo id")
@@ -6,59 +6,165 @@ import re
 import math
 import numpy as np
 import datetime
+import hashlib
+import time
+from typing import Iterator, Optional, Set
+
+from openpyxl import load_workbook
+
+from utils.text_normalizer import fold_vietnamese
 
 logger = logging.getLogger(__name__)
 
+# Regex biên dịch sẵn cho bước làm sạch
+LEADING_MARKERS = re.compile(r"^(?:#&\s*)+")
+TRAILING_MARKERS = re.compile(r"(?:\s*#&)+\Z")
+SUPPLIER_LTD_PREFIX = re.compile(r"(?<!\., )\bLTD\b")
+SUPPLIER_LTD_SUFFIX = re.compile(r"\bLTD\b(?!\.)(?=\s|$)")
+SUPPLIER_DOT_SPACES = re.compile(r"\s*\.\s*")
+SUPPLIER_COMMA_SPACES = re.compile(r"\s*,\s*")
+SUPPLIER_MULTI_DOTS = re.compile(r"\.{2,}")
+SUPPLIER_MULTI_COMMAS = re.compile(r",{2,}")
+SUPPLIER_PUNCT_RUN = re.compile(r"([.,]+)")
+
+# Kiểu suy ra (pd.api.types.infer_dtype) chắc chắn không chứa Timestamp / date
+NON_DATE_INFERRED_TYPES = {
+    "string", "empty", "bytes", "floating", "integer", "mixed-integer-float",
+    "decimal", "boolean", "categorical",
+}
+
 # Các hàm không thay đổi giữ nguyên như trong mã gốc
 def xlsx_to_df(file_path: str) -> pd.DataFrame:
     logger.info(f"[xlsx_to_df] Đang đọc file Excel: {file_path}")
     df = pd.read_excel(file_path, engine='openpyxl')
-    df = df.copy(deep=True)
     logger.info(f"[xlsx_to_df] Đọc xong file Excel, shape={df.shape}")
     return df
 
+def iter_xlsx_chunks(file_path: str, chunk_size: int = 5000) -> Iterator[pd.DataFrame]:
+    """
+    Đọc sheet đầu tiên theo từng khối `chunk_size` dòng (openpyxl read_only + iter_rows),
+    dòng đầu là tiêu đề. Bộ nhớ tối đa phụ thuộc vào chunk_size chứ không phụ thuộc kích thước file.
+    Bỏ qua các dòng trống hoàn toàn.
+    """
+    logger.info(f"[iter_xlsx_chunks] Đang đọc file Excel theo khối {chunk_size} dòng: {file_path}")
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        chunk = []
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            chunk.append(values[:len(columns)])
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        wb.close()
+
 def remove_unwanted_chars(text: str) -> str:
-    if not isinstance(text, str):
+    if not isinstance(text, str) or ("#&" not in text and "'" not in text):
         return text
-    while text.startswith("#&"):
-        text = text[2:].lstrip()
-    while text.endswith("#&"):
-        text = text[:-2].rstrip()
-    text = text.replace("'", "")
-    text = text.replace("#&", ",")
-    return text
+    text = LEADING_MARKERS.sub("", text)
+    text = TRAILING_MARKERS.sub("", text)
+    return text.replace("'", "").replace("#&", ",")
+
+def remove_unwanted_chars_series(series: pd.Series) -> pd.Series:
+    """
+    remove_unwanted_chars cho cả cột: mỗi giá trị khác nhau chỉ xử lý một lần,
+    chỉ các ô thực sự thay đổi mới được ghi lại; giá trị không phải chuỗi giữ nguyên.
+    """
+    uniques = series.unique()
+    if len(uniques) * 2 > len(series):
+        # Cột gần như không lặp lại: xử lý trực tiếp từng ô rẻ hơn
+        return series.apply(remove_unwanted_chars)
+    changed = {}
+    for value in uniques:
+        if isinstance(value, str):
+            cleaned = remove_unwanted_chars(value)
+            if cleaned != value:
+                changed[value] = cleaned
+    if not changed:
+        return series
+    mask = series.isin(list(changed))
+    return series.mask(mask, series[mask].map(changed))
 
 def clean_special_chars_in_str_cols(df: pd.DataFrame) -> pd.DataFrame:
     logger.info("[clean_special_chars_in_str_cols] Bắt đầu xử lý cột kiểu chuỗi.")
     for col in df.columns:
         if pd.api.types.is_object_dtype(df[col]):
-            df.loc[:, col] = df[col].apply(remove_unwanted_chars)
+            df.loc[:, col] = remove_unwanted_chars_series(df[col])
     logger.info("[clean_special_chars_in_str_cols] Xong xử lý cột kiểu chuỗi.")
     return df
 
 def process_supplier_name(text: str) -> str:
     if not isinstance(text, str):
         return text
-    text = re.sub(r"(?<!\., )\bLTD\b", r"., LTD", text)
-    text = re.sub(r"\bLTD\b(?!\.)(?=\s|$)", r"LTD.", text)
-    text = re.sub(r"\s*\.\s*", ".", text)
-    text = re.sub(r"\s*,\s*", ",", text)
-    text = re.sub(r"\.{2,}", ".", text)
-    text = re.sub(r",{2,}", ",", text)
-    text = re.sub(r"([.,]+)", lambda m: ".," if '.' in m.group(0) and ',' in m.group(0) else m.group(0), text)
+    text = SUPPLIER_LTD_PREFIX.sub(r"., LTD", text)
+    text = SUPPLIER_LTD_SUFFIX.sub(r"LTD.", text)
+    text = SUPPLIER_DOT_SPACES.sub(".", text)
+    text = SUPPLIER_COMMA_SPACES.sub(",", text)
+    text = SUPPLIER_MULTI_DOTS.sub(".", text)
+    text = SUPPLIER_MULTI_COMMAS.sub(",", text)
+    text = SUPPLIER_PUNCT_RUN.sub(lambda m: ".," if '.' in m.group(0) and ',' in m.group(0) else m.group(0), text)
     return text
 
 def process_supplier_column(df: pd.DataFrame) -> pd.DataFrame:
     if "Nhà cung cấp" in df.columns:
         logger.info("[process_supplier_column] Bắt đầu xử lý cột 'Nhà cung cấp'.")
-        df.loc[:, "Nhà cung cấp"] = df["Nhà cung cấp"].astype(str).apply(process_supplier_name)
+        suppliers = df["Nhà cung cấp"].astype(str)
+        # Chuẩn hoá một lần cho mỗi tên khác nhau rồi ánh xạ lại
+        normalized = {name: process_supplier_name(name) for name in suppliers.unique()}
+        df.loc[:, "Nhà cung cấp"] = suppliers.map(normalized)
         logger.info("[process_supplier_column] Xong xử lý cột 'Nhà cung cấp'.")
     return df
 
-def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+def _canonical_column(values: pd.Series) -> pd.Series:
+    """
+    Dạng chuỗi chuẩn của một cột khi so trùng giữa các khối, tính theo cả cột: số -> chuỗi của float
+    (1 / 1.0 / 1.00 như nhau), ngày -> isoformat, ô trống / NaN / NaT -> "". Không phụ thuộc dtype
+    mà pandas suy ra riêng cho từng khối.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype(str)
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.astype(float)
+        return numbers.astype(str).where(numbers.notna(), "")
+    if pd.api.types.is_datetime64_any_dtype(values):
+        codes, uniques = pd.factorize(values)
+        iso = np.array([u.isoformat() for u in uniques] + [""], dtype=object)
+        return pd.Series(iso[codes], index=values.index)
+    text = values.astype(object)
+    empty = text.isna()
+    if pd.api.types.infer_dtype(text, skipna=True) in ("string", "empty"):
+        return text.where(~empty, "")
+    # Cột lẫn số và chuỗi: chỉ các ô kiểu số mới quy về float
+    is_str = text.map(type) == str
+    numbers = pd.to_numeric(text.where(~is_str), errors="coerce")
+    canonical = text.astype(str).where(numbers.isna(), numbers.astype(str))
+    return canonical.where(~empty, "")
+
+
+def remove_duplicates(df: pd.DataFrame, seen_hashes: Optional[Set[int]] = None) -> pd.DataFrame:
+    """
+    Loại bỏ dòng trùng lặp. Khi đọc theo khối, truyền cùng một `seen_hashes`
+    để loại cả các dòng đã xuất hiện ở khối trước (chỉ giữ hash 8 byte mỗi dòng).
+    """
     logger.info("[remove_duplicates] Bắt đầu loại bỏ dòng trùng lặp.")
     before = len(df)
     df = df.drop_duplicates(keep="first")
+    if seen_hashes is not None and len(df):
+        # Hash trên dạng chuẩn của từng ô để không phụ thuộc dtype suy ra ở từng khối (1 / 1.0)
+        canonical = pd.DataFrame({col: _canonical_column(df[col]) for col in df.columns})
+        hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+        is_new = np.fromiter((h not in seen_hashes for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        seen_hashes.update(hashes[is_new].tolist())
+        df = df[is_new]
     after = len(df)
     logger.info(f"[remove_duplicates] Đã loại bỏ {before - after} dòng trùng lặp. Còn {after} dòng.")
     df = df.copy(deep=True)
@@ -77,7 +183,8 @@ def df_processor(df: pd.DataFrame) -> pd.DataFrame:
     for col in tz_cols:
         df.loc[:, col] = df[col].dt.tz_localize(None)
     for col in df.select_dtypes(include=["object"]).columns:
-        if col != "Ngày":
+        # Chỉ duyệt từng ô khi cột thực sự có thể chứa giá trị ngày
+        if col != "Ngày" and pd.api.types.infer_dtype(df[col], skipna=True) not in NON_DATE_INFERRED_TYPES:
             df.loc[:, col] = df[col].apply(
                 lambda x: x.strftime("%Y-%m-%d") if isinstance(x, (pd.Timestamp, datetime.date)) and not pd.isnull(x) else x
             )
@@ -119,12 +226,8 @@ def determine_status_column(df: pd.DataFrame) -> str:
     else:
         return ''
 
-# Hàm pipeline chính với các thay đổi
-def xlsx_processor_pipeline(file_path: str, db_config: dict):
-    logger.info(f"[xlsx_processor_pipeline] Bắt đầu, file_path={file_path}")
-    df = xlsx_to_df(file_path)
-    logger.info(f"[xlsx_processor_pipeline] DataFrame ban đầu shape={df.shape}")
-
+def process_chunk(df: pd.DataFrame, file_path: str, seen_hashes: Optional[Set[int]] = None) -> pd.DataFrame:
+    """Các bước làm sạch cho một khối dòng: Trạng thái, đổi tên cột, df_processor, loại trùng, file_name, nhà cung cấp."""
     # Thêm cột 'Tình trạng'
     status_value = determine_status_column(df)
     df['Trạng thái'] = status_value
@@ -140,88 +243,281 @@ def xlsx_processor_pipeline(file_path: str, db_config: dict):
     # Đổi tên 13 cột đầu tiên, giữ nguyên các cột còn lại (bao gồm 'Tình trạng')
     df.columns = new_column_names + list(df.columns[13:])
 
-    # Tiếp tục xử lý như cũ
     processed_df = df_processor(df)
-    logger.info(f"[xlsx_processor_pipeline] Sau df_processor shape={processed_df.shape}")
-
-    processed_df = remove_duplicates(processed_df)
-    logger.info(f"[xlsx_processor_pipeline] Sau remove_duplicates shape={processed_df.shape}")
-
+    processed_df = remove_duplicates(processed_df, seen_hashes)
+    if processed_df.empty:
+        return processed_df
     processed_df = create_file_name_column(processed_df, file_path)
     processed_df = process_supplier_column(processed_df)
-    logger.info(f"[xlsx_processor_pipeline] Sau process_supplier_column shape={processed_df.shape}")
+    return processed_df
+
+# Hàm pipeline chính: đọc, làm sạch và insert theo từng khối
+def xlsx_processor_pipeline(file_path: str, db_config: dict, batch_size: int = 1000, chunk_size: int = 5000) -> int:
+    logger.info(f"[xlsx_processor_pipeline] Bắt đầu, file_path={file_path}")
+    seen_hashes: Set[int] = set()
+    total = 0
+    for chunk_no, chunk in enumerate(iter_xlsx_chunks(file_path, chunk_size), start=1):
+        processed_df = process_chunk(chunk, file_path, seen_hashes)
+        logger.info(f"[xlsx_processor_pipeline] Khối {chunk_no}: {len(chunk)} dòng đọc, {len(processed_df)} dòng sau làm sạch")
+        if not processed_df.empty:
+            total += store_dataframe_in_mysql(processed_df, db_config, batch_size=batch_size)
+    logger.info(f"[xlsx_processor_pipeline] Hoàn thành pipeline, đã lưu {total} dòng.")
+    return total
+
+# Thứ tự cột khi insert: (cột trong DataFrame, cột trong MySQL, là cột số hay không)
+INSERT_COLUMNS = [
+    ("Nhà cung cấp", "NhaCungCap", False),
+    ("Hs code", "HsCode", False),
+    ("Tên hàng", "TenHang", False),
+    ("Lượng", "Luong", True),
+    ("Đơn vị tính", "DonViTinh", False),
+    ("Tên nước xuất xứ", "TenNuocXuatXu", False),
+    ("Điều kiện giao hàng", "DieuKienGiaoHang", False),
+    ("Thuế suất XNK", "ThueSuatXNK", True),
+    ("Thuế suất TTĐB", "ThueSuatTTDB", True),
+    ("Thuế suất VAT", "ThueSuatVAT", True),
+    ("Thuế suất tự vệ", "ThueSuatTuVe", True),
+    ("Thuế suất BVMT", "ThueSuatBVMT", True),
+    ("Trạng thái", "TinhTrang", False),
+    ("file_name", "file_name", False),
+]
+
+
+def _date_column(df: pd.DataFrame) -> pd.Series:
+    """Cột 'Ngày' -> datetime.date, NaT -> None."""
+    if "Ngày" not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    dates = pd.to_datetime(df["Ngày"], errors="coerce")
+    return dates.dt.date.astype(object).where(dates.notna(), None)
+
+
+def _text_column(df: pd.DataFrame, col: str) -> pd.Series:
+    """Tương đương default_val(val) cho cả cột: None / NaN / '' -> ''."""
+    if col not in df.columns:
+        return pd.Series(["NaN"] * len(df), index=df.index, dtype=object)
+    values = df[col].astype(object)
+    return values.where(~(values.isna() | (values == "")), "")
+
+
+def _numeric_column(df: pd.DataFrame, col: str) -> pd.Series:
+    """Tương đương default_val(val, numeric=True) cho cả cột: ',' -> '.', None / NaN / '' / 'NaN' -> None."""
+    if col not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    values = df[col].astype(object)
+    is_str = values.map(type) == str
+    if is_str.any():
+        values = values.where(~is_str, values[is_str].str.replace(",", ".", regex=False))
+    return values.where(~(values.isna() | values.isin(["", "NaN"])), None)
+
+
+# Vị trí (trong tuple của dataframe_to_rows) các cột tham gia hash nội dung dòng:
+# Ngay + mọi cột INSERT_COLUMNS trừ file_name, để cùng một dòng ở hai file khác nhau có cùng hash
+ROW_HASH_POSITIONS = [(0, False)] + [
+    (i, numeric) for i, (_, mysql_col, numeric) in enumerate(INSERT_COLUMNS, start=1) if mysql_col != "file_name"
+]
+
+
+def _canonical_value(value, numeric: bool) -> str:
+    """Dạng chuỗi ổn định của một giá trị, giống nhau dù đọc từ DataFrame hay từ MySQL (Decimal, date)."""
+    if value is None:
+        return ""
+    if numeric:
+        try:
+            return repr(float(value))
+        except (TypeError, ValueError):
+            return str(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+def row_hash(row: tuple) -> bytes:
+    """SHA-1 (20 byte) của nội dung dòng, dùng cho unique index RowHash."""
+    text = "\x1f".join(_canonical_value(row[i], numeric) for i, numeric in ROW_HASH_POSITIONS)
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def dataframe_to_rows(df: pd.DataFrame) -> list:
+    """
+    Chuyển DataFrame đã xử lý thành list tuple theo thứ tự cột của câu INSERT.
+    Chuyển đổi theo cột (vector hoá) thay vì gọi default_val cho từng ô.
+    Hai cột cuối là TenHangKhongDau và RowHash.
+    """
+    columns = [_date_column(df)]
+    for df_col, _, numeric in INSERT_COLUMNS:
+        columns.append(_numeric_column(df, df_col) if numeric else _text_column(df, df_col))
+    ten_hang = columns[3]
+    # Bỏ dấu một lần cho mỗi tên hàng khác nhau
+    folded = {v: fold_vietnamese(v) for v in ten_hang.unique()}
+    columns.append(ten_hang.map(folded))
+    return [row + (row_hash(row),) for row in zip(*(c.tolist() for c in columns))]
 
-    store_dataframe_in_mysql(processed_df, db_config)
-    logger.info("[xlsx_processor_pipeline] Hoàn thành pipeline.")
 
 # Hàm lưu vào MySQL với cột 'Trạng thái' được thêm vào
-def store_dataframe_in_mysql(df: pd.DataFrame, db_config: dict, table_name: str = "import_data"):
+def store_dataframe_in_mysql(df: pd.DataFrame, db_config: dict, table_name: str = "import_data",
+                             batch_size: int = 1000, progress_every: int = 10) -> int:
+    """
+    Insert DataFrame vào MySQL theo lô bằng executemany (mysql-connector gộp thành INSERT nhiều dòng).
+    Mỗi lô là một transaction; log tiến độ sau mỗi `progress_every` lô kèm tốc độ dòng/giây.
+    Dùng INSERT IGNORE trên unique index RowHash: dòng đã có (từ file này hay file khác) bị bỏ qua.
+    Trả về số dòng thực sự được insert.
+    """
     logger.info("[store_dataframe_in_mysql] Bắt đầu insert vào MySQL.")
+    started = time.perf_counter()
+    rows = dataframe_to_rows(df)
+    row_count = len(rows)
+    logger.info(
+        f"[store_dataframe_in_mysql] Số dòng cần insert: {row_count} "
+        f"(chuyển đổi dữ liệu mất {time.perf_counter() - started:.2f}s)"
+    )
+
+    column_names = ["Ngay"] + [mysql_col for _, mysql_col, _ in INSERT_COLUMNS] + ["TenHangKhongDau", "RowHash"]
+    insert_query = (
+        f"INSERT IGNORE INTO {table_name} ({', '.join(column_names)}) "
+        f"VALUES ({', '.join(['%s'] * len(column_names))})"
+    )
+
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    inserted = 0
+    processed = 0
+    try:
+        for batch_no, start in enumerate(range(0, row_count, batch_size), start=1):
+            batch = rows[start:start + batch_size]
+            try:
+                cursor.executemany(insert_query, batch)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logger.error(
+                    f"[store_dataframe_in_mysql] Lỗi ở lô {batch_no} (dòng {start}-{start + len(batch) - 1}); "
+                    f"đã commit {processed} / {row_count} dòng trước đó."
+                )
+                raise
+            inserted += max(cursor.rowcount, 0)
+            processed += len(batch)
+            if batch_no % progress_every == 0:
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"[store_dataframe_in_mysql] Đã xử lý {processed} / {row_count} dòng "
+                    f"({processed / elapsed:.0f} dòng/giây)..."
+                )
+    finally:
+        cursor.close()
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"[store_dataframe_in_mysql] Đã lưu {inserted} dòng vào bảng `{table_name}` "
+        f"(bỏ qua {processed - inserted} dòng đã có) trong {elapsed:.2f}s "
+        f"({processed / elapsed if elapsed else 0:.0f} dòng/giây)."
+    )
+    return inserted
+
+def backfill_ten_hang_khong_dau(db_config: dict, table_name: str = "import_data", batch_size: int = 1000) -> int:
+    """
+    Điền cột TenHangKhongDau (bỏ dấu, chữ thường) cho các dòng đã ingest trước khi có cột này.
+    Trả về số dòng đã cập nhật.
+    """
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    updated = 0
     try:
-        conn = mysql.connector.connect(**db_config)
-        logger.info("[store_dataframe_in_mysql] Kết nối MySQL thành công.")
-        
-        cursor = conn.cursor()
-
-        insert_query = f"""
-            INSERT INTO {table_name} (
-                Ngay,
-                NhaCungCap,
-                HsCode,
-                TenHang,
-                Luong,
-                DonViTinh,
-                TenNuocXuatXu,
-                DieuKienGiaoHang,
-                ThueSuatXNK,
-                ThueSuatTTDB,
-                ThueSuatVAT,
-                ThueSuatTuVe,
-                ThueSuatBVMT,
-                TinhTrang,
-                file_name
+        while True:
+            cursor.execute(
+                f"SELECT id, TenHang FROM {table_name} WHERE TenHangKhongDau IS NULL LIMIT %s",
+                (batch_size,)
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        row_count = len(df)
-        logger.info(f"[store_dataframe_in_mysql] Số dòng cần insert: {row_count}")
-
-        for idx, row in df.iterrows():
-            ngay_value = row.get("Ngày")
-            if pd.isnull(ngay_value):
-                ngay_value = None
-            else:
-                ngay_value = ngay_value.date()
-
-            data_tuple = (
-                ngay_value,
-                default_val(row.get("Nhà cung cấp", "NaN")),
-                default_val(row.get("Hs code", "NaN")),
-                default_val(row.get("Tên hàng", "NaN")),
-                default_val(row.get("Lượng", "NaN"), numeric=True),
-                default_val(row.get("Đơn vị tính", "NaN")),
-                default_val(row.get("Tên nước xuất xứ", "NaN")),
-                default_val(row.get("Điều kiện giao hàng", "NaN")),
-                default_val(row.get("Thuế suất XNK", "NaN"), numeric=True),
-                default_val(row.get("Thuế suất TTĐB", "NaN"), numeric=True),
-                default_val(row.get("Thuế suất VAT", "NaN"), numeric=True),
-                default_val(row.get("Thuế suất tự vệ", "NaN"), numeric=True),
-                default_val(row.get("Thuế suất BVMT", "NaN"), numeric=True),
-                default_val(row.get("Trạng thái", "NaN")),
-                default_val(row.get("file_name", "NaN"))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                f"UPDATE {table_name} SET TenHangKhongDau = %s WHERE id = %s",
+                [(fold_vietnamese(ten_hang or ""), row_id) for row_id, ten_hang in rows]
             )
-            logger.info(f"Data tuple for row {idx}: {data_tuple}")
-            cursor.execute(insert_query, data_tuple)
-            if (idx + 1) % 100 == 0:
-                logger.info(f"[store_dataframe_in_mysql] Đã insert {idx+1} / {row_count} dòng...")
+            conn.commit()
+            updated += len(rows)
+            logger.info(f"[backfill_ten_hang_khong_dau] Đã cập nhật {updated} dòng...")
+    finally:
+        cursor.close()
+        conn.close()
+    return updated
+
 
-        logger.info("[store_dataframe_in_mysql] Tất cả dòng đã insert xong. Đang commit...")
+def backfill_row_hash(db_config: dict, table_name: str = "import_data", batch_size: int = 1000) -> int:
+    """
+    Điền cột RowHash cho các dòng ingest trước khi có cột này.
+    UPDATE IGNORE: dòng trùng nội dung với một dòng đã có hash sẽ giữ RowHash = NULL,
+    có thể xoá sau bằng `DELETE FROM import_data WHERE RowHash IS NULL`.
+    Trả về số dòng đã điền hash.
+    """
+    select_columns = ", ".join(["id", "Ngay"] + [mysql_col for _, mysql_col, _ in INSERT_COLUMNS])
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            cursor.execute(
+                f"SELECT {select_columns} FROM {table_name} WHERE RowHash IS NULL AND id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            cursor.executemany(
+                f"UPDATE IGNORE {table_name} SET RowHash = %s WHERE id = %s",
+                [(row_hash(row[1:]), row[0]) for row in rows]
+            )
+            conn.commit()
+            updated += max(cursor.rowcount, 0)
+            logger.info(f"[backfill_row_hash] Đã cập nhật {updated} dòng...")
+    finally:
+        cursor.close()
+        conn.close()
+    return updated
+
+
+def find_imported_file(db_config: dict, sha256: str) -> Optional[dict]:
+    """Tra bảng import_files theo SHA-256 của cả file; trả về bản ghi nếu nội dung này đã được ingest."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT sha256, file_name, row_count, uploaded_at FROM import_files WHERE sha256 = %s", (sha256,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def record_imported_file(db_config: dict, sha256: str, file_name: str, row_count: int) -> None:
+    """Ghi dấu vân tay của file vừa ingest thành công vào import_files."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO import_files (sha256, file_name, row_count) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE file_name = VALUES(file_name), row_count = VALUES(row_count)",
+            (sha256, file_name, row_count)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def delete_imported_data(db_config: dict, file_name: str) -> int:
+    """Xoá các dòng import_data của một file (file_name không đuôi) và dấu vân tay trong import_files."""
+    conn = mysql.connector.connect(**db_config)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM import_data WHERE file_name = %s", (file_name,))
+        deleted = cursor.rowcount
+        # Bỏ dấu vân tay để có thể upload lại đúng file này
+        cursor.execute("DELETE FROM import_files WHERE file_name = %s", (file_name,))
         conn.commit()
-        logger.info("[store_dataframe_in_mysql] Commit thành công.")
+        return deleted
+    finally:
         cursor.close()
         conn.close()
-        logger.info(f"[store_dataframe_in_mysql] Đã lưu dữ liệu vào bảng `{table_name}` thành công!")
-    except Exception as e:
-        logger.error(f"Lỗi khi lưu dữ liệu vào MySQL: {e}")
-        raise
\ No newline at end of file
@@ -9,6 +9,7 @@ import pandas as pd
 
 from ..utils.hscode_formatter import HSCodeFormatter
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 
 logger = logging.getLogger(__name__)
 
@@ -44,9 +45,9 @@ class BaseHSCodeTool(BaseTool):
         """
         Lấy danh sách DISTINCT HsCode khớp với user_hs theo kiểu LIKE '%user_hs%'.
         """
-        pattern = f"%{user_hs}%"
-        query = "SELECT DISTINCT HsCode FROM import_data WHERE HsCode LIKE %s ORDER BY HsCode"
-        results = self._db_connector.execute_query(query, (pattern,))
+        results = self._db_connector.select_import_data(
+            ["HsCode"], distinct=True, order_by="HsCode", hs_like=user_hs
+        )
         # row['HsCode'] nếu kết quả là dictionary
         return [record['HsCode'] for record in results if 'HsCode' in record]
 
@@ -57,6 +58,7 @@ class HSCodeTool(BaseHSCodeTool):
     description: str = "Retrieve HS code information from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, hs_code: str) -> str:
         """
         Logic:
@@ -99,8 +101,7 @@ class HSCodeTool(BaseHSCodeTool):
             logger.info("Only one HS code matched: %s", actual_hs)
 
             # B2) Lấy các dòng (Ngày, NhàCungCap) để nhóm
-            summary_query = "SELECT Ngay, NhaCungCap FROM import_data WHERE HsCode = %s"
-            summary_results = self._db_connector.execute_query(summary_query, (actual_hs,))
+            summary_results = self._db_connector.select_import_data(["Ngay", "NhaCungCap"], hs_code=actual_hs)
             count = len(summary_results)
 
             package_type = self._tool_agent.get_package()
@@ -112,8 +113,7 @@ class HSCodeTool(BaseHSCodeTool):
 
             if count <= 20:
                 # Nếu dưới 35 dòng => in toàn bộ
-                query = "SELECT * FROM import_data WHERE HsCode = %s"
-                results = self._db_connector.execute_query(query, (actual_hs,))
+                results = self._db_connector.select_import_data(hs_code=actual_hs)
                 if results:
                     extra_info = f"Dưới đây là thông tin liên quan đến HS code **{actual_hs}**:"    
                     self.is_summary = True
@@ -163,6 +163,7 @@ class HSCodeDateTool(BaseHSCodeTool):
     description: str = "Retrieve HS code information for a specific date from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, hs_code: str, date: str) -> str:
         """
         Logic:
@@ -205,11 +206,7 @@ class HSCodeDateTool(BaseHSCodeTool):
             logger.info("Processing HS code: %s for date: %s", actual_hs, date)
 
             # Truy vấn dữ liệu với HS code và ngày cụ thể
-            query = """
-                SELECT * FROM import_data 
-                WHERE HsCode = %s AND Ngay = %s
-            """
-            results = self._db_connector.execute_query(query, (actual_hs, date))
+            results = self._db_connector.select_import_data(hs_code=actual_hs, date=date)
 
             if not results:
                 self.is_summary = False
@@ -232,6 +229,7 @@ class HSCodeDateRangeTool(BaseHSCodeTool):
     description: str = "Retrieve HS code information for a date range from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, hs_code: str, start_date: str, end_date: str) -> str:
         if self._tool_agent is None:
             logger.error("tool_agent not set in HSCodeDateRangeTool")
@@ -268,12 +266,9 @@ class HSCodeDateRangeTool(BaseHSCodeTool):
             actual_hs = matched_hs_codes[0]
             logger.info("Processing HS code: %s for date range: %s to %s", actual_hs, start_date, end_date)
 
-            query = """
-                SELECT * FROM import_data 
-                WHERE HsCode = %s AND Ngay BETWEEN %s AND %s
-                ORDER BY Ngay
-            """
-            results = self._db_connector.execute_query(query, (actual_hs, start_date, end_date))
+            results = self._db_connector.select_import_data(
+                order_by="Ngay", hs_code=actual_hs, start_date=start_date, end_date=end_date
+            )
 
             if not results:
                 self.is_summary = False
@@ -7,6 +7,7 @@ from collections import defaultdict
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 from ..utils.hscode_formatter import HSCodeFormatter
 
 logger = logging.getLogger(__name__)
@@ -43,30 +44,21 @@ class BaseHsCodeStatusTool(BaseTool):
 
 
     def get_distinct_hs_like(self, user_hs: str, status: str) -> List[str]:
-        pattern = f"%{user_hs}%"
-        query = "SELECT DISTINCT HsCode FROM import_data WHERE HsCode LIKE %s AND TinhTrang = %s ORDER BY HsCode"
-        rows = self._db_connector.execute_query(query, (pattern, status))
+        rows = self._db_connector.select_import_data(
+            ["HsCode"], distinct=True, order_by="HsCode", hs_like=user_hs, status=status
+        )
         return [r['HsCode'] for r in rows if 'HsCode' in r]
 
     def get_record_count(self, hs_code: str, status: str) -> int:
-        query = "SELECT COUNT(*) as count FROM import_data WHERE HsCode = %s AND TinhTrang = %s"
-        rows = self._db_connector.execute_query(query, (hs_code, status))
-        if rows and "count" in rows[0]:
-            return rows[0]["count"]
-        return 0
+        return self._db_connector.count_import_data(hs_code=hs_code, status=status)
 
     def get_data_by_hs_status(self, hs_code: str, status: str) -> List[Dict]:
-        query = "SELECT * FROM import_data WHERE HsCode = %s AND TinhTrang = %s ORDER BY Ngay"
-        return self._db_connector.execute_query(query, (hs_code, status))
+        return self._db_connector.select_import_data(order_by="Ngay", hs_code=hs_code, status=status)
 
     def get_dates_suppliers_by_hs_status(self, hs_code: str, status: str) -> List[Dict]:
-        query = """
-            SELECT DISTINCT DATE(Ngay) as Ngay, NhaCungCap
-            FROM import_data
-            WHERE HsCode = %s AND TinhTrang = %s
-            ORDER BY Ngay
-        """
-        return self._db_connector.execute_query(query, (hs_code, status))
+        return self._db_connector.select_import_data(
+            ["Ngay", "NhaCungCap"], distinct=True, order_by="Ngay", hs_code=hs_code, status=status
+        )
 
 
 class HSCodeStatusTool(BaseHsCodeStatusTool):
@@ -78,6 +70,7 @@ class HSCodeStatusTool(BaseHsCodeStatusTool):
     description: str = "Retrieve HS code information with status (Nhập/Xuất) from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, hs_code: str, status: str) -> str:
         message_to_agent = "Good job!"
         if self._tool_agent is None:
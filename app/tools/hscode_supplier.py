@@ -10,6 +10,7 @@ from ..utils.hscode_formatter import HSCodeFormatter
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 
 logger = logging.getLogger(__name__)
 
@@ -67,29 +68,16 @@ class BaseHsCodeSupplierTool(BaseTool):
         """
         Tìm DISTINCT HsCode LIKE '%user_hs%' với ràng buộc NhaCungCap = supplier.
         """
-        pattern = f"%{user_hs}%"
-        query = """
-            SELECT DISTINCT HsCode
-            FROM import_data
-            WHERE NhaCungCap = %s
-              AND HsCode LIKE %s
-            ORDER BY HsCode
-        """
-        results = self.execute(query, (supplier, pattern))
+        results = self._db_connector.select_import_data(
+            ["HsCode"], distinct=True, order_by="HsCode", supplier=supplier, hs_like=user_hs
+        )
         return [r['HsCode'] for r in results if 'HsCode' in r]
 
     def get_data_by_hs_and_supplier(self, hs_code: str, supplier: str) -> List[Dict]:
         """
         Lấy dữ liệu cho HsCode = hs_code và NhaCungCap = supplier.
         """
-        query = """
-            SELECT *
-            FROM import_data
-            WHERE HsCode = %s
-              AND NhaCungCap = %s
-            ORDER BY Ngay
-        """
-        return self.execute(query, (hs_code, supplier))
+        return self._db_connector.select_import_data(order_by="Ngay", hs_code=hs_code, supplier=supplier)
 
     def query_suppliers_and_dates(self, supplier_list: List[str]) -> str:
         """
@@ -97,8 +85,7 @@ class BaseHsCodeSupplierTool(BaseTool):
         """
         lines = []
         for sup in supplier_list:
-            query = "SELECT DISTINCT Ngay FROM import_data WHERE NhaCungCap = %s ORDER BY Ngay"
-            rows = self.execute(query, (sup,))
+            rows = self._db_connector.select_import_data(["Ngay"], distinct=True, order_by="Ngay", supplier=sup)
             lines.append(f"Nhà cung cấp: {sup}")
             for r in rows:
                 day_str = r['Ngay'].strftime("%Y-%m-%d") if r['Ngay'] else "N/A"
@@ -165,6 +152,7 @@ class HSCodeSupplierTool(BaseHsCodeSupplierTool):
     description: str = "Retrieve HS code information for a specific supplier from a MySQL database (supplier-first logic)."
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, supplier: str, hs_code: str) -> str:
         """
         1) Fuzzy supplier: nếu kết quả > 1 thì yêu cầu người dùng chọn.
@@ -7,6 +7,7 @@ from langsmith import traceable
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 from .supplier_resolver import SupplierResolver
 from ..utils.hscode_formatter import HSCodeFormatter
 
@@ -50,43 +51,24 @@ class BaseHsCodeSupplierDateTool(BaseTool):
         """
         Tìm DISTINCT HS code LIKE '%user_hs%' với ràng buộc NhaCungCap = supplier.
         """
-        pattern = f"%{user_hs}%"
-        query = """
-            SELECT DISTINCT HsCode
-            FROM import_data
-            WHERE NhaCungCap = %s
-              AND HsCode LIKE %s
-            ORDER BY HsCode
-        """
-        rows = self._db_connector.execute_query(query, (supplier, pattern))
+        rows = self._db_connector.select_import_data(
+            ["HsCode"], distinct=True, order_by="HsCode", supplier=supplier, hs_like=user_hs
+        )
         return [r['HsCode'] for r in rows if 'HsCode' in r]
 
     def get_data(self, supplier: str, hs_code: str, date_str: str) -> List[Dict]:
         """
         Lấy toàn bộ record theo: NhaCungCap, HS code và ngày (date_str).
         """
-        query = """
-            SELECT *
-            FROM import_data
-            WHERE NhaCungCap = %s
-              AND HsCode = %s
-              AND DATE(Ngay) = %s
-        """
-        results = self._db_connector.execute_query(query, (supplier, hs_code, date_str))
-        return results
+        return self._db_connector.select_import_data(supplier=supplier, hs_code=hs_code, date=date_str)
 
     def get_dates_for_supplier_hs(self, supplier: str, hs_code: str) -> List[str]:
         """
         Lấy danh sách DISTINCT ngày có dữ liệu cho một nhà cung cấp và HS code.
         """
-        query = """
-            SELECT DISTINCT DATE(Ngay) as Ngay
-            FROM import_data
-            WHERE NhaCungCap = %s
-              AND HsCode = %s
-            ORDER BY Ngay
-        """
-        rows = self._db_connector.execute_query(query, (supplier, hs_code))
+        rows = self._db_connector.select_import_data(
+            ["Ngay"], distinct=True, order_by="Ngay", supplier=supplier, hs_code=hs_code
+        )
         return [str(r['Ngay']) for r in rows if r.get('Ngay') is not None]
 
 
@@ -101,6 +83,7 @@ class HSCodeSupplierDateTool(BaseHsCodeSupplierDateTool):
     )
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, supplier: str, hs_code: str, date_str: str) -> str:
         message_to_agent = "Good job!"
         if self._tool_agent is None:
@@ -6,6 +6,7 @@ import logging
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 from ..utils.hscode_formatter import HSCodeFormatter
 
 logger = logging.getLogger(__name__)
@@ -42,24 +43,15 @@ class BaseHsCodeSupplierDateStatusTool(BaseTool):
         return resolver.match_suppliers_fuzzy(user_input)
 
     def get_distinct_hs_for_supplier(self, supplier: str, user_hs: str, status: str) -> List[str]:
-        pattern = f"%{user_hs}%"
-        query = """
-            SELECT DISTINCT HsCode
-            FROM import_data
-            WHERE NhaCungCap = %s AND HsCode LIKE %s AND TinhTrang = %s
-            ORDER BY HsCode
-        """
-        rows = self._db_connector.execute_query(query, (supplier, pattern, status))
+        rows = self._db_connector.select_import_data(
+            ["HsCode"], distinct=True, order_by="HsCode", supplier=supplier, hs_like=user_hs, status=status
+        )
         return [r['HsCode'] for r in rows if 'HsCode' in r]
 
     def get_data(self, supplier: str, hs_code: str, date_str: str, status: str) -> List[Dict]:
-        query = """
-            SELECT *
-            FROM import_data
-            WHERE NhaCungCap = %s AND HsCode = %s AND DATE(Ngay) = %s AND TinhTrang = %s
-        """
-        results = self._db_connector.execute_query(query, (supplier, hs_code, date_str, status))
-        return results
+        return self._db_connector.select_import_data(
+            supplier=supplier, hs_code=hs_code, date=date_str, status=status
+        )
 
 
 class HSCodeSupplierDateStatusTool(BaseHsCodeSupplierDateStatusTool):
@@ -71,6 +63,7 @@ class HSCodeSupplierDateStatusTool(BaseHsCodeSupplierDateStatusTool):
     description: str = "Retrieve HS code information for a supplier on a specific date and status from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, supplier: str, hs_code: str, date_str: str, status: str) -> str:
         message_to_agent = "Good job!"
         if self._tool_agent is None:
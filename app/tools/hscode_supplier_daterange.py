@@ -7,6 +7,7 @@ from ..utils.hscode_formatter import HSCodeFormatter
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +58,7 @@ class HSCodeSupplierDateRangeTool(BaseHsCodeSupplierDateRangeTool):
     )
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, hs_code: str, supplier: str, start_date: str, end_date: str) -> str:
         message_to_agent = "Good job!"
         if self._tool_agent is None:
@@ -72,15 +74,9 @@ class HSCodeSupplierDateRangeTool(BaseHsCodeSupplierDateRangeTool):
         #     return self.last_result
 
         try:
-            query = """
-                SELECT *
-                FROM import_data
-                WHERE HsCode = %s
-                  AND NhaCungCap = %s
-                  AND DATE(Ngay) BETWEEN %s AND %s
-                ORDER BY Ngay
-            """
-            results = self.execute(query, (hs_code, supplier, start_date, end_date))
+            results = self._db_connector.select_import_data(
+                order_by="Ngay", hs_code=hs_code, supplier=supplier, start_date=start_date, end_date=end_date
+            )
             if not results:
                 self.is_summary = False
                 self.last_result = (
@@ -96,14 +92,9 @@ class HSCodeSupplierDateRangeTool(BaseHsCodeSupplierDateRangeTool):
                 return message_to_agent
             else:
                 # Nếu có quá nhiều bản ghi, liệt kê danh sách các ngày liên quan
-                query_dates = """
-                    SELECT DISTINCT DATE(Ngay) as Ngay
-                    FROM import_data
-                    WHERE HsCode = %s
-                      AND NhaCungCap = %s
-                    ORDER BY Ngay
-                """
-                dates = self.execute(query_dates, (hs_code, supplier))
+                dates = self._db_connector.select_import_data(
+                    ["Ngay"], distinct=True, order_by="Ngay", hs_code=hs_code, supplier=supplier
+                )
                 date_list = ["- " + str(date['Ngay']) for date in dates if date['Ngay'] is not None]
                 self.is_summary = True
                 self.last_result = (
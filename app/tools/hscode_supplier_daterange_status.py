@@ -7,6 +7,7 @@ from ..utils.hscode_formatter import HSCodeFormatter
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +52,7 @@ class HSCodeSupplierDateRangeStatusTool(BaseHsCodeSupplierDateRangeStatusTool):
     description: str = "Retrieve HS code information for a supplier within a date range and status from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, hs_code: str, supplier: str, start_date: str, end_date: str, status: str) -> str:
         message_to_agent = "Good job!"
         if self._tool_agent is None:
@@ -70,16 +72,10 @@ class HSCodeSupplierDateRangeStatusTool(BaseHsCodeSupplierDateRangeStatusTool):
             hs_code, supplier, start_date, end_date, status
         )
         try:
-            query = """
-                SELECT *
-                FROM import_data
-                WHERE HsCode = %s 
-                  AND NhaCungCap = %s 
-                  AND DATE(Ngay) BETWEEN %s AND %s 
-                  AND TinhTrang = %s
-                ORDER BY Ngay
-            """
-            results = self.execute(query, (hs_code, supplier, start_date, end_date, status))
+            results = self._db_connector.select_import_data(
+                order_by="Ngay", hs_code=hs_code, supplier=supplier,
+                start_date=start_date, end_date=end_date, status=status
+            )
             
             if len(results) <= 20:
                 self.is_summary = True
@@ -10,6 +10,7 @@ from ..utils.hscode_formatter import HSCodeFormatter
 
 # Import DatabaseConnector từ module utils.db_connector
 from utils.db_connector import DatabaseConnector
+from utils.tool_result_cache import cached_tool_run
 
 logger = logging.getLogger(__name__)
 
@@ -62,27 +63,18 @@ class BaseHsCodeSupplierStatusTool(BaseTool):
         """
         Tìm DISTINCT HsCode LIKE '%user_hs%' với ràng buộc NhaCungCap = supplier và Tình trạng = status.
         """
-        pattern = f"%{user_hs}%"
-        query = """
-            SELECT DISTINCT HsCode
-            FROM import_data
-            WHERE NhaCungCap = %s AND HsCode LIKE %s AND TinhTrang = %s
-            ORDER BY HsCode
-        """
-        results = self.execute(query, (supplier, pattern, status))
+        results = self._db_connector.select_import_data(
+            ["HsCode"], distinct=True, order_by="HsCode", supplier=supplier, hs_like=user_hs, status=status
+        )
         return [r['HsCode'] for r in results if 'HsCode' in r]
 
     def get_data_by_hs_and_supplier(self, hs_code: str, supplier: str, status: str) -> List[Dict]:
         """
         Lấy dữ liệu cho HsCode = hs_code, NhaCungCap = supplier và TinhTrang = status.
         """
-        query = """
-            SELECT *
-            FROM import_data
-            WHERE HsCode = %s AND NhaCungCap = %s AND TinhTrang = %s
-            ORDER BY Ngay
-        """
-        return self.execute(query, (hs_code, supplier, status))
+        return self._db_connector.select_import_data(
+            order_by="Ngay", hs_code=hs_code, supplier=supplier, status=status
+        )
 
     def query_suppliers_and_dates(self, supplier_list: List[str]) -> str:
         """
@@ -90,8 +82,7 @@ class BaseHsCodeSupplierStatusTool(BaseTool):
         """
         lines = []
         for sup in supplier_list:
-            query = "SELECT DISTINCT Ngay FROM import_data WHERE NhaCungCap = %s ORDER BY Ngay"
-            rows = self.execute(query, (sup,))
+            rows = self._db_connector.select_import_data(["Ngay"], distinct=True, order_by="Ngay", supplier=sup)
             lines.append(f"Nhà cung cấp: {sup}")
             for r in rows:
                 day_str = r['Ngay'].strftime("%Y-%m-%d") if r['Ngay'] else "N/A"
@@ -110,6 +101,7 @@ class HSCodeSupplierStatusTool(BaseHsCodeSupplierStatusTool):
     description: str = "Retrieve HS code information for a specific supplier and status from a MySQL database"
 
     @traceable(run_type="tool")
+    @cached_tool_run
     def _run(self, supplier: str, hs_code: str, status: str) -> str:
         """
         1) Fuzzy supplier: nếu kết quả > 1 thì yêu cầu người dùng chọn.
@@ -189,13 +181,10 @@ class HSCodeSupplierStatusTool(BaseHsCodeSupplierStatusTool):
                 self.is_summary = True
                 self.last_result = extra_info + formatter.format_records(results, display_date=True, package_type=package_type)
             else:
-                query = """
-                    SELECT DISTINCT Ngay
-                    FROM import_data
-                    WHERE HsCode = %s AND NhaCungCap = %s AND TinhTrang = %s
-                    ORDER BY Ngay
-                """
-                rows = self.execute(query, (actual_hs, actual_supplier, status))
+                rows = self._db_connector.select_import_data(
+                    ["Ngay"], distinct=True, order_by="Ngay",
+                    hs_code=actual_hs, supplier=actual_supplier, status=status
+                )
                 lines = [f"Tìm thấy {len(results)} bản ghi cho HS code {actual_hs}, nhà cung cấp {actual_supplier}, tình trạng {status}."]
                 lines.append("Dưới đây là các ngày liên quan:\n")
                 for row in rows:
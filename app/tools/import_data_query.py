@@ -0,0 +1,191 @@
+from typing import Optional, List, Dict, Type
+import logging
+from collections import defaultdict
+from pydantic import BaseModel, Field, PrivateAttr
+from langsmith import traceable
+from ..utils.hscode_formatter import HSCodeFormatter
+from utils.tool_result_cache import cached_tool_run
+from .productname import BaseProductTool, sanitize_query
+
+logger = logging.getLogger(__name__)
+
+formatter = HSCodeFormatter()
+
+
+class ImportDataQueryInput(BaseModel):
+    hs_code: Optional[str] = Field(default=None, description="HS code or its prefix")
+    supplier: Optional[str] = Field(default=None, description="Supplier name (fuzzy)")
+    product: Optional[str] = Field(default=None, description="Product name / description")
+    date: Optional[str] = Field(default=None, description="Exact date YYYY-MM-DD")
+    start_date: Optional[str] = Field(default=None, description="Range start YYYY-MM-DD")
+    end_date: Optional[str] = Field(default=None, description="Range end YYYY-MM-DD")
+    status: Optional[str] = Field(default=None, description="'Nhập' or 'Xuất'")
+
+
+class ImportDataQueryTool(BaseProductTool):
+    """
+    Tool tham số hoá thay cho 16 tool HSCode* / ProductName*.
+    Mọi tiêu chí đều tuỳ chọn; điều kiện WHERE được ghép bởi DatabaseConnector.select_import_data.
+
+    1) Nếu có supplier: fuzzy match, nhiều kết quả thì yêu cầu người dùng chọn.
+    2) Nếu có hs_code: tìm DISTINCT HsCode chứa hs_code (trong phạm vi các tiêu chí còn lại),
+       nhiều kết quả thì yêu cầu người dùng chọn (trừ khi khớp chính xác).
+    3) Lấy dữ liệu: <= detail_limit bản ghi thì in chi tiết, nhiều hơn thì tóm tắt theo ngày / nhà cung cấp.
+    """
+    name: str = "query_import_data"
+    description: str = (
+        "Look up import/export records (HS code, supplier, product, date or date range, status) "
+        "from the MySQL database. Pass only the criteria the user mentioned."
+    )
+    args_schema: Type[BaseModel] = ImportDataQueryInput
+    detail_limit: int = Field(default=20, description="Maximum number of records printed in detail")
+
+    _db_config: dict = PrivateAttr()
+
+    def __init__(self, tool_agent: Optional["ToolAgent"] = None, db_config: dict = None):
+        super().__init__(tool_agent=tool_agent, db_config=db_config)
+        self._db_config = db_config
+
+    def match_suppliers_fuzzy(self, user_input: str) -> List[str]:
+        from .supplier_resolver import SupplierResolver
+        resolver = SupplierResolver(self._db_config)
+        return resolver.match_suppliers_fuzzy(user_input)
+
+    def describe_criteria(self, criteria: Dict[str, Optional[str]]) -> str:
+        labels = {
+            "hs_code": "Mã HS",
+            "supplier": "Nhà cung cấp",
+            "product": "Tên hàng",
+            "date": "Ngày",
+            "start_date": "Từ ngày",
+            "end_date": "Đến ngày",
+            "status": "Trạng thái",
+        }
+        return "\n".join(f"- {labels[k]} **{v}**" for k, v in criteria.items() if v)
+
+    def summarize(self, results: List[Dict], criteria_text: str) -> str:
+        """Tóm tắt kết quả lớn: danh sách nhà cung cấp theo từng ngày."""
+        date_to_suppliers = defaultdict(set)
+        for row in results:
+            ngay = row.get("Ngay")
+            supplier = row.get("NhaCungCap")
+            if ngay and supplier:
+                date_to_suppliers[ngay].add(str(supplier).strip())
+
+        lines = [f"**Tôi tìm thấy {len(results)} bản ghi cho:**\n{criteria_text}\n"]
+        lines.append("Dưới đây là danh sách nhà cung cấp theo từng ngày:\n")
+        for d in sorted(date_to_suppliers):
+            lines.append(f"Ngày {d}:")
+            for sup in sorted(date_to_suppliers[d]):
+                lines.append(f"- {sup}")
+            lines.append("")
+        lines.append("Xin vui lòng chỉ định thêm ngày, khoảng ngày hoặc nhà cung cấp để xem thông tin chi tiết.")
+        return "\n".join(lines)
+
+    @traceable(run_type="tool")
+    @cached_tool_run
+    def _run(
+        self,
+        hs_code: Optional[str] = None,
+        supplier: Optional[str] = None,
+        product: Optional[str] = None,
+        date: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> str:
+        message_to_agent = "Good job!"
+        if self._tool_agent is None:
+            logger.error("tool_agent not set in ImportDataQueryTool")
+            raise ValueError("tool_agent not set")
+        self._tool_agent.tool_called[self.name] = True
+        package_type = self._tool_agent.get_package()
+
+        criteria = {
+            "hs_code": hs_code, "supplier": supplier, "product": product,
+            "date": date, "start_date": start_date, "end_date": end_date, "status": status,
+        }
+        criteria = {k: (v.strip() if isinstance(v, str) else v) or None for k, v in criteria.items()}
+        logger.info("ImportDataQueryTool _run called with %s", criteria)
+        if not any(criteria.values()):
+            self.is_summary = False
+            self.last_result = "Vui lòng cung cấp ít nhất một tiêu chí: mã HS, nhà cung cấp, tên hàng, ngày hoặc trạng thái."
+            return self.last_result
+
+        cleaned_product = sanitize_query(criteria["product"]) if criteria["product"] else None
+        filters = {
+            "product": cleaned_product,
+            "date": criteria["date"],
+            "start_date": criteria["start_date"],
+            "end_date": criteria["end_date"],
+            "status": criteria["status"],
+        }
+
+        try:
+            # B1) Fuzzy supplier
+            if criteria["supplier"]:
+                supplier_list = self.match_suppliers_fuzzy(criteria["supplier"])
+                if not supplier_list:
+                    self.is_summary = False
+                    self.last_result = f"Không tìm thấy nhà cung cấp khớp với '**{criteria['supplier']}**'."
+                    return self.last_result
+                if len(supplier_list) > 1:
+                    lines = [f"Tìm thấy nhiều nhà cung cấp khớp với tên **'{criteria['supplier']}'**:\n"]
+                    lines.extend(f"- {sup}" for sup in supplier_list)
+                    lines.append("\nVui lòng chọn 1 nhà cung cấp chính xác.")
+                    self.is_summary = True
+                    self.last_result = "\n".join(lines)
+                    return message_to_agent
+                filters["supplier"] = supplier_list[0]
+
+            # B2) HS code: DISTINCT HsCode chứa chuỗi người dùng nhập
+            if criteria["hs_code"]:
+                matched_hs = [
+                    r["HsCode"] for r in self._db_connector.select_import_data(
+                        ["HsCode"], distinct=True, order_by="HsCode", hs_like=criteria["hs_code"], **filters
+                    )
+                ]
+                if criteria["hs_code"] in matched_hs:
+                    matched_hs = [criteria["hs_code"]]
+                if not matched_hs:
+                    self.is_summary = False
+                    self.last_result = (
+                        "Không tìm thấy dữ liệu phù hợp với:\n" + self.describe_criteria(criteria)
+                    )
+                    return self.last_result
+                if len(matched_hs) > 1:
+                    lines = [f"Tìm thấy nhiều HS code khớp với mã **'{criteria['hs_code']}'**:\n"]
+                    lines.extend(f"- {c}" for c in matched_hs)
+                    lines.append("\nVui lòng chọn 1 HS code chính xác.")
+                    self.is_summary = True
+                    self.last_result = "\n".join(lines)
+                    return message_to_agent
+                filters["hs_code"] = matched_hs[0]
+
+            # B3) Lấy dữ liệu
+            if cleaned_product:
+                results = self._db_connector.select_import_data(limit=self.candidate_limit, **filters)
+                results = self.filter_by_similarity(cleaned_product, results)
+                results.sort(key=lambda r: str(r.get("Ngay") or ""))
+            else:
+                results = self._db_connector.select_import_data(order_by="Ngay", **filters)
+
+            criteria_text = self.describe_criteria(criteria)
+            if not results:
+                self.is_summary = False
+                self.last_result = "Không tìm thấy dữ liệu phù hợp với:\n" + criteria_text
+                return self.last_result
+
+            self.is_summary = True
+            if len(results) <= self.detail_limit:
+                self.last_result = (
+                    f"Dưới đây là thông tin về:\n{criteria_text}\n\n"
+                    + formatter.format_records(results, display_date=True, package_type=package_type)
+                )
+            else:
+                self.last_result = self.summarize(results, criteria_text)
+            return message_to_agent
+
+        except Exception as e:
+            logger.error("Error retrieving import data: %s", e)
+            return f"Error retrieving import data: {e}"
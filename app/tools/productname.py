@@ -1,11 +1,14 @@
 from langchain.tools import BaseTool
-from typing import Optional, List, Dict, Union, Any
+from typing import Optional, List, Dict, Union, Any, Tuple
 import logging
 from datetime import datetime
 from pydantic import PrivateAttr, Field
-from rapidfuzz import fuzz  # Thư viện tính độ tương đồng
+import numpy as np
+from rapidfuzz import fuzz, process  # Thư viện tính độ tương đồng
 from ..utils.hscode_formatter import HSCodeFormatter
-from utils.db_connector import DatabaseConnector
+from utils.db_connector import DatabaseConnector, build_product_match
+from utils.tool_result_cache import cached_tool_run
+from utils.text_normalizer import fold_vietnamese
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,6 +19,12 @@ logger.setLevel(logging.INFO)
 
 formatter = HSCodeFormatter()
 
+# Các cột mà HSCodeFormatter thực sự dùng, tránh SELECT * cho các truy vấn FULLTEXT
+PRODUCT_COLUMNS = (
+    "Ngay, NhaCungCap, HsCode, TenHang, Luong, DonViTinh, TenNuocXuatXu, DieuKienGiaoHang, "
+    "ThueSuatXNK, ThueSuatTTDB, ThueSuatVAT, ThueSuatTuVe, ThueSuatBVMT, TinhTrang"
+)
+
 def calculate_keyword_similarity(query: str, target: str, word_similarity_threshold: float = 80.0) -> float:
     """
     Calculate similarity score based on keyword matching.
@@ -49,6 +58,62 @@ def calculate_keyword_similarity(query: str, target: str, word_similarity_thresh
     similarity = (matched_words / len(query_words)) * 100
     return similarity
 
+def calculate_keyword_similarity_batch(query: str, targets: List[str], word_similarity_threshold: float = 80.0) -> List[float]:
+    """
+    Phiên bản batch của calculate_keyword_similarity cho cả danh sách kết quả.
+
+    - Mỗi giá trị TenHang duy nhất chỉ được tách từ một lần.
+    - Độ tương đồng giữa từng từ của query và toàn bộ từ vựng của các target
+      được tính một lần dưới dạng ma trận bằng rapidfuzz.process.cdist.
+
+    Args:
+        query (str): The query string.
+        targets (List[str]): Danh sách chuỗi cần so khớp (có thể trùng lặp).
+        word_similarity_threshold (float): Minimum similarity score for a word to be considered a match.
+
+    Returns:
+        List[float]: Điểm tương đồng (0-100) theo đúng thứ tự của targets.
+    """
+    query_words = query.lower().split()
+    if not query_words or not targets:
+        return [0.0] * len(targets)
+
+    # Tách từ một lần cho mỗi TenHang duy nhất
+    unique_targets = {}
+    target_index = []
+    for target in targets:
+        key = (target or "").lower()
+        target_index.append(unique_targets.setdefault(key, len(unique_targets)))
+
+    vocabulary = {}
+    flat_word_ids = []
+    offsets = []
+    non_empty = []
+    for key in unique_targets:
+        words = key.split()
+        if not words:
+            continue
+        non_empty.append(unique_targets[key])
+        offsets.append(len(flat_word_ids))
+        flat_word_ids.extend(vocabulary.setdefault(w, len(vocabulary)) for w in words)
+
+    unique_scores = np.zeros(len(unique_targets), dtype=np.float64)
+    if vocabulary:
+        # Ma trận (số từ query) x (số từ vựng): đã khớp hay chưa
+        scores = process.cdist(
+            query_words,
+            list(vocabulary),
+            scorer=fuzz.ratio,
+            score_cutoff=word_similarity_threshold,
+            workers=-1,
+        )
+        matched = scores >= word_similarity_threshold
+        # Với mỗi target: từ query nào khớp với ít nhất 1 từ của target
+        per_target = np.logical_or.reduceat(matched[:, flat_word_ids], offsets, axis=1)
+        unique_scores[non_empty] = per_target.sum(axis=0) / len(query_words) * 100
+
+    return unique_scores[target_index].tolist()
+
 def sanitize_query(text: str) -> str:
     """Remove unwanted characters from query string."""
     if not isinstance(text, str):
@@ -74,6 +139,7 @@ class BaseProductTool(BaseTool):
     is_summary: bool = False
     last_result: Optional[str] = None
     threshold: float = Field(default=0.3, description="Minimum score threshold for FULLTEXT search")
+    candidate_limit: int = Field(default=200, description="Maximum number of FULLTEXT candidates fetched from MySQL")
     max_results: int = Field(default=40, description="Maximum number of results to display directly")
     similarity_threshold: float = Field(default=80.0, description="Minimum similarity score to keep a result (0-100)")
     _tool_agent: Optional["ToolAgent"] = PrivateAttr(default=None)
@@ -93,11 +159,28 @@ class BaseProductTool(BaseTool):
         dates = {result['Ngay'].strftime("%Y-%m-%d") for result in results if result.get('Ngay')}
         return sorted(dates, reverse=True)
 
+    def build_fulltext_search(self, cleaned_query: str) -> Tuple[str, str]:
+        """Trả về (biểu thức MATCH, chuỗi tìm kiếm) trên cột TenHangKhongDau, xem build_product_match."""
+        return build_product_match(cleaned_query)
+
+    def filter_by_similarity(self, cleaned_query: str, results: List[Dict]) -> List[Dict]:
+        """Tính similarity (trên dạng bỏ dấu) cho toàn bộ kết quả một lần và giữ lại các bản ghi đạt ngưỡng."""
+        similarities = calculate_keyword_similarity_batch(
+            fold_vietnamese(cleaned_query), [fold_vietnamese(result.get('TenHang') or "") for result in results]
+        )
+        filtered_results = []
+        for result, similarity in zip(results, similarities):
+            result['similarity'] = similarity
+            if similarity >= self.similarity_threshold:
+                filtered_results.append(result)
+        return filtered_results
+
 # 1. ProductNameSearchTool
 class ProductNameSearchTool(BaseProductTool):
     name: str = "ProductNameSearchTool"
     description: str = "Retrieve product (TenHang) information based on item name, supports compatible search from a MySQL database"
     
+    @cached_tool_run
     def _run(self, query: str) -> str:
         """Execute product name search query."""
         if self._tool_agent is None:
@@ -115,24 +198,22 @@ class ProductNameSearchTool(BaseProductTool):
         #     return self.last_result
         
         try:
-            search_query = """
-                SELECT *, MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score 
+            match_expr, search_term = self.build_fulltext_search(cleaned_query)
+            search_query = f"""
+                SELECT {PRODUCT_COLUMNS}, {match_expr} AS score 
                 FROM import_data 
-                WHERE MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) 
+                WHERE {match_expr} 
                 ORDER BY score DESC
+                LIMIT %s
             """
             
-            all_results = self._db_connector.execute_query(search_query, (cleaned_query, cleaned_query))
+            all_results = self._db_connector.execute_query(search_query, (search_term, search_term, self.candidate_limit))
             if not all_results:
                 self.is_summary = True
                 self.last_result = "Không tìm thấy sản phẩm nào khớp với yêu cầu."
                 return self.last_result
             
-            for result in all_results:
-                ten_hang = result.get('TenHang', "")
-                result['similarity'] = calculate_keyword_similarity(cleaned_query, ten_hang)
-            
-            filtered_results = [result for result in all_results if result['similarity'] >= self.similarity_threshold]
+            filtered_results = self.filter_by_similarity(cleaned_query, all_results)
 
             # # Nếu số kết quả vượt quá max_results thì trả về danh sách ngày liên quan
             # if len(filtered_results) > self.max_results:
@@ -162,6 +243,7 @@ class ProductNameStatusTool(BaseProductTool):
     name: str = "ProductNameStatusTool"
     description: str = "Retrieve product (TenHang) information based on item name and status from a MySQL database"
     
+    @cached_tool_run
     def _run(self, query: str, status: str) -> str:
         if self._tool_agent is None:
             raise ValueError("tool_agent not set in ProductNameStatusTool")
@@ -176,24 +258,22 @@ class ProductNameStatusTool(BaseProductTool):
         #     return self.last_result
         
         try:
-            search_query = """
-                SELECT *, MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score 
+            match_expr, search_term = self.build_fulltext_search(cleaned_query)
+            search_query = f"""
+                SELECT {PRODUCT_COLUMNS}, {match_expr} AS score 
                 FROM import_data 
-                WHERE MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE)
+                WHERE {match_expr}
                   AND TinhTrang = %s
                 ORDER BY score DESC
+                LIMIT %s
             """
-            all_results = self._db_connector.execute_query(search_query, (cleaned_query, cleaned_query, status))
+            all_results = self._db_connector.execute_query(search_query, (search_term, search_term, status, self.candidate_limit))
             if not all_results:
                 self.is_summary = True
                 self.last_result = f"Không tìm thấy sản phẩm nào với yêu cầu '{query}' và tình trạng '{status}'."
                 return self.last_result
 
-            for result in all_results:
-                ten_hang = result.get('TenHang', "")
-                result['similarity'] = calculate_keyword_similarity(cleaned_query, ten_hang)
-            
-            filtered_results = [result for result in all_results if result['similarity'] >= self.similarity_threshold]
+            filtered_results = self.filter_by_similarity(cleaned_query, all_results)
 
             # # Nếu số kết quả vượt quá max_results thì trả về danh sách ngày liên quan
             # if len(filtered_results) > self.max_results:
@@ -222,6 +302,7 @@ class ProductNameDateTool(BaseProductTool):
     name: str = "ProductNameDateTool"
     description: str = "Retrieve product (TenHang) information based on item name and specific date from a MySQL database"
     
+    @cached_tool_run
     def _run(self, query: str, date_str: str) -> str:
         if self._tool_agent is None:
             raise ValueError("tool_agent not set in ProductNameDateTool")
@@ -236,23 +317,22 @@ class ProductNameDateTool(BaseProductTool):
         #     return self.last_result
 
         try:
-            search_query = """
-                SELECT *, MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score 
+            match_expr, search_term = self.build_fulltext_search(cleaned_query)
+            search_query = f"""
+                SELECT {PRODUCT_COLUMNS}, {match_expr} AS score 
                 FROM import_data 
-                WHERE MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE)
+                WHERE {match_expr}
                   AND DATE(Ngay) = %s
                 ORDER BY score DESC
+                LIMIT %s
             """
-            all_results = self._db_connector.execute_query(search_query, (cleaned_query, cleaned_query, date_str))
+            all_results = self._db_connector.execute_query(search_query, (search_term, search_term, date_str, self.candidate_limit))
             if not all_results:
                 self.is_summary = True
                 self.last_result = f"Không tìm thấy sản phẩm nào khớp với yêu cầu '{query}', ngày '{date_str}'."
                 return self.last_result
 
-            for result in all_results:
-                ten_hang = result.get('TenHang', "")
-                result['similarity'] = calculate_keyword_similarity(cleaned_query, ten_hang)
-            filtered_results = [result for result in all_results if result['similarity'] >= self.similarity_threshold]
+            filtered_results = self.filter_by_similarity(cleaned_query, all_results)
 
             # if len(filtered_results) > 10:
                 # Nhóm theo nhà cung cấp: mỗi nhà cung cấp chỉ lấy 1 record (record có similarity cao nhất)
@@ -289,6 +369,7 @@ class ProductNameDateRangeTool(BaseProductTool):
     name: str = "ProductNameDateRangeTool"
     description: str = "Retrieve product (TenHang) information based on item name within a date range from a MySQL database"
     
+    @cached_tool_run
     def _run(self, query: str, start_date: str, end_date: str) -> str:
         if self._tool_agent is None:
             raise ValueError("tool_agent not set in ProductNameDateRangeTool")
@@ -298,23 +379,22 @@ class ProductNameDateRangeTool(BaseProductTool):
         package_type = self._tool_agent.get_package()
 
         try:
-            search_query = """
-                SELECT *, MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score 
+            match_expr, search_term = self.build_fulltext_search(cleaned_query)
+            search_query = f"""
+                SELECT {PRODUCT_COLUMNS}, {match_expr} AS score 
                 FROM import_data 
-                WHERE MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE)
+                WHERE {match_expr}
                   AND DATE(Ngay) BETWEEN %s AND %s
                 ORDER BY score DESC
+                LIMIT %s
             """
-            all_results = self._db_connector.execute_query(search_query, (cleaned_query, cleaned_query, start_date, end_date))
+            all_results = self._db_connector.execute_query(search_query, (search_term, search_term, start_date, end_date, self.candidate_limit))
             if not all_results:
                 self.is_summary = True
                 self.last_result = f"Không tìm thấy sản phẩm nào với yêu cầu '{query}', từ ngày '{start_date}' đến ngày '{end_date}'."
                 return self.last_result
 
-            for result in all_results:
-                ten_hang = result.get('TenHang', "")
-                result['similarity'] = calculate_keyword_similarity(cleaned_query, ten_hang)
-            filtered_results = [result for result in all_results if result['similarity'] >= self.similarity_threshold]
+            filtered_results = self.filter_by_similarity(cleaned_query, all_results)
 
             # # Nếu quá nhiều kết quả, trả về danh sách các ngày liên quan
             # if len(filtered_results) > self.max_results:
@@ -345,6 +425,7 @@ class ProductNameDateStatusTool(BaseProductTool):
     name: str = "ProductNameDateStatusTool"
     description: str = "Retrieve product (TenHang) information based on item name, specific date and status from a MySQL database"
     
+    @cached_tool_run
     def _run(self, query: str, date_str: str, status: str) -> str:
         if self._tool_agent is None:
             raise ValueError("tool_agent not set in ProductNameDateStatusTool")
@@ -353,23 +434,22 @@ class ProductNameDateStatusTool(BaseProductTool):
         message_to_agent = "Good job!"
         package_type = self._tool_agent.get_package()
         try:
-            search_query = """
-                SELECT *, MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score 
+            match_expr, search_term = self.build_fulltext_search(cleaned_query)
+            search_query = f"""
+                SELECT {PRODUCT_COLUMNS}, {match_expr} AS score 
                 FROM import_data 
-                WHERE MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE)
+                WHERE {match_expr}
                   AND DATE(Ngay) = %s AND TinhTrang = %s
                 ORDER BY score DESC
+                LIMIT %s
             """
-            all_results = self._db_connector.execute_query(search_query, (cleaned_query, cleaned_query, date_str, status))
+            all_results = self._db_connector.execute_query(search_query, (search_term, search_term, date_str, status, self.candidate_limit))
             if not all_results:
                 self.is_summary = True
                 self.last_result = f"Không tìm thấy sản phẩm nào với yêu cầu '{query}', ngày '{date_str}' và tình trạng '{status}'."
                 return self.last_result
 
-            for result in all_results:
-                ten_hang = result.get('TenHang', "")
-                result['similarity'] = calculate_keyword_similarity(cleaned_query, ten_hang)
-            filtered_results = [result for result in all_results if result['similarity'] >= self.similarity_threshold]
+            filtered_results = self.filter_by_similarity(cleaned_query, all_results)
 
             # if len(filtered_results) > 10:
                 # # Nhóm theo nhà cung cấp
@@ -405,6 +485,7 @@ class ProductNameDaterangeStatusTool(BaseProductTool):
     name: str = "ProductNameDaterangeStatusTool"
     description: str = "Retrieve product (TenHang) information based on item name within a date range and status from a MySQL database"
     
+    @cached_tool_run
     def _run(self, query: str, start_date: str, end_date: str, status: str) -> str:
         if self._tool_agent is None:
             raise ValueError("tool_agent not set in ProductNameDaterangeStatusTool")
@@ -413,27 +494,25 @@ class ProductNameDaterangeStatusTool(BaseProductTool):
         message_to_agent = "Good job!"
         package_type = self._tool_agent.get_package()
         try:
-            search_query = """
-                SELECT *, MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score 
+            match_expr, search_term = self.build_fulltext_search(cleaned_query)
+            search_query = f"""
+                SELECT {PRODUCT_COLUMNS}, {match_expr} AS score 
                 FROM import_data 
-                WHERE MATCH(TenHang) AGAINST(%s IN NATURAL LANGUAGE MODE)
+                WHERE {match_expr}
                   AND DATE(Ngay) BETWEEN %s AND %s AND TinhTrang = %s
-                HAVING score > %s 
                 ORDER BY score DESC
+                LIMIT %s
             """
             all_results = self._db_connector.execute_query(
                 search_query, 
-                (cleaned_query, cleaned_query, start_date, end_date, status, self.threshold)
+                (search_term, search_term, start_date, end_date, status, self.candidate_limit)
             )
             if not all_results:
                 self.is_summary = True
                 self.last_result = f"Không tìm thấy sản phẩm nào với yêu cầu '{query}', từ ngày '{start_date}' đến '{end_date}' với tình trạng '{status}'."
                 return self.last_result
 
-            for result in all_results:
-                ten_hang = result.get('TenHang', "")
-                result['similarity'] = calculate_keyword_similarity(cleaned_query, ten_hang)
-            filtered_results = [result for result in all_results if result['similarity'] >= self.similarity_threshold]
+            filtered_results = self.filter_by_similarity(cleaned_query, all_results)
 
             # Nếu quá nhiều kết quả, trả về danh sách các ngày liên quan
             # if len(filtered_results) > self.max_results:
@@ -1,8 +1,9 @@
 import logging
-import mysql.connector
 from typing import List
 from rapidfuzz import process, fuzz
 
+from utils.db_connector import DatabaseConnector
+
 logger = logging.getLogger(__name__)
 
 class SupplierResolver:
@@ -18,14 +19,10 @@ class SupplierResolver:
         """
         Lấy tất cả nhà cung cấp duy nhất từ DB.
         """
-        conn = mysql.connector.connect(**self.db_config)
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT NhaCungCap FROM import_data ORDER BY NhaCungCap;")
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        suppliers = [row[0] for row in rows if row[0]]
+        rows = DatabaseConnector(self.db_config).select_import_data(
+            ["NhaCungCap"], distinct=True, order_by="NhaCungCap"
+        )
+        suppliers = [row["NhaCungCap"] for row in rows if row["NhaCungCap"]]
         return suppliers
 
     def match_suppliers_fuzzy(self, user_input: str) -> List[str]:
@@ -0,0 +1,28 @@
+import re
+from typing import Any, Dict, Optional
+
+from utils.text_normalizer import fold_vietnamese
+
+# Cụm từ (đã bỏ dấu) cho thấy câu hỏi nhắm vào một nhóm tài liệu trên Qdrant
+_CORPUS_PATTERNS = {
+    # PDF: thông báo kết quả phân tích phân loại hàng hoá
+    ".pdf": re.compile(r"\b(phan tich phan loai|ket qua phan loai|thong bao ket qua)\b"),
+    # DOC/DOCX: văn bản pháp luật
+    ".doc": re.compile(r"\b(thong tu|nghi dinh|quyet dinh so|cong van|van ban phap luat|luat hai quan)\b"),
+}
+_CORPUS_FILTERS = {
+    ".pdf": {"file_type": ".pdf"},
+    ".doc": {"file_type": [".doc", ".docx"]},
+}
+
+
+def detect_corpus_filter(prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    Bộ lọc metadata cho SearchEngine.retrieve khi câu hỏi rõ ràng chỉ nhắm vào một nhóm tài liệu
+    (kết quả phân loại PDF hoặc văn bản pháp luật Word); khớp cả hai hoặc không khớp nhóm nào thì None.
+    """
+    folded = fold_vietnamese(prompt)
+    matched = [corpus for corpus, pattern in _CORPUS_PATTERNS.items() if pattern.search(folded)]
+    if len(matched) != 1:
+        return None
+    return _CORPUS_FILTERS[matched[0]]
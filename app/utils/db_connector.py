@@ -1,6 +1,8 @@
 import mysql.connector
 import logging
-from typing import Optional, List, Dict, Union
+from typing import Optional, List, Dict, Union, Tuple, Sequence
+
+from utils.text_normalizer import fold_vietnamese, build_ngram_boolean_query
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -9,6 +11,77 @@ handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s -
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+# Bộ lọc dùng chung cho các truy vấn import_data: tên tham số -> điều kiện SQL
+IMPORT_DATA_FILTERS = {
+    "hs_code": "HsCode = %s",
+    "hs_like": "HsCode LIKE %s",
+    "supplier": "NhaCungCap = %s",
+    "date": "Ngay = %s",
+    "start_date": "Ngay >= %s",
+    "end_date": "Ngay <= %s",
+    "status": "TinhTrang = %s",
+}
+
+
+def build_product_match(product: str) -> Tuple[str, str]:
+    """
+    Trả về (biểu thức MATCH, chuỗi tìm kiếm) trên cột TenHangKhongDau
+    (chữ thường, bỏ dấu, FULLTEXT với ngram parser).
+    Mặc định dùng BOOLEAN MODE với mọi từ là bắt buộc; nếu query chỉ gồm từ quá ngắn
+    thì quay về NATURAL LANGUAGE MODE.
+    """
+    boolean_query = build_ngram_boolean_query(product)
+    if boolean_query:
+        return "MATCH(TenHangKhongDau) AGAINST(%s IN BOOLEAN MODE)", boolean_query
+    return "MATCH(TenHangKhongDau) AGAINST(%s IN NATURAL LANGUAGE MODE)", fold_vietnamese(product)
+
+
+def build_import_data_where(**filters) -> Tuple[str, tuple]:
+    """
+    Ghép mệnh đề WHERE cho bảng import_data từ các bộ lọc khác None.
+    hs_like được bọc thành '%...%' (tìm HS code chứa chuỗi con);
+    product được chuyển thành điều kiện FULLTEXT trên tên hàng (build_product_match).
+    """
+    clauses, params = [], []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name == "product":
+            match_expr, search_term = build_product_match(value)
+            clauses.append(match_expr)
+            params.append(search_term)
+            continue
+        if name not in IMPORT_DATA_FILTERS:
+            raise ValueError(f"Unknown import_data filter: {name}")
+        clauses.append(IMPORT_DATA_FILTERS[name])
+        params.append(f"%{value}%" if name == "hs_like" else value)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, tuple(params)
+
+
+def build_import_data_query(columns: Optional[Sequence[str]] = None, distinct: bool = False,
+                            order_by: Optional[str] = None, limit: Optional[int] = None,
+                            **filters) -> Tuple[str, tuple]:
+    """
+    Bộ dựng truy vấn duy nhất cho import_data:
+    SELECT [DISTINCT] columns FROM import_data WHERE <filters> [ORDER BY ...] [LIMIT n].
+    Khi lọc theo product mà không chỉ định order_by, kết quả được sắp theo độ liên quan FULLTEXT.
+    """
+    where, params = build_import_data_where(**filters)
+    select_cols = ", ".join(columns) if columns else "*"
+    query = f"SELECT {'DISTINCT ' if distinct else ''}{select_cols} FROM import_data{where}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    elif filters.get("product") is not None:
+        match_expr, search_term = build_product_match(filters["product"])
+        query += f" ORDER BY {match_expr} DESC"
+        params += (search_term,)
+    if limit is not None:
+        query += " LIMIT %s"
+        params += (limit,)
+    return query, params
+
+
 class DatabaseConnector:
     """Singleton class to manage database connections."""
     _instance = None
@@ -18,6 +91,7 @@ class DatabaseConnector:
             cls._instance = super(DatabaseConnector, cls).__new__(cls)
             cls._instance.db_config = db_config
             cls._instance.connection = None
+            cls._instance.snapshot = None
         return cls._instance
     
     def get_connection(self):
@@ -43,4 +117,33 @@ class DatabaseConnector:
             logger.error(f"Query execution error: {e}")
             raise
         finally:
-            cursor.close()
\ No newline at end of file
+            cursor.close()
+
+    def attach_snapshot(self, snapshot) -> None:
+        """Gắn ImportDataSnapshot; các truy vấn import_data sẽ đọc từ bộ nhớ thay vì MySQL."""
+        self.snapshot = snapshot
+
+    def _use_snapshot(self) -> bool:
+        return self.snapshot is not None and self.snapshot.is_loaded
+
+    def select_import_data(self, columns: Optional[Sequence[str]] = None, distinct: bool = False,
+                           order_by: Optional[str] = None, limit: Optional[int] = None,
+                           **filters) -> List[Dict]:
+        """
+        SELECT [DISTINCT] columns FROM import_data WHERE <filters> [ORDER BY order_by] [LIMIT limit].
+        Tìm theo tên hàng (product) luôn chạy trên MySQL vì cần FULLTEXT index.
+        """
+        filters = {k: v for k, v in filters.items() if v is not None}
+        if self._use_snapshot() and "product" not in filters:
+            return self.snapshot.select(columns, distinct=distinct, order_by=order_by, limit=limit, **filters)
+        query, params = build_import_data_query(columns, distinct=distinct, order_by=order_by, limit=limit, **filters)
+        return self.execute_query(query, params)
+
+    def count_import_data(self, **filters) -> int:
+        """SELECT COUNT(*) FROM import_data WHERE <filters>."""
+        filters = {k: v for k, v in filters.items() if v is not None}
+        if self._use_snapshot() and "product" not in filters:
+            return self.snapshot.count(**filters)
+        where, params = build_import_data_where(**filters)
+        row = self.execute_query(f"SELECT COUNT(*) AS count FROM import_data{where}", params, fetch_all=False)
+        return row["count"] if row else 0
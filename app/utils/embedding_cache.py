@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_sha256 BLOB NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model, text_sha256)
+) WITHOUT ROWID;
+"""
+
+# Giới hạn số tham số của một câu lệnh SQLite khi tra nhiều khoá cùng lúc
+_SQL_BATCH = 500
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    Cache embedding hai tầng, khoá theo (tên model, SHA-256 của văn bản).
+
+    - Tầng bộ nhớ: LRU giới hạn theo tổng số byte của vector (float32).
+    - Tầng đĩa: SQLite, vector lưu dạng blob float32; dùng chung giữa API và ingestion_worker,
+      giữ lại qua các lần khởi động. db_path rỗng thì chỉ dùng tầng bộ nhớ.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, db_path: Optional[str] = None, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.db_path = None
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_text_bytes = 0
+        self._set_db_path(db_path)
+
+    def configure(self, max_bytes: Optional[int] = None, db_path: Optional[str] = None,
+                  enabled: Optional[bool] = None) -> None:
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if enabled is not None:
+                self.enabled = enabled
+            self._evict()
+        if db_path is not None:
+            self._set_db_path(db_path)
+
+    def _set_db_path(self, db_path: Optional[str]) -> None:
+        if not db_path:
+            self.db_path = None
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: Sequence[str], memory_only: bool = False) -> List[Optional[List[float]]]:
+        """
+        Vector đã cache cho từng văn bản (None nếu chưa có), theo đúng thứ tự đầu vào.
+        Trúng ở tầng đĩa thì được đưa lên tầng bộ nhớ.
+        memory_only=True: chỉ tra tầng bộ nhớ (không chặn event loop), lần trượt không được đếm.
+        """
+        if not self.enabled:
+            return [None] * len(texts)
+        keys = [(model, self.text_key(t)) for t in texts]
+        from_memory: Dict[Tuple[str, bytes], bytes] = {}
+        with self._lock:
+            for key in keys:
+                blob = self._entries.get(key)
+                if blob is not None:
+                    self._entries.move_to_end(key)
+                    from_memory[key] = blob
+
+        from_disk: Dict[Tuple[str, bytes], bytes] = {}
+        missing = list({key for key in keys if key not in from_memory})
+        if missing and self.db_path and not memory_only:
+            rows = self._disk_get(model, [digest for _, digest in missing])
+            from_disk = {(model, digest): blob for digest, blob in rows.items()}
+            with self._lock:
+                for key, blob in from_disk.items():
+                    self._store(key, blob)
+
+        results: List[Optional[List[float]]] = []
+        memory_hits = disk_hits = misses = saved = 0
+        for text, key in zip(texts, keys):
+            blob = from_memory.get(key)
+            if blob is not None:
+                memory_hits += 1
+            else:
+                blob = from_disk.get(key)
+                if blob is not None:
+                    disk_hits += 1
+            if blob is None:
+                misses += 1
+                results.append(None)
+            else:
+                saved += len(text.encode("utf-8"))
+                results.append(_unpack(blob))
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            if not memory_only:
+                self.misses += misses
+            self.saved_text_bytes += saved
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not self.enabled:
+            return
+        rows = [(model, self.text_key(t), _pack(v)) for t, v in zip(texts, vectors) if v]
+        with self._lock:
+            for model_name, digest, blob in rows:
+                self._store((model_name, digest), blob)
+        if self.db_path and rows:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_sha256, vector) VALUES (?, ?, ?)", rows
+                )
+
+    def _disk_get(self, model: str, digests: List[bytes]) -> Dict[bytes, bytes]:
+        found: Dict[bytes, bytes] = {}
+        with self._connect() as conn:
+            for i in range(0, len(digests), _SQL_BATCH):
+                batch = digests[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_sha256, vector FROM embeddings WHERE model = ? AND text_sha256 IN ({placeholders})",
+                    (model, *batch)
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def _store(self, key: Tuple[str, bytes], blob: bytes) -> None:
+        # Gọi khi đang giữ self._lock
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(blob) > self.max_bytes:
+            return
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and self._bytes > self.max_bytes:
+            _, blob = self._entries.popitem(last=False)
+            self._bytes -= len(blob)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Xoá tầng bộ nhớ (tầng đĩa giữ nguyên vì vector không phụ thuộc dữ liệu nào khác)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        disk_entries = None
+        if self.db_path:
+            with self._connect() as conn:
+                disk_entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_path": self.db_path,
+                "disk_entries": disk_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_text_bytes": self.saved_text_bytes,
+            }
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.job_store import sqlite_session
+from utils.upload_store import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái của file trong registry
+FILE_PENDING = "pending"
+FILE_INGESTED = "ingested"
+FILE_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_name TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    job_id TEXT,
+    item_count INTEGER,
+    point_ids TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (file_name, file_type)
+);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);
+"""
+
+# Các cột trả về khi liệt kê (không kèm danh sách point id)
+_LIST_COLUMNS = "file_name, file_type, sha256, size, kind, status, job_id, item_count, error, created_at, updated_at"
+
+
+def split_file_name(file_name: str) -> tuple:
+    """'abc.pdf' -> ('abc', '.pdf'), khớp với cách data/uploaded đặt tên và metadata trên Qdrant."""
+    return os.path.splitext(os.path.basename(file_name))
+
+
+class FileRegistry:
+    """
+    Danh sách các file đã upload, lưu trong SQLite (cùng file với JobStore).
+
+    Mỗi file (khoá: file_name + file_type): SHA-256, kích thước, loại, trạng thái ingest,
+    job_id, số chunk (pdf/doc) hoặc số dòng (xlsx) và id các point đã ghi lên Qdrant.
+    Liệt kê, kiểm tra trùng và xoá đều tra registry thay vì quét thư mục / lọc toàn bộ collection.
+    """
+
+    def __init__(self, db_path: str = "data/jobs.sqlite3"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with sqlite_session(self.db_path) as conn:
+            conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _to_dict(row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        entry = dict(row)
+        if "point_ids" in entry:
+            entry["point_ids"] = json.loads(entry["point_ids"]) if entry["point_ids"] else None
+        return entry
+
+    def register(self, file_name: str, sha256: str, size: int, kind: str,
+                 status: str = FILE_PENDING) -> Optional[Dict[str, Any]]:
+        """
+        Thêm hoặc ghi đè bản ghi của file (upload lại cùng tên thì bắt đầu lại từ đầu).
+        Trả về bản ghi cũ nếu bị ghi đè bởi nội dung khác: id point của bản cũ (suy ra từ SHA-256 cũ)
+        không trùng với bản mới, người gọi phải xoá chúng trên Qdrant.
+        """
+        with self._lock, sqlite_session(self.db_path) as conn:
+            return self._replace(conn, file_name, sha256, size, kind, status)
+
+    def register_if_new(self, file_name: str, sha256: str, size: int,
+                        kind: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Kiểm tra trùng nội dung và ghi bản ghi trong cùng một transaction ghi (BEGIN IMMEDIATE),
+        nên hai upload cùng nội dung đến đồng thời chỉ một upload được ghi và ingest.
+        Trả về (existing, None) nếu nội dung đã / đang được ingest (không ghi gì),
+        ngược lại (None, previous) với previous như register.
+        """
+        with self._lock, sqlite_session(self.db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = self._to_dict(conn.execute(
+                f"SELECT {_LIST_COLUMNS} FROM files WHERE sha256 = ? AND status IN (?, ?) LIMIT 1",
+                (sha256, FILE_PENDING, FILE_INGESTED)
+            ).fetchone())
+            if existing is not None:
+                return existing, None
+            return None, self._replace(conn, file_name, sha256, size, kind, FILE_PENDING)
+
+    def _replace(self, conn, file_name: str, sha256: str, size: int, kind: str,
+                 status: str) -> Optional[Dict[str, Any]]:
+        base, ext = split_file_name(file_name)
+        now = time.time()
+        previous = self._to_dict(conn.execute(
+            "SELECT * FROM files WHERE file_name = ? AND file_type = ?", (base, ext)
+        ).fetchone())
+        conn.execute(
+            "INSERT OR REPLACE INTO files (file_name, file_type, sha256, size, kind, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (base, ext, sha256, size, kind, status, now, now)
+        )
+        return previous if previous is not None and previous["sha256"] != sha256 else None
+
+    def set_job(self, file_name: str, job_id: str) -> None:
+        base, ext = split_file_name(file_name)
+        with self._lock, sqlite_session(self.db_path) as conn:
+            conn.execute(
+                "UPDATE files SET job_id = ?, updated_at = ? WHERE file_name = ? AND file_type = ?",
+                (job_id, time.time(), base, ext)
+            )
+
+    def finish(self, file_name: str, succeeded: bool, item_count: Optional[int] = None,
+               point_ids: Optional[List[str]] = None, error: Optional[str] = None) -> None:
+        """Ghi kết quả ingest: số chunk / dòng và id các point trên Qdrant (nếu có)."""
+        base, ext = split_file_name(file_name)
+        with self._lock, sqlite_session(self.db_path) as conn:
+            conn.execute(
+                "UPDATE files SET status = ?, item_count = ?, point_ids = ?, error = ?, updated_at = ? "
+                "WHERE file_name = ? AND file_type = ?",
+                (
+                    FILE_INGESTED if succeeded else FILE_FAILED, item_count,
+                    json.dumps(point_ids) if point_ids is not None else None, error, time.time(), base, ext
+                )
+            )
+
+    def get(self, file_name: str, file_type: str) -> Optional[Dict[str, Any]]:
+        with sqlite_session(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT * FROM files WHERE file_name = ? AND file_type = ?", (file_name, file_type)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def find_active_by_sha256(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """File cùng nội dung đang ingest hoặc đã ingest xong (bỏ qua các lần lỗi)."""
+        with sqlite_session(self.db_path) as conn:
+            row = conn.execute(
+                f"SELECT {_LIST_COLUMNS} FROM files WHERE sha256 = ? AND status IN (?, ?) LIMIT 1",
+                (sha256, FILE_PENDING, FILE_INGESTED)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with sqlite_session(self.db_path) as conn:
+            rows = conn.execute(f"SELECT {_LIST_COLUMNS} FROM files ORDER BY created_at DESC").fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def delete(self, file_name: str, file_type: str) -> None:
+        with self._lock, sqlite_session(self.db_path) as conn:
+            conn.execute("DELETE FROM files WHERE file_name = ? AND file_type = ?", (file_name, file_type))
+
+    def count(self) -> int:
+        with sqlite_session(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def sync_from_disk(self, folder: str) -> int:
+        """
+        Nạp các file có sẵn trong `folder` (upload trước khi có registry) với trạng thái ingested.
+        Chỉ cần chạy một lần; không biết id point nên khi xoá sẽ lọc Qdrant theo metadata.
+        """
+        if not os.path.isdir(folder):
+            return 0
+        added = 0
+        kinds = {".pdf": "pdf", ".doc": "doc", ".docx": "doc", ".xlsx": "xlsx"}
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            ext = os.path.splitext(name)[1]
+            self.register(name, file_sha256(path), os.path.getsize(path), kinds.get(ext.lower(), "other"), FILE_INGESTED)
+            added += 1
+        logger.info(f"[FileRegistry] Đã nạp {added} file có sẵn từ {folder}")
+        return added
@@ -0,0 +1,307 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.text_normalizer import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+# Các cột được mã hoá (factorize) và có chỉ mục sắp xếp
+CODED_COLUMNS = ("HsCode", "NhaCungCap", "TinhTrang", "file_name")
+
+DEFAULT_COLUMNS = (
+    "id", "Ngay", "NhaCungCap", "HsCode", "TenHang", "Luong", "DonViTinh",
+    "TenNuocXuatXu", "DieuKienGiaoHang", "ThueSuatXNK", "ThueSuatTTDB",
+    "ThueSuatVAT", "ThueSuatTuVe", "ThueSuatBVMT", "file_name", "TinhTrang",
+    "TenHangKhongDau",
+)
+
+_EMPTY_ROWS = np.empty(0, dtype=np.intp)
+
+
+def _object_array(values: Sequence) -> np.ndarray:
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = list(values)
+    return arr
+
+
+def _to_day(value) -> np.datetime64:
+    """Chuyển date/datetime/chuỗi 'YYYY-MM-DD' thành datetime64[D] (None -> NaT)."""
+    if value is None or value == "":
+        return np.datetime64("NaT", "D")
+    if hasattr(value, "strftime"):
+        return np.datetime64(value.strftime("%Y-%m-%d"), "D")
+    return np.datetime64(str(value).strip()[:10], "D")
+
+
+class _Dictionary:
+    """
+    Từ điển mã hoá cho một cột chuỗi. Chỉ thêm, không xoá, nên các trạng thái
+    cũ của snapshot vẫn đọc được an toàn khi đang nạp dữ liệu mới.
+    Khoá so sánh là chuỗi đã bỏ dấu + chữ thường, gần với collation *_ai_ci của MySQL.
+    """
+
+    def __init__(self):
+        self.raw_to_code: Dict[object, int] = {}
+        self.key_to_code: Dict[Optional[str], int] = {}
+        self.keys: List[Optional[str]] = []
+
+    def encode(self, raw_values: Sequence) -> np.ndarray:
+        codes = np.empty(len(raw_values), dtype=np.int32)
+        for i, raw in enumerate(raw_values):
+            code = self.raw_to_code.get(raw)
+            if code is None:
+                key = None if raw is None else fold_vietnamese(str(raw))
+                code = self.key_to_code.get(key)
+                if code is None:
+                    code = len(self.keys)
+                    self.key_to_code[key] = code
+                    self.keys.append(key)
+                self.raw_to_code[raw] = code
+            codes[i] = code
+        return codes
+
+    def lookup(self, value) -> int:
+        if value is None:
+            return -1
+        return self.key_to_code.get(fold_vietnamese(str(value)), -1)
+
+    def codes_containing(self, fragment: str, limit: int) -> np.ndarray:
+        """Các mã có khoá chứa fragment (tương đương LIKE '%fragment%')."""
+        needle = fold_vietnamese(str(fragment))
+        return np.fromiter(
+            (c for c, k in enumerate(self.keys[:limit]) if k is not None and needle in k),
+            dtype=np.int32,
+        )
+
+
+class _CodedIndex:
+    """Mảng mã theo dòng, kèm thứ tự dòng sắp theo mã để tra cứu bằng searchsorted."""
+
+    def __init__(self, codes: np.ndarray, dictionary: _Dictionary):
+        n_codes = len(dictionary.keys)
+        self.codes = codes
+        self.order = np.argsort(codes, kind="stable")
+        self.bounds = np.searchsorted(codes[self.order], np.arange(n_codes + 1))
+        sort_keys = _object_array(["" if k is None else k for k in dictionary.keys[:n_codes]])
+        self.rank = np.empty(n_codes, dtype=np.int64)
+        self.rank[np.argsort(sort_keys, kind="stable")] = np.arange(n_codes)
+
+    def rows(self, code: int) -> np.ndarray:
+        if code < 0 or code + 1 >= len(self.bounds):
+            return _EMPTY_ROWS
+        return self.order[self.bounds[code]:self.bounds[code + 1]]
+
+
+class _State:
+    """Một phiên bản bất biến của snapshot; được thay thế nguyên khối khi làm mới."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, _Dictionary],
+                 codes: Dict[str, np.ndarray], days: np.ndarray):
+        self.columns = columns
+        self.size = len(days)
+        self.indexes = {col: _CodedIndex(codes[col], dictionaries[col]) for col in CODED_COLUMNS}
+        self.days = days
+        # Khoá sắp xếp: NaT là int64 nhỏ nhất nên đứng đầu, giống NULL trong ORDER BY của MySQL
+        self.day_keys = days.view(np.int64)
+        # Chỉ mục khoảng ngày: numpy đặt NaT ở cuối mảng đã sắp xếp
+        self.day_order = np.argsort(days, kind="stable")
+        self.sorted_days = days[self.day_order]
+
+
+class ImportDataSnapshot:
+    """
+    Bản sao dạng cột của bảng import_data nằm trong bộ nhớ tiến trình.
+
+    - Các cột HsCode, NhaCungCap, TinhTrang, file_name được mã hoá thành số nguyên
+      và có chỉ mục sắp xếp; Ngay được lưu dạng datetime64[D] đã sắp xếp.
+    - Bộ lọc của các tool (hs_code, hs_like, supplier, date, start_date, end_date, status)
+      được tính bằng mask vector hoá trên tập ứng viên lấy từ chỉ mục chọn lọc nhất.
+    - Làm mới theo file: chỉ đọc lại các dòng của file vừa upload / bỏ các dòng của file vừa xoá.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dictionaries = {col: _Dictionary() for col in CODED_COLUMNS}
+        self._state: Optional[_State] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._state is not None
+
+    def __len__(self) -> int:
+        state = self._state
+        return state.size if state is not None else 0
+
+    # ------------------------------------------------------------------
+    # Nạp / làm mới
+    # ------------------------------------------------------------------
+    def load(self, db_connector) -> int:
+        """Nạp toàn bộ bảng import_data."""
+        rows = db_connector.execute_query("SELECT * FROM import_data ORDER BY id")
+        with self._lock:
+            self._state = self._build(self._columns_from_rows(rows))
+        logger.info("[ImportDataSnapshot] Đã nạp %s dòng import_data vào bộ nhớ.", len(rows))
+        return len(rows)
+
+    def refresh_file(self, db_connector, file_name: str) -> int:
+        """Đọc lại các dòng của một file (sau khi upload) và thay thế bản cũ trong snapshot."""
+        rows = db_connector.execute_query(
+            "SELECT * FROM import_data WHERE file_name = %s ORDER BY id", (file_name,)
+        )
+        with self._lock:
+            if self._state is None:
+                return 0
+            state = self._state
+            fresh = self._columns_from_rows(rows, names=list(state.columns.keys()))
+            self._state = self._merge(state, self._keep_mask(state, file_name), fresh)
+        logger.info("[ImportDataSnapshot] Làm mới file '%s': %s dòng.", file_name, len(rows))
+        return len(rows)
+
+    def remove_file(self, file_name: str) -> int:
+        """Bỏ các dòng của một file (sau khi xoá trên MySQL)."""
+        with self._lock:
+            if self._state is None:
+                return 0
+            before = self._state.size
+            self._state = self._merge(self._state, self._keep_mask(self._state, file_name))
+            removed = before - self._state.size
+        logger.info("[ImportDataSnapshot] Đã bỏ %s dòng của file '%s'.", removed, file_name)
+        return removed
+
+    def _columns_from_rows(self, rows: List[Dict], names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        if names is None:
+            names = list(rows[0].keys()) if rows else list(DEFAULT_COLUMNS)
+        return {name: _object_array([r.get(name) for r in rows]) for name in names}
+
+    def _keep_mask(self, state: _State, file_name: str) -> np.ndarray:
+        index = state.indexes["file_name"]
+        code = self._dictionaries["file_name"].lookup(file_name)
+        keep = np.ones(state.size, dtype=bool)
+        keep[index.rows(code)] = False
+        return keep
+
+    def _encode(self, columns: Dict[str, np.ndarray]) -> tuple:
+        """Mã hoá các cột CODED_COLUMNS và chuyển Ngay sang datetime64[D] (chỉ cho các dòng được truyền vào)."""
+        size = len(next(iter(columns.values()))) if columns else 0
+        for col in CODED_COLUMNS + ("Ngay",):
+            columns.setdefault(col, _object_array([None] * size))
+        codes = {col: self._dictionaries[col].encode(columns[col]) for col in CODED_COLUMNS}
+        days = np.array([_to_day(v) for v in columns["Ngay"]], dtype="datetime64[D]")
+        return codes, days
+
+    def _build(self, columns: Dict[str, np.ndarray]) -> _State:
+        codes, days = self._encode(columns)
+        return _State(columns, self._dictionaries, codes, days)
+
+    def _merge(self, state: _State, keep: np.ndarray, fresh: Optional[Dict[str, np.ndarray]] = None) -> _State:
+        """
+        Trạng thái mới gồm các dòng `keep` của state (giữ nguyên mã và ngày đã tính) cộng các dòng `fresh`;
+        chỉ mã hoá / parse ngày cho dòng mới, rồi dựng lại các chỉ mục sắp xếp.
+        """
+        columns = {col: values[keep] for col, values in state.columns.items()}
+        codes = {col: state.indexes[col].codes[keep] for col in CODED_COLUMNS}
+        days = state.days[keep]
+        if fresh:
+            fresh_codes, fresh_days = self._encode(fresh)
+            columns = {col: np.concatenate([columns[col], fresh[col]]) for col in columns}
+            codes = {col: np.concatenate([codes[col], fresh_codes[col]]) for col in CODED_COLUMNS}
+            days = np.concatenate([days, fresh_days])
+        return _State(columns, self._dictionaries, codes, days)
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _filter(self, state: _State, hs_code=None, hs_like=None, supplier=None, date=None,
+                start_date=None, end_date=None, status=None) -> np.ndarray:
+        """Trả về chỉ số các dòng thoả mãn bộ lọc, theo thứ tự id."""
+        exact = {
+            "HsCode": hs_code,
+            "NhaCungCap": supplier,
+            "TinhTrang": status,
+        }
+        exact_codes = {
+            col: self._dictionaries[col].lookup(value)
+            for col, value in exact.items() if value is not None
+        }
+        if date is not None:
+            start_date = end_date = date
+        try:
+            start = _to_day(start_date) if start_date is not None else None
+            end = _to_day(end_date) if end_date is not None else None
+        except (TypeError, ValueError):
+            # Ngày không đúng dạng YYYY-MM-DD (vd '15/01/2024' do LLM sinh): MySQL cũng không trả dòng nào
+            return _EMPTY_ROWS
+
+        # Tập ứng viên: ưu tiên chỉ mục HsCode, rồi nhà cung cấp, rồi khoảng ngày
+        if "HsCode" in exact_codes:
+            rows = state.indexes["HsCode"].rows(exact_codes.pop("HsCode"))
+        elif "NhaCungCap" in exact_codes:
+            rows = state.indexes["NhaCungCap"].rows(exact_codes.pop("NhaCungCap"))
+        elif start is not None or end is not None:
+            lo = np.searchsorted(state.sorted_days, start, side="left") if start is not None else 0
+            hi = np.searchsorted(state.sorted_days, end, side="right") if end is not None else state.size
+            # Bỏ các dòng NaT (đứng cuối mảng đã sắp xếp của numpy)
+            rows = state.day_order[lo:hi]
+            rows = rows[~np.isnat(state.days[rows])]
+            start = end = None
+        else:
+            rows = np.arange(state.size)
+
+        if rows.size == 0:
+            return _EMPTY_ROWS
+
+        mask = np.ones(rows.size, dtype=bool)
+        for col, code in exact_codes.items():
+            mask &= state.indexes[col].codes[rows] == code
+        if hs_like is not None:
+            index = state.indexes["HsCode"]
+            matched = self._dictionaries["HsCode"].codes_containing(hs_like, len(index.rank))
+            mask &= np.isin(index.codes[rows], matched)
+        if start is not None:
+            mask &= state.days[rows] >= start
+        if end is not None:
+            mask &= state.days[rows] <= end
+        return np.sort(rows[mask])
+
+    def _sort_keys(self, state: _State, column: str, rows: np.ndarray) -> np.ndarray:
+        if column == "Ngay":
+            return state.day_keys[rows]
+        if column in state.indexes:
+            index = state.indexes[column]
+            return index.rank[index.codes[rows]]
+        # Hạng theo giá trị: giá trị bằng nhau cùng hạng (DISTINCT dựa vào điều này)
+        values = state.columns[column][rows]
+        return np.unique(_object_array(["" if v is None else str(v) for v in values]), return_inverse=True)[1].reshape(-1)
+
+    def select(self, columns: Optional[Sequence[str]] = None, distinct: bool = False,
+               order_by: Optional[str] = None, limit: Optional[int] = None, **filters) -> List[Dict]:
+        """
+        Tương đương SELECT [DISTINCT] columns FROM import_data WHERE ... ORDER BY order_by LIMIT limit.
+        Trả về list[dict] giống DatabaseConnector.execute_query.
+        """
+        state = self._state
+        if state is None:
+            raise RuntimeError("ImportDataSnapshot chưa được nạp dữ liệu")
+        rows = self._filter(state, **filters)
+        names = list(columns) if columns else list(state.columns.keys())
+
+        if distinct and rows.size:
+            keys = np.column_stack([self._sort_keys(state, name, rows) for name in names])
+            _, first = np.unique(keys, axis=0, return_index=True)
+            rows = rows[np.sort(first)]
+        if order_by and rows.size:
+            rows = rows[np.argsort(self._sort_keys(state, order_by, rows), kind="stable")]
+        if limit is not None:
+            rows = rows[:limit]
+
+        data = [state.columns[name][rows] for name in names]
+        return [dict(zip(names, values)) for values in zip(*data)]
+
+    def count(self, **filters) -> int:
+        state = self._state
+        if state is None:
+            raise RuntimeError("ImportDataSnapshot chưa được nạp dữ liệu")
+        return int(self._filter(state, **filters).size)
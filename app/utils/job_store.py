@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Trạng thái của một job ingest
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+@contextmanager
+def sqlite_session(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Kết nối SQLite ngắn hạn: commit khi thành công, rollback khi lỗi, luôn đóng."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+class JobStore:
+    """
+    Lưu trạng thái các job ingest (pdf / doc / xlsx) trong SQLite để không mất khi khởi động lại.
+
+    - Mỗi job: loại file, đường dẫn, tham số, trạng thái, stage hiện tại, tiến độ (0..1), kết quả / lỗi.
+    - Mỗi thao tác mở kết nối riêng nên dùng được từ nhiều thread và nhiều process
+      (API chỉ tạo job, tiến trình ingestion_worker.py nhận job qua claim_next).
+    """
+
+    def __init__(self, db_path: str = "data/jobs.sqlite3"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite_session(self.db_path)
+
+    @staticmethod
+    def _to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def create(self, kind: str, file_name: str, file_path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, file_name, file_path, params, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, file_name, file_path, json.dumps(params or {}, ensure_ascii=False), JOB_QUEUED, now, now)
+            )
+        logger.info(f"[JobStore] Tạo job {job_id} ({kind}) cho file {file_name}")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(query, (*params, limit)).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def queued_ids(self) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def requeue_interrupted(self) -> int:
+        """Job đang chạy khi tiến trình dừng đột ngột được đưa lại hàng đợi."""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, progress = 0, updated_at = ? WHERE status = ?",
+                (JOB_QUEUED, time.time(), JOB_RUNNING)
+            )
+            count = cursor.rowcount
+        if count:
+            logger.info(f"[JobStore] Đưa lại {count} job bị gián đoạn vào hàng đợi")
+        return count
+
+    def mark_running(self, job_id: str) -> bool:
+        """Chuyển job queued -> running; False nếu job không còn ở trạng thái queued."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JOB_RUNNING, now, now, job_id, JOB_QUEUED)
+            )
+            return cursor.rowcount == 1
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Nhận job queued cũ nhất và chuyển sang running trong cùng một transaction ghi
+        (BEGIN IMMEDIATE), nên hai worker không thể nhận trùng một job.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (JOB_RUNNING, now, now, row["id"])
+            )
+        return self.get(row["id"])
+
+    def finished_since(self, since: float, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Các job kết thúc (thành công hoặc lỗi) sau thời điểm `since`, cũ nhất trước."""
+        query = "SELECT * FROM jobs WHERE finished_at > ?"
+        params: tuple = (since,)
+        if kind:
+            query += " AND kind = ?"
+            params += (kind,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY finished_at", params).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def update_stage(self, job_id: str, stage: str, progress: float) -> None:
+        self._update(job_id, stage=stage, progress=round(progress, 3))
+
+    def succeed(self, job_id: str, result: Optional[Dict[str, Any]] = None) -> None:
+        self._update(
+            job_id, status=JOB_SUCCEEDED, stage="done", progress=1.0,
+            result=json.dumps(result or {}, ensure_ascii=False, default=str), finished_at=time.time()
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, status=JOB_FAILED, error=error, finished_at=time.time())
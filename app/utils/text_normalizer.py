@@ -0,0 +1,28 @@
+import re
+import unicodedata
+
+# Các ký tự có ý nghĩa đặc biệt trong MATCH ... AGAINST (... IN BOOLEAN MODE)
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+
+
+def fold_vietnamese(text: str) -> str:
+    """
+    Bỏ dấu tiếng Việt và chuyển về chữ thường.
+    Ví dụ: "Máy tính xách tay" -> "may tinh xach tay", "Đồng hồ" -> "dong ho".
+    """
+    if not isinstance(text, str):
+        return ""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return " ".join(stripped.lower().split())
+
+
+def build_ngram_boolean_query(text: str, min_token_size: int = 2) -> str:
+    """
+    Tạo chuỗi tìm kiếm BOOLEAN MODE cho FULLTEXT index dùng ngram parser.
+    Mỗi từ (đã bỏ dấu) là bắt buộc (+), giúp tập ứng viên nhỏ và chính xác.
+    Các từ ngắn hơn ngram_token_size bị bỏ qua vì ngram parser không index chúng.
+    """
+    words = _BOOLEAN_OPERATORS.sub(" ", fold_vietnamese(text)).split()
+    return " ".join(f"+{w}" for w in words if len(w) >= min_token_size)
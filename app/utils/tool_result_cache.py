@@ -0,0 +1,162 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Thông điệp các tool trả về cho agent khi kết quả đã nằm trong last_result
+AGENT_MESSAGE = "Good job!"
+
+# Bộ đếm thế hệ dữ liệu: tăng mỗi khi import_data thay đổi (upload / xoá file xlsx)
+_data_generation = 0
+_generation_lock = threading.Lock()
+
+
+def get_data_generation() -> int:
+    return _data_generation
+
+
+def bump_data_generation() -> int:
+    """Đánh dấu import_data đã thay đổi; mọi kết quả tool đã cache trở nên không hợp lệ."""
+    global _data_generation
+    with _generation_lock:
+        _data_generation += 1
+        generation = _data_generation
+    tool_result_cache.clear()
+    logger.info("[ToolResultCache] Thế hệ dữ liệu mới: %s", generation)
+    return generation
+
+
+def _normalize_arg(value: Any) -> Any:
+    # Chỉ chuẩn hoá khoảng trắng: kết quả hiển thị lại nguyên văn tham số người dùng nhập
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+class ToolResultCache:
+    """
+    Cache LRU cho kết quả của các tool tra cứu import_data.
+
+    - Khoá: (tên tool, tham số đã chuẩn hoá, package_type, thế hệ dữ liệu).
+    - Giá trị: thông điệp trả về agent, cờ is_summary và last_result đã định dạng.
+    - Giới hạn theo tổng số byte của các chuỗi kết quả; vượt quá thì bỏ mục ít dùng nhất.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def configure(self, max_bytes: Optional[int] = None, enabled: Optional[bool] = None) -> None:
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if enabled is not None:
+                self.enabled = enabled
+            self._evict()
+
+    @staticmethod
+    def make_key(tool_name: str, args: tuple, kwargs: dict, package_type: str) -> Tuple:
+        norm_args = tuple(_normalize_arg(a) for a in args)
+        norm_kwargs = tuple(sorted((k, _normalize_arg(v)) for k, v in kwargs.items()))
+        return (tool_name, norm_args, norm_kwargs, package_type, get_data_generation())
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry["elapsed"]
+            return entry
+
+    def put(self, key: Tuple, message: str, is_summary: bool, last_result: Optional[str], elapsed: float) -> None:
+        size = len(message.encode("utf-8")) + len((last_result or "").encode("utf-8")) + len(repr(key))
+        with self._lock:
+            if size > self.max_bytes or key[-1] != get_data_generation():
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old["size"]
+            self._entries[key] = {
+                "message": message,
+                "is_summary": is_summary,
+                "last_result": last_result,
+                "elapsed": elapsed,
+                "size": size,
+            }
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and self._bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["size"]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_db_seconds": round(self.saved_seconds, 3),
+                "data_generation": get_data_generation(),
+            }
+
+
+tool_result_cache = ToolResultCache()
+
+
+def cached_tool_run(func: Callable) -> Callable:
+    """
+    Decorator cho _run của các tool HS code / tên hàng.
+    Khi trúng cache: đánh dấu tool_called, khôi phục is_summary / last_result và trả lại thông điệp cũ.
+    Chỉ cache khi tool trả về AGENT_MESSAGE hoặc chính last_result (không cache thông báo lỗi).
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not tool_result_cache.enabled or self._tool_agent is None:
+            return func(self, *args, **kwargs)
+
+        key = tool_result_cache.make_key(self.name, args, kwargs, self._tool_agent.get_package())
+        entry = tool_result_cache.get(key)
+        if entry is not None:
+            self._tool_agent.tool_called[self.name] = True
+            self.is_summary = entry["is_summary"]
+            self.last_result = entry["last_result"]
+            logger.info("[ToolResultCache] Hit %s", self.name)
+            return entry["message"]
+
+        started = time.perf_counter()
+        message = func(self, *args, **kwargs)
+        elapsed = time.perf_counter() - started
+        if isinstance(message, str) and message in (AGENT_MESSAGE, self.last_result):
+            tool_result_cache.put(key, message, self.is_summary, self.last_result, elapsed)
+        return message
+
+    return wrapper
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import aiofiles
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOADED_FOLDER = "data/uploaded"
+# Kho lưu theo nội dung: data/uploaded/.objects/<sha256><đuôi file>
+OBJECTS_FOLDER = os.path.join(UPLOADED_FOLDER, ".objects")
+TMP_FOLDER = os.path.join(UPLOADED_FOLDER, ".tmp")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """File upload vượt quá dung lượng cho phép (phát hiện ngay trong lúc nhận dữ liệu)."""
+
+
+@dataclass
+class StagedUpload:
+    """File đã nhận xong vào thư mục tạm, kèm SHA-256 và kích thước tính trong lúc ghi."""
+    temp_path: str
+    sha256: str
+    size: int
+    ext: str
+
+    @property
+    def object_path(self) -> str:
+        return os.path.join(OBJECTS_FOLDER, f"{self.sha256}{self.ext}")
+
+    @property
+    def is_duplicate(self) -> bool:
+        """Nội dung này đã có trong kho (không cần đọc lại file để so sánh)."""
+        return os.path.exists(self.object_path)
+
+
+async def stage_upload(file: UploadFile, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> StagedUpload:
+    """
+    Ghi UploadFile ra file tạm theo từng khối (không giữ cả file trong bộ nhớ),
+    vừa ghi vừa tính SHA-256 và dừng ngay khi vượt `max_bytes`.
+    """
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    temp_path = os.path.join(TMP_FOLDER, f"{uuid.uuid4().hex}{ext}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File vượt quá {max_bytes // (1024 * 1024)}MB.")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await asyncio.to_thread(_remove_quietly, temp_path)
+        raise
+    return StagedUpload(temp_path=temp_path, sha256=digest.hexdigest(), size=size, ext=ext)
+
+
+async def discard_upload(staged: StagedUpload) -> None:
+    await asyncio.to_thread(_remove_quietly, staged.temp_path)
+
+
+async def commit_upload(staged: StagedUpload, file_name: str) -> str:
+    """
+    Chuyển file tạm vào kho theo nội dung (os.replace, nguyên tử) rồi tạo
+    data/uploaded/<file_name> trỏ tới đó bằng hard link. Nội dung đã có trong kho thì bỏ file tạm.
+    Trả về đường dẫn data/uploaded/<file_name> mà các pipeline dùng.
+    """
+    return await asyncio.to_thread(_commit, staged, os.path.basename(file_name))
+
+
+def _commit(staged: StagedUpload, file_name: str) -> str:
+    os.makedirs(OBJECTS_FOLDER, exist_ok=True)
+    if staged.is_duplicate:
+        _remove_quietly(staged.temp_path)
+        logger.info(f"[upload_store] Nội dung {staged.sha256[:12]} đã có trong kho, bỏ file tạm.")
+    else:
+        os.replace(staged.temp_path, staged.object_path)
+
+    target = os.path.join(UPLOADED_FOLDER, file_name)
+    if os.path.exists(target):
+        if os.path.samefile(target, staged.object_path):
+            return target
+        remove_upload(target)
+
+    # Tạo link ở tên tạm rồi os.replace để người đọc không thấy file dở dang
+    link_tmp = os.path.join(TMP_FOLDER, f"{uuid.uuid4().hex}.link")
+    try:
+        os.link(staged.object_path, link_tmp)
+    except OSError:
+        # Hệ thống file không hỗ trợ hard link: dùng bản sao
+        shutil.copyfile(staged.object_path, link_tmp)
+    os.replace(link_tmp, target)
+    return target
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_sha256(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_upload(path: str, sha256: Optional[str] = None) -> None:
+    """
+    Xoá data/uploaded/<file> và bản trong kho nếu không còn tên nào khác trỏ tới.
+    Nếu không biết sha256, chỉ đọc lại file khi nó thực sự là hard link vào kho.
+    """
+    if not os.path.exists(path):
+        return
+    if sha256 is None and os.stat(path).st_nlink > 1:
+        sha256 = file_sha256(path)
+    os.remove(path)
+    if sha256 is None:
+        return
+    object_path = os.path.join(OBJECTS_FOLDER, f"{sha256}{os.path.splitext(path)[1].lower()}")
+    if os.path.exists(object_path) and os.stat(object_path).st_nlink == 1:
+        os.remove(object_path)